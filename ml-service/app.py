@@ -1,13 +1,91 @@
-from flask import Flask, request, jsonify
+import os
+import hmac
+import time
+from flask import Flask, Response, request, jsonify, g
 from flask_cors import CORS
 from datetime import datetime
-from predictor import CareerPredictor
+from predictor import CareerPredictor, DEFAULT_ENGINE, REQUIRED_FIELDS, WHAT_IF_MAX_RESULTS
+from hot_reload import PredictorManager
+from metrics import METRICS, process_memory
+from skill_index import SUGGEST_MAX_RESULTS
+from fast_json import FastJSONProvider
+from profiling import MAX_SAMPLE_SECONDS, SamplingProfiler, profile_call
 
 app = Flask(__name__)
+app.json = FastJSONProvider(app)
 CORS(app)
 
-# Initialize Predictor
-predictor = CareerPredictor()
+# Largest number of profiles accepted by /api/predict/batch
+MAX_BATCH_SIZE = 10000
+
+# Seconds clients and proxies may reuse skill lists before revalidating
+SKILLS_MAX_AGE = int(os.environ.get('SKILLS_MAX_AGE', 300))
+
+# Admin endpoints are disabled unless a token is configured
+ADMIN_TOKEN = os.environ.get('ADMIN_TOKEN')
+
+# Request profiling (X-Profile header) and the sampling profiler endpoint
+# are off unless enabled here, and also need the admin token
+PROFILING_ENABLED = os.environ.get('PROFILING_ENABLED', '').lower() in ('1', 'true', 'yes')
+sampler = SamplingProfiler()
+
+# Initialize Predictor; handlers read manager.current once per request so a
+# hot reload never changes the predictor under an in-flight request
+manager = PredictorManager(CareerPredictor)
+manager.watch(float(os.environ.get('MODEL_WATCH_INTERVAL', 0)))
+
+def collect_predictor_metrics():
+    """Cache counters and artifact versions of this worker's live predictor"""
+    predictor = manager.current
+    stats = predictor.cache.stats()
+    collected = {
+        ('ml_prediction_cache_entries', ()): stats['size'],
+        ('ml_artifact_info', (
+            ('catalog', predictor.recommender.checksum[:12]),
+            ('catalog_revision', str(predictor.recommender.revision)),
+            ('model_source', predictor.model_source or 'none'),
+            ('version', predictor.version)
+        )): 1,
+        ('ml_catalog_roles', ()): len(predictor.catalog)
+    }
+    # Counters include the predictors replaced by hot reloads
+    for (cache, event), value in manager.cache_events().items():
+        name = 'ml_shared_cache_events_total' if cache == 'shared' else 'ml_prediction_cache_events_total'
+        collected[(name, (('event', event),))] = value
+    for kind, value in process_memory().items():
+        collected[('ml_worker_memory_bytes', (('kind', kind),))] = value
+    return collected
+
+METRICS.add_collector(collect_predictor_metrics)
+
+@app.before_request
+def start_timer():
+    METRICS.start_publisher()
+    if PROFILING_ENABLED:
+        # Join sampling runs started by other workers
+        sampler.watch()
+    g.request_start = time.perf_counter()
+    if sampler.running:
+        sampler.enter()
+
+@app.teardown_request
+def end_request(error=None):
+    if sampler.running:
+        sampler.exit()
+
+@app.after_request
+def record_request(response):
+    """Count every request and time it per endpoint (route pattern, not raw path)"""
+    endpoint = request.url_rule.rule if request.url_rule is not None else 'unmatched'
+    if 'request_start' in g:
+        METRICS.observe('ml_request_duration_seconds', time.perf_counter() - g.request_start, endpoint=endpoint)
+    METRICS.inc('ml_requests_total', endpoint=endpoint, method=request.method, status=str(response.status_code))
+    return response
+
+def is_admin_request():
+    """Check the admin token header against ADMIN_TOKEN"""
+    token = request.headers.get('X-Admin-Token', '')
+    return bool(ADMIN_TOKEN) and hmac.compare_digest(token, ADMIN_TOKEN)
 
 @app.route('/', methods=['GET'])
 def index():
@@ -17,17 +95,33 @@ def index():
         'endpoints': {
             'health': '/api/health',
             'predict': '/api/predict',
-            'skills': '/api/skills'
+            'predict_batch': '/api/predict/batch',
+            'predict_what_if': '/api/predict/what-if',
+            'skills': '/api/skills',
+            'skills_suggest': '/api/skills/suggest?q=',
+            'reload': '/api/admin/reload',
+            'profile': '/api/admin/profile',
+            'metrics': '/metrics'
         }
     })
 
 @app.route('/api/health', methods=['GET'])
 def health_check():
     """Health check endpoint"""
+    predictor = manager.current
     return jsonify({
         'status': 'healthy',
         'timestamp': datetime.now().isoformat(),
-        'model_loaded': predictor.model is not None
+        'model_loaded': predictor.model is not None,
+        'version': predictor.version,
+        'modelVersion': predictor.model_version,
+        'modelSource': predictor.model_source,
+        'reload': manager.status(),
+        'cache': predictor.cache.stats(),
+        'worker': {
+            'pid': os.getpid(),
+            'memoryBytes': process_memory()
+        }
     })
 
 @app.route('/api/predict', methods=['POST'])
@@ -37,17 +131,32 @@ def predict():
         data = request.json
         
         # Validate input
-        required_fields = ['degree', 'skills', 'experience']
-        for field in required_fields:
+        for field in REQUIRED_FIELDS:
             if field not in data:
                 return jsonify({
                     'error': f'Missing required field: {field}'
                 }), 400
         
+        predictor = manager.current
+        engine = data.get('engine', DEFAULT_ENGINE)
+        error = predictor.engine_error(engine)
+        if error:
+            return jsonify({
+                'error': error
+            }), 400
+        
+        if PROFILING_ENABLED and request.headers.get('X-Profile') and is_admin_request():
+            # Bypass the cache so the profile shows the whole pipeline
+            result, profile = profile_call(
+                predictor.predict, data['degree'], data['skills'], data['experience'], engine, use_cache=False
+            )
+            return jsonify(dict(result, profile=profile))
+        
         result = predictor.predict(
             data['degree'],
             data['skills'],
-            data['experience']
+            data['experience'],
+            engine
         )
         
         return jsonify(result)
@@ -59,13 +168,169 @@ def predict():
             'message': str(e)
         }), 500
 
+@app.route('/api/predict/batch', methods=['POST'])
+def predict_batch():
+    """Batch prediction endpoint; per-profile errors are returned in place"""
+    try:
+        data = request.json
+        
+        profiles = data.get('profiles') if isinstance(data, dict) else None
+        if not isinstance(profiles, list):
+            return jsonify({
+                'error': 'Missing required field: profiles'
+            }), 400
+        if len(profiles) > MAX_BATCH_SIZE:
+            return jsonify({
+                'error': f'Batch too large: at most {MAX_BATCH_SIZE} profiles per request'
+            }), 400
+        
+        METRICS.observe('ml_batch_profiles', len(profiles))
+        results = manager.current.predict_many(profiles)
+        
+        return jsonify({
+            'results': results
+        })
+        
+    except Exception as e:
+        print(f"Batch prediction error: {str(e)}")
+        return jsonify({
+            'error': 'Internal server error',
+            'message': str(e)
+        }), 500
+
+@app.route('/api/predict/what-if', methods=['POST'])
+def predict_what_if():
+    """Rank the skills that would most raise the user's best match"""
+    try:
+        data = request.json
+        
+        skills = data.get('skills') if isinstance(data, dict) else None
+        if not isinstance(skills, list) or not skills or not all(isinstance(s, str) for s in skills):
+            return jsonify({
+                'error': 'Field skills must be a non-empty list of strings'
+            }), 400
+        limit = data.get('limit', 10)
+        if isinstance(limit, bool) or not isinstance(limit, int) or not 1 <= limit <= WHAT_IF_MAX_RESULTS:
+            return jsonify({
+                'error': f'limit must be between 1 and {WHAT_IF_MAX_RESULTS}'
+            }), 400
+        
+        result = manager.current.what_if(skills, pairs=bool(data.get('pairs')), limit=limit)
+        
+        return jsonify(result)
+        
+    except Exception as e:
+        print(f"What-if error: {str(e)}")
+        return jsonify({
+            'error': 'Internal server error',
+            'message': str(e)
+        }), 500
+
 @app.route('/api/skills', methods=['GET'])
 def get_available_skills():
-    """Get list of available skills"""
+    """Get list of available skills; revalidated with ETag / If-None-Match"""
+    predictor = manager.current
     skills = predictor.get_available_skills()
+    etag = predictor.skills_etag
+    if request.if_none_match.contains(etag):
+        response = Response(status=304)
+    else:
+        response = jsonify({
+            'skills': skills
+        })
+    response.set_etag(etag)
+    response.cache_control.public = True
+    response.cache_control.max_age = SKILLS_MAX_AGE
+    return response
+
+@app.route('/api/skills/suggest', methods=['GET'])
+def suggest_skills():
+    """Ranked skill completions for a prefix, synonyms included"""
+    query = request.args.get('q', '')
+    if not query.strip():
+        return jsonify({
+            'error': 'Missing required parameter: q'
+        }), 400
+    limit = request.args.get('limit', 10, type=int)
+    if limit is None or not 1 <= limit <= SUGGEST_MAX_RESULTS:
+        return jsonify({
+            'error': f'limit must be between 1 and {SUGGEST_MAX_RESULTS}'
+        }), 400
+    
+    response = jsonify({
+        'query': query,
+        'suggestions': manager.current.suggest_skills(query, limit)
+    })
+    response.cache_control.public = True
+    response.cache_control.max_age = SKILLS_MAX_AGE
+    return response
+
+@app.route('/api/admin/reload', methods=['POST'])
+def reload_predictor():
+    """Rebuild the predictor from the artifacts on disk and swap it in"""
+    if not is_admin_request():
+        return jsonify({
+            'error': 'Forbidden'
+        }), 403
+    
+    wait = request.args.get('wait', '').lower() in ('1', 'true', 'yes')
+    started = manager.reload(wait=wait)
+    if wait:
+        status_code = 200 if started else 409 if manager.reloading else 500
+    else:
+        status_code = 202 if started else 409
+    return jsonify(manager.status()), status_code
+
+@app.route('/api/admin/profile', methods=['POST'])
+def sample_profile():
+    """
+    Sample the stacks of requests served for ?seconds= and write folded
+    stacks. Every worker that has served a request joins the run through
+    PROFILE_CONTROL_DIR; this one merges their stacks into one file.
+    """
+    if not (PROFILING_ENABLED and is_admin_request()):
+        return jsonify({
+            'error': 'Forbidden'
+        }), 403
+    
+    seconds = request.args.get('seconds', 10, type=float)
+    if seconds is None or not 0 < seconds <= MAX_SAMPLE_SECONDS:
+        return jsonify({
+            'error': f'seconds must be between 0 and {MAX_SAMPLE_SECONDS}'
+        }), 400
+    all_threads = request.args.get('threads', '').lower() == 'all'
+    if not sampler.start(seconds, all_threads=all_threads):
+        return jsonify({
+            'error': 'A profile is already being sampled'
+        }), 409
+    
+    if request.args.get('wait', '').lower() in ('1', 'true', 'yes'):
+        run = sampler.wait()
+        if not run.get('file'):
+            return jsonify(run), 500
+        with open(run['file']) as f:
+            return Response(f.read(), mimetype='text/plain')
+    return jsonify({
+        'status': 'sampling',
+        'seconds': seconds
+    }), 202
+
+@app.route('/api/admin/profile', methods=['GET'])
+def sample_profile_status():
+    """State of the sampling profiler and the file of its last run"""
+    if not (PROFILING_ENABLED and is_admin_request()):
+        return jsonify({
+            'error': 'Forbidden'
+        }), 403
     return jsonify({
-        'skills': skills
+        'running': sampler.running,
+        'lastRun': sampler.last_run
     })
 
+@app.route('/metrics', methods=['GET'])
+def metrics():
+    """Prometheus metrics, aggregated over all workers"""
+    return Response(METRICS.render(), mimetype='text/plain; version=0.0.4')
+
 if __name__ == '__main__':
     app.run(host='0.0.0.0', port=5001, debug=True)
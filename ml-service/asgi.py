@@ -0,0 +1,224 @@
+"""
+ASGI serving mode with request micro-batching.
+
+    gunicorn -k uvicorn.workers.UvicornWorker asgi:app
+
+Concurrent POST /api/predict calls are gathered for up to
+MICROBATCH_WINDOW_MS (or until MICROBATCH_MAX_SIZE are waiting) and scored
+together with one CareerPredictor.predict_many call, which vectorizes the
+TF-IDF pass. Every other route is served by the Flask app in a thread.
+"""
+import asyncio
+import io
+import json
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from app import app as flask_app, manager
+from fast_json import dumps
+from metrics import METRICS, SIZE_BUCKETS
+from predictor import REQUIRED_FIELDS
+
+# How long the first request of a batch waits for company, and the batch
+# size that is dispatched right away
+MICROBATCH_WINDOW = float(os.environ.get('MICROBATCH_WINDOW_MS', 5)) / 1000
+MICROBATCH_MAX_SIZE = int(os.environ.get('MICROBATCH_MAX_SIZE', 64))
+
+METRICS.histogram('ml_microbatch_size', 'Predict requests scored together in one micro-batch', SIZE_BUCKETS)
+METRICS.histogram('ml_microbatch_wait_seconds', 'Time a predict request waited for its micro-batch to be dispatched')
+
+
+class MicroBatcher:
+    """
+    Collects profiles submitted from the event loop and scores them in
+    batches on a single background thread. Batches run one at a time, so
+    requests arriving while one is scored form the next batch.
+    """
+
+    def __init__(self, predict_many, window=MICROBATCH_WINDOW, max_size=MICROBATCH_MAX_SIZE):
+        self.predict_many = predict_many
+        self.window = window
+        self.max_size = max(max_size, 1)
+        self._pending = []
+        self._timer = None
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='microbatch')
+
+    async def submit(self, profile):
+        """Queue one profile and wait for its entry of the batch result"""
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append((profile, future, time.perf_counter()))
+        if len(self._pending) >= self.max_size:
+            self._dispatch()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.window, self._dispatch)
+        return await future
+
+    def _dispatch(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        batch, self._pending = self._pending, []
+        if not batch:
+            return
+
+        dispatched = time.perf_counter()
+        METRICS.observe('ml_microbatch_size', len(batch))
+        for _, _, queued in batch:
+            METRICS.observe('ml_microbatch_wait_seconds', dispatched - queued)
+        asyncio.get_running_loop().create_task(self._run(batch))
+
+    async def _run(self, batch):
+        loop = asyncio.get_running_loop()
+        try:
+            results = await loop.run_in_executor(
+                self._executor, self.predict_many, [profile for profile, _, _ in batch]
+            )
+        except Exception as e:
+            for _, future, _ in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        # Callers that disconnected have had their futures cancelled
+        for (_, future, _), result in zip(batch, results):
+            if not future.done():
+                future.set_result(result)
+
+    def close(self):
+        self._executor.shutdown(wait=False)
+
+
+# predict_many is looked up per batch so hot reloads take effect
+batcher = MicroBatcher(lambda profiles: manager.current.predict_many(profiles))
+
+
+async def read_body(receive):
+    chunks = []
+    while True:
+        message = await receive()
+        chunks.append(message.get('body', b''))
+        if not message.get('more_body'):
+            return b''.join(chunks)
+
+
+async def send_json(send, status, payload):
+    body = dumps(payload)
+    await send({
+        'type': 'http.response.start',
+        'status': status,
+        'headers': [
+            (b'content-type', b'application/json'),
+            (b'content-length', str(len(body)).encode()),
+            # Same as Flask-CORS adds to the routes it serves
+            (b'access-control-allow-origin', b'*')
+        ]
+    })
+    await send({'type': 'http.response.body', 'body': body})
+
+
+async def predict(scope, receive, send):
+    """POST /api/predict, answered through the micro-batcher"""
+    start = time.perf_counter()
+    METRICS.start_publisher()
+    status, payload = 200, None
+    try:
+        data = json.loads(await read_body(receive) or b'null')
+    except ValueError:
+        status, payload = 400, {'error': 'Request body must be JSON'}
+    else:
+        if not isinstance(data, dict):
+            status, payload = 400, {'error': 'Request body must be a JSON object'}
+        else:
+            for field in REQUIRED_FIELDS:
+                if field not in data:
+                    status, payload = 400, {'error': f'Missing required field: {field}'}
+                    break
+
+    if payload is None:
+        try:
+            payload = await batcher.submit({field: data[field] for field in REQUIRED_FIELDS + ['engine'] if field in data})
+            if 'message' in payload:
+                status, payload = 500, {'error': 'Internal server error', 'message': payload['message']}
+            elif 'error' in payload:
+                status = 400
+        except Exception as e:
+            print(f"Prediction error: {str(e)}")
+            status, payload = 500, {'error': 'Internal server error', 'message': str(e)}
+
+    await send_json(send, status, payload)
+    METRICS.observe('ml_request_duration_seconds', time.perf_counter() - start, endpoint='/api/predict')
+    METRICS.inc('ml_requests_total', endpoint='/api/predict', method='POST', status=str(status))
+
+
+def wsgi_environ(scope, body):
+    """WSGI environ for an ASGI HTTP scope"""
+    server = scope.get('server') or ('localhost', 80)
+    environ = {
+        'REQUEST_METHOD': scope['method'],
+        'SCRIPT_NAME': scope.get('root_path', ''),
+        'PATH_INFO': scope['path'],
+        'QUERY_STRING': scope.get('query_string', b'').decode('latin-1'),
+        'SERVER_NAME': server[0],
+        'SERVER_PORT': str(server[1]),
+        'SERVER_PROTOCOL': f"HTTP/{scope.get('http_version', '1.1')}",
+        'REMOTE_ADDR': (scope.get('client') or ('', 0))[0],
+        'wsgi.version': (1, 0),
+        'wsgi.url_scheme': scope.get('scheme', 'http'),
+        'wsgi.input': io.BytesIO(body),
+        'wsgi.errors': sys.stderr,
+        'wsgi.multithread': True,
+        'wsgi.multiprocess': True,
+        'wsgi.run_once': False
+    }
+    for name, value in scope.get('headers', []):
+        name = name.decode('latin-1').upper().replace('-', '_')
+        value = value.decode('latin-1')
+        if name not in ('CONTENT_TYPE', 'CONTENT_LENGTH'):
+            name = f'HTTP_{name}'
+        environ[name] = f'{environ[name]},{value}' if name in environ else value
+    return environ
+
+
+async def call_flask(scope, receive, send):
+    """Serve a request with the Flask app on the default thread pool"""
+    environ = wsgi_environ(scope, await read_body(receive))
+    response = {}
+
+    def start_response(status, headers, exc_info=None):
+        response['status'] = int(status.split(' ', 1)[0])
+        response['headers'] = headers
+
+    def run():
+        chunks = flask_app(environ, start_response)
+        try:
+            return b''.join(chunks)
+        finally:
+            if hasattr(chunks, 'close'):
+                chunks.close()
+
+    body = await asyncio.get_running_loop().run_in_executor(None, run)
+    await send({
+        'type': 'http.response.start',
+        'status': response['status'],
+        'headers': [(name.lower().encode('latin-1'), value.encode('latin-1')) for name, value in response['headers']]
+    })
+    await send({'type': 'http.response.body', 'body': body})
+
+
+async def app(scope, receive, send):
+    if scope['type'] == 'lifespan':
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                batcher.close()
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+    if scope['type'] != 'http':
+        return
+    if scope['path'] == '/api/predict' and scope['method'] == 'POST':
+        await predict(scope, receive, send)
+    else:
+        await call_flask(scope, receive, send)
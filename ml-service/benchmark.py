@@ -0,0 +1,357 @@
+"""
+Microbenchmarks for the predictor hot paths on synthetic catalogs and profiles.
+
+    python benchmark.py --output results.json
+    python benchmark.py --sizes 21,1000 --compare baseline.json
+
+Every run is seeded, so two runs on the same machine time the same work.
+With --compare, throughput that dropped (or memory that grew) by more than
+--tolerance against the baseline file is reported and the exit code is 1.
+"""
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+import numpy as np
+from catalog import RoleCatalog
+from data_constants import EXTENDED_SKILL_MAPPING, SKILL_SYNONYMS
+from fast_json import dumps
+from prediction_cache import PredictionCache
+from predictor import CareerPredictor, TOP_N_RECOMMENDATIONS
+from skill_embeddings import EmbeddingRanker, learn_embeddings, quantize
+
+DEFAULT_SIZES = [21, 1000, 10000, 50000]
+DEFAULT_PROFILES = 200
+DEFAULT_REPEAT = 3
+DEFAULT_SEED = 42
+DEFAULT_TOLERANCE = 0.25
+MAX_PROFILE_SKILLS = 100
+# Operations replayed under tracemalloc to measure per-benchmark peak memory
+MEMORY_SAMPLE = 50
+
+# Imported by a fresh service process only if something pulls them in;
+# serving needs none of them
+HEAVY_MODULES = ['sklearn', 'joblib', 'pandas']
+
+# Run in a fresh interpreter by cold_start; prints its measurements as the
+# last line of output
+COLD_START_SCRIPT = """
+import json, resource, sys, time
+started = time.perf_counter()
+import app
+imported = time.perf_counter()
+app.app.test_client().post('/api/predict', json={'degree': 'Computer Science', 'skills': ['Python', 'SQL'], 'experience': 2})
+answered = time.perf_counter()
+print(json.dumps({
+    'import_seconds': round(imported - started, 3),
+    'first_request_ms': round((answered - imported) * 1000, 2),
+    'max_rss_kb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+    'heavy_modules': [name for name in %r if name in sys.modules]
+}))
+"""
+
+# Which way is better for every recorded number
+HIGHER_IS_BETTER = {'ops_per_sec': True, 'build_seconds': False, 'peak_kb': False}
+
+
+def synthetic_catalog(n_roles, rng):
+    """
+    The built-in catalog for n_roles <= 21, otherwise synthetic roles with
+    10-30 skills each drawn with Zipf-like popularity from the real skills
+    plus generated ones, so a few skills appear everywhere and most are rare.
+    """
+    if n_roles <= len(EXTENDED_SKILL_MAPPING):
+        roles = list(EXTENDED_SKILL_MAPPING)[:n_roles]
+        return {role: EXTENDED_SKILL_MAPPING[role] for role in roles}
+
+    real_skills = sorted({s for skills in EXTENDED_SKILL_MAPPING.values() for s in skills})
+    n_synthetic = max(n_roles // 5, 100)
+    vocabulary = real_skills + [f'Skill {i}' for i in range(n_synthetic)]
+    popularity = 1.0 / np.arange(1, len(vocabulary) + 1)
+    popularity /= popularity.sum()
+
+    mapping = {}
+    for i in range(n_roles):
+        count = int(rng.integers(10, 31))
+        picks = rng.choice(len(vocabulary), size=count, replace=False, p=popularity)
+        mapping[f'Role {i}'] = [vocabulary[j] for j in picks]
+    return mapping
+
+
+def _misspell(skill, rng):
+    if len(skill) < 5:
+        return skill
+    pos = int(rng.integers(1, len(skill) - 1))
+    return skill[:pos] + skill[pos + 1:]
+
+
+def synthetic_profiles(mapping, n_profiles, rng):
+    """
+    Profiles with 1-100 skills: mostly catalog skills, plus synonym
+    variants, misspellings and skills no role asks for.
+    """
+    catalog_skills = sorted({s for skills in mapping.values() for s in skills})
+    variants = sorted(v for values in SKILL_SYNONYMS.values() for v in values)
+    degrees = ['Computer Science', 'Information Technology', 'Data Science', 'Business', 'Other']
+
+    profiles = []
+    for _ in range(n_profiles):
+        n_skills = int(rng.integers(1, MAX_PROFILE_SKILLS + 1))
+        skills = []
+        for kind in rng.choice(4, size=n_skills, p=[0.7, 0.1, 0.1, 0.1]):
+            if kind == 0:
+                skills.append(catalog_skills[int(rng.integers(len(catalog_skills)))])
+            elif kind == 1:
+                skills.append(variants[int(rng.integers(len(variants)))])
+            elif kind == 2:
+                skills.append(_misspell(catalog_skills[int(rng.integers(len(catalog_skills)))], rng))
+            else:
+                skills.append(f'Unlisted Skill {int(rng.integers(10 ** 6))}')
+        profiles.append({
+            'degree': degrees[int(rng.integers(len(degrees)))],
+            'skills': skills,
+            'experience': int(rng.integers(0, 15))
+        })
+    return profiles
+
+
+def _time_ops(operations, repeat):
+    """Best-of-repeat throughput and per-op latency percentiles"""
+    operations[0]()
+    best = None
+    latencies = []
+    for _ in range(repeat):
+        run = []
+        start = time.perf_counter()
+        for operation in operations:
+            op_start = time.perf_counter()
+            operation()
+            run.append(time.perf_counter() - op_start)
+        elapsed = time.perf_counter() - start
+        if best is None or elapsed < best:
+            best, latencies = elapsed, run
+
+    latencies = np.array(latencies) * 1e6
+    return {
+        'ops': len(operations),
+        'ops_per_sec': round(len(operations) / best, 2),
+        'p50_us': round(float(np.percentile(latencies, 50)), 2),
+        'p99_us': round(float(np.percentile(latencies, 99)), 2)
+    }
+
+
+def _peak_kb(operations):
+    """Peak traced allocation while replaying a sample of the operations"""
+    tracemalloc.start()
+    try:
+        for operation in operations[:MEMORY_SAMPLE]:
+            operation()
+        return round(tracemalloc.get_traced_memory()[1] / 1024, 1)
+    finally:
+        tracemalloc.stop()
+
+
+def bench_catalog(n_roles, n_profiles, repeat, seed):
+    """Build a predictor over a synthetic catalog and time each hot path"""
+    rng = np.random.default_rng([seed, n_roles])
+    mapping = synthetic_catalog(n_roles, rng)
+    profiles = synthetic_profiles(mapping, n_profiles, rng)
+
+    # A scratch model dir keeps the shipped index artifact untouched, and a
+    # disabled cache makes every predict do the full work
+    with tempfile.TemporaryDirectory() as model_path:
+        tracemalloc.start()
+        start = time.perf_counter()
+        predictor = CareerPredictor(
+            model_path=model_path,
+            cache=PredictionCache(max_size=0),
+            catalog=RoleCatalog(mapping, {}, {})
+        )
+        build_seconds = time.perf_counter() - start
+        build_peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+
+    recommender = predictor.recommender
+    start = time.perf_counter()
+    terms, vectors = learn_embeddings(recommender)
+    embeddings = EmbeddingRanker(recommender, terms, *quantize(vectors))
+    embeddings.recommend_prepared(['python'])
+    embedding_seconds = time.perf_counter() - start
+    top_roles = [
+        (recommender.recommend(p['skills'], top_n=1) or [{'role': 'Generalist'}])[0]['role']
+        for p in profiles
+    ]
+    prepared = [recommender.prepare_user_skills(p['skills']) for p in profiles]
+    recommendations = [recommender.recommend_prepared(skills, TOP_N_RECOMMENDATIONS) for skills in prepared]
+    benchmarks = {
+        'normalize_skill': [
+            (lambda s=skill: predictor.normalize_skill(s))
+            for p in profiles for skill in p['skills']
+        ],
+        'recommend': [
+            (lambda p=p: recommender.recommend(p['skills'], top_n=TOP_N_RECOMMENDATIONS))
+            for p in profiles
+        ],
+        'recommend_embedding': [
+            (lambda p=p: embeddings.recommend_prepared(
+                recommender.prepare_user_skills(p['skills']), top_n=TOP_N_RECOMMENDATIONS
+            ))
+            for p in profiles
+        ],
+        'analyze_skill_gap': [
+            (lambda p=p, role=role: predictor.analyze_skill_gap(p['skills'], role, p['experience']))
+            for p, role in zip(profiles, top_roles)
+        ],
+        'suggest_skills': [
+            (lambda q=skill[:1 + len(skill) % 4]: predictor.suggest_skills(q))
+            for p in profiles for skill in p['skills']
+        ],
+        'respond': [
+            (lambda p=p, skills=skills, recs=recs: dumps(predictor._assemble_prediction(
+                predictor.predict_with_tfidf(p['degree'], p['skills'], p['experience'], recommendations=recs),
+                p['skills'], p['experience'], skills
+            )))
+            for p, skills, recs in zip(profiles, prepared, recommendations)
+        ],
+        'predict': [
+            (lambda p=p: predictor.predict(p['degree'], p['skills'], p['experience']))
+            for p in profiles
+        ]
+    }
+
+    results = {
+        'build': {
+            'build_seconds': round(build_seconds, 4),
+            'peak_kb': round(build_peak / 1024, 1),
+            'embedding_build_seconds': round(embedding_seconds, 4),
+            # Memory each engine scores against: the sparse role matrix and
+            # its postings, or the int8 skill codes plus the dense role vectors
+            'tfidf_kb': round(sum(
+                m.data.nbytes + m.indices.nbytes + m.indptr.nbytes
+                for m in (recommender.tfidf_matrix, recommender.postings)
+            ) / 1024, 1),
+            'embedding_kb': round(
+                (embeddings.codes.nbytes + embeddings.scales.nbytes + embeddings.role_matrix.nbytes) / 1024, 1
+            )
+        }
+    }
+    for name, operations in benchmarks.items():
+        results[name] = _time_ops(operations, repeat)
+        results[name]['peak_kb'] = _peak_kb(operations)
+    return results
+
+
+def run(sizes, n_profiles=DEFAULT_PROFILES, repeat=DEFAULT_REPEAT, seed=DEFAULT_SEED):
+    report = {
+        'meta': {
+            'python': platform.python_version(),
+            'numpy': np.__version__,
+            'machine': platform.machine(),
+            'profiles': n_profiles,
+            'repeat': repeat,
+            'seed': seed
+        },
+        'results': {}
+    }
+    for n_roles in sizes:
+        print(f"Benchmarking {n_roles} roles...", file=sys.stderr)
+        report['results'][str(n_roles)] = bench_catalog(n_roles, n_profiles, repeat, seed)
+    return report
+
+
+def cold_start(runs=DEFAULT_REPEAT):
+    """
+    Import time, first request latency and peak RSS of a fresh service
+    process serving the models in ./models, best of runs, and the heavy
+    modules it ended up importing
+    """
+    best = None
+    for _ in range(runs):
+        output = subprocess.run(
+            [sys.executable, '-c', COLD_START_SCRIPT % HEAVY_MODULES],
+            cwd=os.path.dirname(os.path.abspath(__file__)), capture_output=True, text=True, check=True
+        ).stdout
+        result = json.loads(output.strip().splitlines()[-1])
+        if best is None or result['import_seconds'] < best['import_seconds']:
+            best = result
+    return best
+
+
+def compare(report, baseline, tolerance=DEFAULT_TOLERANCE):
+    """Regressions of report against baseline, as human-readable lines"""
+    regressions = []
+    for size, benchmarks in report['results'].items():
+        for name, values in benchmarks.items():
+            reference = baseline.get('results', {}).get(size, {}).get(name)
+            if not reference:
+                continue
+            for metric, higher_is_better in HIGHER_IS_BETTER.items():
+                if metric not in values or not reference.get(metric):
+                    continue
+                change = values[metric] / reference[metric] - 1
+                if (-change if higher_is_better else change) > tolerance:
+                    regressions.append(
+                        f"{size} roles / {name} / {metric}: {reference[metric]} -> {values[metric]} ({change:+.0%})"
+                    )
+    return regressions
+
+
+def print_table(report):
+    print(f"{'roles':>7}  {'benchmark':<18} {'ops/s':>12} {'p50 us':>10} {'p99 us':>10} {'peak KB':>10}")
+    for size, benchmarks in report['results'].items():
+        for name, values in benchmarks.items():
+            if name == 'build':
+                print(f"{size:>7}  {'build':<18} {values['build_seconds']:>11.3f}s {'':>10} {'':>10} {values['peak_kb']:>10}")
+                continue
+            print(f"{size:>7}  {name:<18} {values['ops_per_sec']:>12} {values['p50_us']:>10} "
+                  f"{values['p99_us']:>10} {values['peak_kb']:>10}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmark the career predictor hot paths')
+    parser.add_argument('--sizes', default=','.join(map(str, DEFAULT_SIZES)),
+                        help='comma-separated catalog sizes (number of roles)')
+    parser.add_argument('--profiles', type=int, default=DEFAULT_PROFILES, help='synthetic profiles per catalog')
+    parser.add_argument('--repeat', type=int, default=DEFAULT_REPEAT, help='timed passes, the fastest is kept')
+    parser.add_argument('--seed', type=int, default=DEFAULT_SEED)
+    parser.add_argument('--output', help='write the JSON report to this file')
+    parser.add_argument('--compare', help='baseline JSON report to check for regressions')
+    parser.add_argument('--tolerance', type=float, default=DEFAULT_TOLERANCE,
+                        help='allowed relative slowdown or memory growth (0.25 = 25%%)')
+    parser.add_argument('--cold-start', action='store_true',
+                        help='also time importing the service and its first request in fresh processes')
+    args = parser.parse_args(argv)
+
+    sizes = [int(size) for size in args.sizes.split(',') if size.strip()]
+    report = run(sizes, args.profiles, args.repeat, args.seed)
+    print_table(report)
+    if args.cold_start:
+        report['cold_start'] = cold_start(args.repeat)
+        start = report['cold_start']
+        print(f"cold start: import {start['import_seconds']}s, first request {start['first_request_ms']} ms, "
+              f"peak RSS {start['max_rss_kb']} KB, heavy modules: {', '.join(start['heavy_modules']) or 'none'}")
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"SUCCESS: Report written to {args.output}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        regressions = compare(report, baseline, args.tolerance)
+        for line in regressions:
+            print(f"REGRESSION: {line}")
+        if regressions:
+            return 1
+        print(f"SUCCESS: No regressions beyond {args.tolerance:.0%} against {args.compare}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,289 @@
+"""
+Score exported profiles offline, e.g. every stored Analysis after a
+catalog change, without going through the HTTP API.
+
+    mongoexport --db career --collection analyses | python bulk_score.py - -o scored.jsonl
+    python bulk_score.py analyses.jsonl -o scored.csv --format csv --workers 8
+    python bulk_score.py analyses.jsonl -o scored.jsonl --resume
+
+Input lines are profiles ({"degree", "skills", "experience"}) or Analysis
+documents, whose inputData is scored and whose _id is carried over. Chunks
+of lines go to a pool of processes that each hold one CareerPredictor.
+Results are written in input order with at most CHUNKS_PER_WORKER chunks
+per worker in flight, so memory stays bounded however large the input is.
+After every written chunk the input and output offsets are checkpointed
+next to the output file; --resume continues from the last checkpoint.
+"""
+import argparse
+import csv
+import io
+import json
+import os
+import sys
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import redirect_stdout
+from fast_json import dumps
+
+DEFAULT_CHUNK_SIZE = 1000
+# Chunks queued or running per worker before more input is read
+CHUNKS_PER_WORKER = 2
+# Seconds between progress lines on stderr
+REPORT_INTERVAL = 10
+CSV_COLUMNS = ['line', 'id', 'careerRole', 'probability', 'confidence', 'overallMatch', 'alternatives', 'error']
+
+# The predictor of this process, loaded once by _load_predictor
+_predictor = None
+
+
+def _load_predictor(model_path):
+    """Load the predictor this process scores every chunk with"""
+    global _predictor
+    from predictor import CareerPredictor
+    _predictor = CareerPredictor(model_path=model_path)
+
+
+def _init_worker(model_path):
+    from threadpoolctl import threadpool_limits
+    # Predictor logs must not end up in output written to stdout
+    sys.stdout = sys.stderr
+    # Workers are the parallelism; BLAS threads would only compete with them
+    threadpool_limits(1)
+    _load_predictor(model_path)
+
+
+def parse_record(line, engine):
+    """(id, profile) of one input line; raises ValueError if it is not a JSON object"""
+    from predictor import REQUIRED_FIELDS
+    record = json.loads(line)
+    if not isinstance(record, dict):
+        raise ValueError('Line is not a JSON object')
+    record_id = record.get('_id', record.get('id'))
+    if isinstance(record_id, dict):
+        # Extended JSON from mongoexport: {"$oid": "..."}
+        record_id = record_id.get('$oid', record_id)
+    source = record.get('inputData', record)
+    if not isinstance(source, dict):
+        raise ValueError('inputData is not an object')
+    profile = {field: source[field] for field in REQUIRED_FIELDS + ['engine'] if field in source}
+    if engine is not None:
+        profile.setdefault('engine', engine)
+    return record_id, profile
+
+
+def _csv_row(entry):
+    result = entry.get('result') or {}
+    prediction = result.get('prediction', {})
+    return [
+        entry['line'],
+        entry.get('id') if entry.get('id') is not None else '',
+        prediction.get('careerRole', ''),
+        prediction.get('probability', ''),
+        prediction.get('confidence', ''),
+        result.get('skillGap', {}).get('overallMatch', ''),
+        ';'.join(item['role'] for item in prediction.get('alternativeCareers', [])),
+        entry.get('error', '')
+    ]
+
+
+def score_chunk(task):
+    """
+    Score the lines of one chunk with this process's predictor. Returns
+    the encoded output and the number of scored and failed lines.
+    """
+    first_line, lines, output_format, engine = task
+    entries = []
+    profiles = []
+    for number, line in enumerate(lines, first_line):
+        if not line.strip():
+            continue
+        entry = {'line': number}
+        try:
+            entry['id'], profile = parse_record(line, engine)
+        except ValueError as e:
+            entry['error'] = f'Invalid input: {e}'
+            entries.append((entry, None))
+            continue
+        entries.append((entry, len(profiles)))
+        profiles.append(profile)
+
+    results = _predictor.predict_many(profiles)
+    errors = 0
+    for entry, position in entries:
+        if position is None:
+            errors += 1
+        elif 'error' in results[position]:
+            errors += 1
+            # Keep the exception text predict_many reports with 'Prediction failed'
+            message = results[position].get('message')
+            entry['error'] = f"{results[position]['error']}: {message}" if message else results[position]['error']
+        else:
+            entry['result'] = results[position]
+
+    if output_format == 'csv':
+        buffer = io.StringIO()
+        csv.writer(buffer, lineterminator='\n').writerows(_csv_row(entry) for entry, _ in entries)
+        payload = buffer.getvalue().encode('utf-8')
+    else:
+        payload = b''.join(dumps(entry) + b'\n' for entry, _ in entries)
+    return payload, len(entries) - errors, errors
+
+
+def read_chunks(stream, chunk_size, first_line=1, offset=0):
+    """(first line number, input offset, lines) for each chunk of a binary stream"""
+    lines = []
+    for line in stream:
+        lines.append(line)
+        if len(lines) == chunk_size:
+            yield first_line, offset, lines
+            first_line += len(lines)
+            offset += sum(map(len, lines))
+            lines = []
+    if lines:
+        yield first_line, offset, lines
+
+
+def _ordered_results(tasks, workers, model_path):
+    """
+    (task, result) of every task in order. A pool keeps at most
+    CHUNKS_PER_WORKER tasks per worker pending: input is only read as fast
+    as results are written.
+    """
+    if workers <= 1:
+        _load_predictor(model_path)
+        for task in tasks:
+            yield task, score_chunk(task[1])
+        return
+
+    with ProcessPoolExecutor(workers, initializer=_init_worker, initargs=(model_path,)) as pool:
+        pending = deque()
+        for task in tasks:
+            pending.append((task, pool.submit(score_chunk, task[1])))
+            if len(pending) >= workers * CHUNKS_PER_WORKER:
+                task, future = pending.popleft()
+                yield task, future.result()
+        while pending:
+            task, future = pending.popleft()
+            yield task, future.result()
+
+
+def _write_checkpoint(path, state):
+    tmp_path = f'{path}.{os.getpid()}.tmp'
+    with open(tmp_path, 'w') as f:
+        json.dump(state, f)
+    os.replace(tmp_path, path)
+
+
+def bulk_score(input_path, output_path=None, output_format='jsonl', workers=1, chunk_size=DEFAULT_CHUNK_SIZE,
+               model_path='models/', engine=None, resume=False, limit=None, report_interval=REPORT_INTERVAL):
+    """
+    Score input_path ('-' for stdin) into output_path (stdout if None).
+    With resume, continue after the lines recorded in the output's
+    checkpoint. limit stops after that many input lines in total. Returns
+    the final checkpoint state.
+    """
+    checkpoint_path = f'{output_path}.checkpoint' if output_path else None
+    state = {'lines': 0, 'input_offset': 0, 'output_offset': 0, 'scored': 0, 'errors': 0}
+    if resume:
+        if not output_path:
+            raise ValueError('--resume needs an output file')
+        if os.path.exists(checkpoint_path):
+            with open(checkpoint_path) as f:
+                state = json.load(f)
+    if limit is not None and state['lines'] >= limit:
+        return state
+
+    if input_path == '-':
+        source = sys.stdin.buffer
+        # A pipe cannot seek, so already scored lines are read and dropped
+        for _ in range(state['lines']):
+            if not source.readline():
+                break
+    else:
+        source = open(input_path, 'rb')
+        source.seek(state['input_offset'])
+
+    if output_path:
+        # Anything written after the checkpoint belongs to chunks that are
+        # scored again, so it is cut off
+        output = open(output_path, 'r+b' if resume and os.path.exists(output_path) else 'wb')
+        output.seek(state['output_offset'])
+        output.truncate()
+    else:
+        output = sys.stdout.buffer
+    if output_format == 'csv' and state['output_offset'] == 0:
+        output.write((','.join(CSV_COLUMNS) + '\n').encode('utf-8'))
+
+    def tasks():
+        for first_line, offset, lines in read_chunks(source, chunk_size, state['lines'] + 1, state['input_offset']):
+            if limit is not None:
+                lines = lines[:limit - first_line + 1]
+            # Checkpoint after the chunk: its last line and the offset following it
+            yield (first_line + len(lines) - 1, offset + sum(map(len, lines))), \
+                (first_line, lines, output_format, engine)
+            if limit is not None and first_line + len(lines) > limit:
+                return
+
+    started = time.perf_counter()
+    last_report = started
+    done = 0
+    try:
+        # Everything but the scored output goes to stderr
+        with redirect_stdout(sys.stderr):
+            for (checkpoint, _), (payload, scored, errors) in _ordered_results(tasks(), workers, model_path):
+                output.write(payload)
+                output.flush()
+                done += scored + errors
+                state['scored'] += scored
+                state['errors'] += errors
+                state['lines'], state['input_offset'] = checkpoint
+                if checkpoint_path:
+                    state['output_offset'] = output.tell()
+                    _write_checkpoint(checkpoint_path, state)
+
+                now = time.perf_counter()
+                if now - last_report >= report_interval:
+                    last_report = now
+                    print(f"{state['lines']} lines, {done / (now - started):.0f} profiles/s, "
+                          f"{state['errors']} errors", file=sys.stderr)
+    finally:
+        if source is not sys.stdin.buffer:
+            source.close()
+        if output is not sys.stdout.buffer:
+            output.close()
+
+    elapsed = time.perf_counter() - started
+    print(f"SUCCESS: Scored {done} profiles in {elapsed:.1f}s ({done / max(elapsed, 1e-9):.0f}/s), "
+          f"{state['errors']} errors overall", file=sys.stderr)
+    return state
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Score a JSONL export of profiles with a process pool')
+    parser.add_argument('input', help="JSONL file of profiles or Analysis documents, '-' for stdin")
+    parser.add_argument('-o', '--output', help='output file (default: stdout)')
+    parser.add_argument('--format', choices=['jsonl', 'csv'], default='jsonl',
+                        help='full predictions as JSONL, or one CSV row of headline columns per profile. '
+                             'CSV is row-oriented, not columnar: it stands in for Parquet so output can be '
+                             'streamed, checkpointed by byte offset and resumed without adding pyarrow')
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1, help='scoring processes')
+    parser.add_argument('--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE, help='lines per task')
+    parser.add_argument('--model-path', default='models/')
+    parser.add_argument('--engine', choices=['tfidf', 'embedding'],
+                        help='ranking engine for profiles that do not name one')
+    parser.add_argument('--resume', action='store_true', help='continue from the output file checkpoint')
+    parser.add_argument('--limit', type=int, help='stop after this many input lines')
+    args = parser.parse_args(argv)
+
+    try:
+        bulk_score(args.input, args.output, args.format, args.workers, args.chunk_size,
+                   args.model_path, args.engine, args.resume, args.limit)
+    except (OSError, ValueError) as e:
+        print(f"ERROR: {e}", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
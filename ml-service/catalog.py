@@ -0,0 +1,162 @@
+import csv
+import json
+from data_constants import EXTENDED_SKILL_MAPPING, SALARY_DATA, DEGREE_MAP
+
+# Separators accepted for list-valued CSV columns (skills, degrees)
+LIST_SEPARATORS = (';', '|')
+
+
+class CatalogError(ValueError):
+    """Raised for a malformed catalog row"""
+
+
+class RoleCatalog:
+    """
+    Roles with their required skills, salary bands and the degrees that
+    lead to them. Defaults to the constants in data_constants, but can be
+    streamed from JSONL/CSV files and changed at runtime.
+    """
+
+    def __init__(self, skill_mapping=None, salary_data=None, degree_map=None):
+        self.skill_mapping = {role: list(skills) for role, skills in (skill_mapping or {}).items()}
+        self.salary_data = {role: dict(salary) for role, salary in (salary_data or {}).items()}
+        self.degree_map = {degree: list(roles) for degree, roles in (degree_map or {}).items()}
+
+    @classmethod
+    def default(cls):
+        """Catalog built from the constants shipped with the service"""
+        return cls(EXTENDED_SKILL_MAPPING, SALARY_DATA, DEGREE_MAP)
+
+    def __contains__(self, role):
+        return role in self.skill_mapping
+
+    def __len__(self):
+        return len(self.skill_mapping)
+
+    def upsert(self, role, skills, salary=None, degrees=None):
+        """Add a role or replace its skills; salary and degrees are kept unless given"""
+        self.skill_mapping[role] = list(skills)
+        if salary is not None:
+            self.salary_data[role] = dict(salary)
+        for degree in degrees or []:
+            roles = self.degree_map.setdefault(degree, [])
+            if role not in roles:
+                roles.append(role)
+
+    def remove(self, role):
+        """Remove a role everywhere it is referenced; returns False if unknown"""
+        if role not in self.skill_mapping:
+            return False
+        del self.skill_mapping[role]
+        self.salary_data.pop(role, None)
+        for roles in self.degree_map.values():
+            if role in roles:
+                roles.remove(role)
+        return True
+
+    def apply_row(self, row):
+        """
+        Apply one parsed catalog row; returns the action that was applied,
+        or 'unknown' for the removal of a role the catalog does not have
+        """
+        if row['action'] == 'remove':
+            if not self.remove(row['role']):
+                return 'unknown'
+        else:
+            self.upsert(row['role'], row['skills'], row['salary'], row['degrees'])
+        return row['action']
+
+
+def _split_list(value):
+    """Split a list-valued cell, accepting JSON arrays or separated strings"""
+    if value is None:
+        return []
+    if isinstance(value, list):
+        return [str(v).strip() for v in value if str(v).strip()]
+    value = str(value).strip()
+    if not value:
+        return []
+    for separator in LIST_SEPARATORS:
+        if separator in value:
+            return [v.strip() for v in value.split(separator) if v.strip()]
+    return [value]
+
+
+def _parse_salary(row):
+    """Salary band from either a nested 'salary' object or flat salary_* columns"""
+    salary = row.get('salary')
+    if not isinstance(salary, dict):
+        salary = {
+            'min': row.get('salary_min'),
+            'max': row.get('salary_max'),
+            'avg': row.get('salary_avg')
+        }
+    if salary.get('min') in (None, '') or salary.get('max') in (None, ''):
+        return None
+    low, high = int(float(salary['min'])), int(float(salary['max']))
+    avg = salary.get('avg')
+    return {
+        'min': low,
+        'max': high,
+        'avg': int(float(avg)) if avg not in (None, '') else (low + high) // 2
+    }
+
+
+def parse_row(row):
+    """Validate and normalize a raw JSONL object or CSV record"""
+    role = str(row.get('role') or '').strip()
+    if not role:
+        raise CatalogError('Missing required field: role')
+    action = str(row.get('action') or 'upsert').strip().lower()
+    if action not in ('upsert', 'remove'):
+        raise CatalogError(f'Unknown action: {action}')
+
+    skills = _split_list(row.get('skills'))
+    if action == 'upsert' and not skills:
+        raise CatalogError(f'Role {role} has no skills')
+
+    try:
+        salary = _parse_salary(row)
+    except (TypeError, ValueError):
+        raise CatalogError(f'Role {role} has an invalid salary')
+
+    return {
+        'action': action,
+        'role': role,
+        'skills': skills,
+        'salary': salary,
+        'degrees': _split_list(row.get('degrees'))
+    }
+
+
+def iter_catalog_rows(path):
+    """
+    Stream parsed rows from a .jsonl or .csv catalog file, one at a time.
+    Malformed rows are reported and skipped rather than aborting the load.
+    """
+    is_csv = path.lower().endswith('.csv')
+    with open(path, 'r', newline='' if is_csv else None, encoding='utf-8') as f:
+        if is_csv:
+            records = ((i + 2, record) for i, record in enumerate(csv.DictReader(f)))
+        else:
+            records = (
+                (line_no, line) for line_no, line in enumerate(f, start=1) if line.strip()
+            )
+
+        for line_no, record in records:
+            try:
+                if not is_csv:
+                    record = json.loads(record)
+                    if not isinstance(record, dict):
+                        raise CatalogError('Row must be an object')
+                yield parse_row(record)
+            except (CatalogError, json.JSONDecodeError) as e:
+                print(f"WARNING: Skipping catalog row {path}:{line_no} - {e}")
+
+
+def load_catalog(path):
+    """Build a catalog by streaming a JSONL/CSV file"""
+    catalog = RoleCatalog()
+    for row in iter_catalog_rows(path):
+        catalog.apply_row(row)
+    return catalog
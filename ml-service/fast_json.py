@@ -0,0 +1,49 @@
+"""
+JSON encoding for responses: orjson when it is installed, the standard
+library otherwise. Both sort keys and write compact separators, so the
+bytes clients receive do not depend on which encoder is available.
+"""
+import json
+from flask.json.provider import DefaultJSONProvider
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+if orjson is not None:
+    ORJSON_OPTIONS = orjson.OPT_SORT_KEYS | orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS
+
+
+def dumps(obj):
+    """Encode obj as compact, key-sorted UTF-8 JSON bytes"""
+    if orjson is not None:
+        try:
+            return orjson.dumps(obj, option=ORJSON_OPTIONS)
+        except TypeError:
+            # Types orjson does not know (Decimal, objects with __html__) take the slow path
+            pass
+    return json.dumps(obj, sort_keys=True, separators=(',', ':'), ensure_ascii=False,
+                      default=DefaultJSONProvider.default).encode('utf-8')
+
+
+def loads(data):
+    """Decode JSON bytes written by dumps"""
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+class FastJSONProvider(DefaultJSONProvider):
+    """Flask JSON provider whose jsonify() responses are encoded by dumps()"""
+
+    def dumps(self, obj, **kwargs):
+        if kwargs:
+            return super().dumps(obj, **kwargs)
+        return dumps(obj).decode('utf-8')
+
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        if self._app.debug:
+            return super().response(obj)
+        return self._app.response_class(dumps(obj) + b'\n', mimetype=self.mimetype)
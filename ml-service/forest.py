@@ -0,0 +1,222 @@
+"""
+Tree ensembles stored as flat numpy arrays that workers memory-map.
+
+    python forest.py models/
+
+exports the RandomForest/ExtraTrees model in models/career_model.pkl to
+models/forest/. train_model.py and search_models.py export tree models
+automatically; CareerPredictor prefers the export over the pickle, so
+every worker shares one page-cache copy of the trees instead of holding a
+private unpickled one. The export also carries the classes of the label
+encoders, so serving it needs neither joblib nor scikit-learn, and the
+checksum of the pickle it was made from: an export left behind by an
+earlier model is ignored.
+"""
+import os
+import sys
+import glob
+import json
+import uuid
+import shutil
+import hashlib
+import numpy as np
+
+FOREST_DIRNAME = 'forest'
+FOREST_MANIFEST = 'forest.json'
+# Bump whenever the stored arrays change meaning
+FOREST_FORMAT_VERSION = 1
+# Pickled model an export is made from and must still match
+MODEL_FILENAME = 'career_model.pkl'
+# Label encoders saved next to a model as <name>_encoder.pkl
+ENCODER_NAMES = ('degree', 'role', 'skills')
+# Rows traversed together; bounds the rows x trees x classes leaf block
+PREDICT_CHUNK_ROWS = 256
+
+
+def model_checksum(directory):
+    """sha256 of the pickled model in directory, None if there is none"""
+    path = os.path.join(directory, MODEL_FILENAME)
+    if not os.path.exists(path):
+        return None
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def export_forest(model, directory, encoders=None):
+    """
+    Write a fitted RandomForest/ExtraTrees classifier to directory/forest.
+    Nodes of all trees are concatenated; leaves point at themselves, so a
+    fixed number of steps lands every sample on its leaf. Leaf values are
+    stored as class probabilities. encoders maps names ('degree', 'role',
+    'skills') to fitted encoders whose classes_ are stored alongside.
+    Export after writing the model's pickle to directory: the export
+    records its checksum. Returns False for other models.
+    """
+    estimators = getattr(model, 'estimators_', None)
+    if not estimators or not all(hasattr(e, 'tree_') for e in estimators) or getattr(model, 'n_outputs_', 1) != 1:
+        return False
+
+    n_classes = len(model.classes_)
+    lefts, rights, features, thresholds, values, roots = [], [], [], [], [], []
+    offset = 0
+    for estimator in estimators:
+        tree = estimator.tree_
+        if tree.value.shape[2] != n_classes:
+            raise ValueError('Every tree must score all forest classes')
+        nodes = np.arange(tree.node_count)
+        leaf = tree.children_left == -1
+        lefts.append(np.where(leaf, nodes, tree.children_left) + offset)
+        rights.append(np.where(leaf, nodes, tree.children_right) + offset)
+        features.append(np.where(leaf, 0, tree.feature))
+        thresholds.append(tree.threshold)
+        counts = tree.value[:, 0, :]
+        values.append(counts / counts.sum(axis=1, keepdims=True))
+        roots.append(offset)
+        offset += tree.node_count
+
+    arrays = {
+        'left': np.concatenate(lefts).astype(np.int32),
+        'right': np.concatenate(rights).astype(np.int32),
+        'feature': np.concatenate(features).astype(np.int32),
+        'threshold': np.concatenate(thresholds).astype(np.float64),
+        'value': np.concatenate(values).astype(np.float32),
+        'roots': np.array(roots, dtype=np.int32)
+    }
+
+    forest_dir = os.path.join(directory, FOREST_DIRNAME)
+    os.makedirs(forest_dir, exist_ok=True)
+    # New files per export: rewriting a file another process has mapped
+    # would corrupt its trees
+    token = uuid.uuid4().hex[:12]
+    for name, array in arrays.items():
+        np.save(os.path.join(forest_dir, f'{token}.{name}.npy'), array)
+    manifest = {
+        'format_version': FOREST_FORMAT_VERSION,
+        'token': token,
+        'classes': model.classes_.tolist(),
+        'n_features': int(model.n_features_in_),
+        'feature_names': [str(name) for name in getattr(model, 'feature_names_in_', [])] or None,
+        'max_depth': max(int(estimator.tree_.max_depth) for estimator in estimators),
+        'encoders': {name: encoder.classes_.tolist() for name, encoder in (encoders or {}).items()},
+        'model_checksum': model_checksum(directory)
+    }
+    path = os.path.join(forest_dir, FOREST_MANIFEST)
+    tmp_path = f'{path}.{os.getpid()}.tmp'
+    with open(tmp_path, 'w') as f:
+        json.dump(manifest, f)
+    os.replace(tmp_path, path)
+
+    for stale in glob.glob(os.path.join(glob.escape(forest_dir), '*.npy')):
+        if not os.path.basename(stale).startswith(f'{token}.'):
+            try:
+                os.remove(stale)
+            except OSError:
+                pass
+    return True
+
+
+def remove_export(directory):
+    """Delete directory/forest, e.g. once a model that is not a tree ensemble replaces the one exported"""
+    shutil.rmtree(os.path.join(directory, FOREST_DIRNAME), ignore_errors=True)
+
+
+class EncoderClasses:
+    """
+    Stands in for a fitted LabelEncoder or MultiLabelBinarizer where only
+    its classes_ are read
+    """
+
+    def __init__(self, classes):
+        self.classes_ = np.array(classes)
+
+
+class ForestArrays:
+    """
+    predict_proba over an exported forest with numpy gathers: all trees
+    of a chunk of rows step down one level at a time. Quacks like the
+    sklearn classifier where the service needs it (classes_,
+    n_features_in_, feature_names_in_, predict_proba).
+    """
+
+    def __init__(self, arrays, manifest):
+        self.left = arrays['left']
+        self.right = arrays['right']
+        self.feature = arrays['feature']
+        self.threshold = arrays['threshold']
+        self.value = arrays['value']
+        self.roots = arrays['roots']
+        self.max_depth = manifest['max_depth']
+        self.classes_ = np.array(manifest['classes'])
+        self.n_features_in_ = manifest['n_features']
+        self.n_estimators = len(self.roots)
+        self.n_jobs = 1
+        if manifest.get('feature_names'):
+            self.feature_names_in_ = np.array(manifest['feature_names'], dtype=object)
+        # Exports written before encoders were stored have none
+        self.encoders = {name: EncoderClasses(classes) for name, classes in manifest.get('encoders', {}).items()}
+
+    @classmethod
+    def load(cls, directory):
+        """
+        Map the export in directory/forest read-only; None if there is
+        none, or if it was not made from the pickled model in directory
+        """
+        forest_dir = os.path.join(directory, FOREST_DIRNAME)
+        path = os.path.join(forest_dir, FOREST_MANIFEST)
+        if not os.path.exists(path):
+            return None
+        try:
+            with open(path) as f:
+                manifest = json.load(f)
+            if manifest.get('format_version') != FOREST_FORMAT_VERSION:
+                print(f"WARNING: Forest export {forest_dir} has an unsupported format version")
+                return None
+            if manifest.get('model_checksum') != model_checksum(directory):
+                print(f"WARNING: Forest export {forest_dir} does not match {MODEL_FILENAME}, using the pickle")
+                return None
+            arrays = {
+                name: np.load(os.path.join(forest_dir, f"{manifest['token']}.{name}.npy"),
+                              mmap_mode='r', allow_pickle=False)
+                for name in ('left', 'right', 'feature', 'threshold', 'value', 'roots')
+            }
+            return cls(arrays, manifest)
+        except Exception as e:
+            print(f"WARNING: Could not load forest export {forest_dir} - {e}")
+            return None
+
+    def predict_proba(self, X):
+        """Mean leaf class probabilities over all trees, like the sklearn forest"""
+        X = np.asarray(X, dtype=np.float32)
+        proba = np.empty((len(X), len(self.classes_)))
+        for start in range(0, len(X), PREDICT_CHUNK_ROWS):
+            rows = X[start:start + PREDICT_CHUNK_ROWS]
+            row_ids = np.arange(len(rows))[:, np.newaxis]
+            nodes = np.tile(self.roots, (len(rows), 1))
+            for _ in range(self.max_depth):
+                go_left = rows[row_ids, self.feature[nodes]] <= self.threshold[nodes]
+                nodes = np.where(go_left, self.left[nodes], self.right[nodes])
+            proba[start:start + len(rows)] = self.value[nodes].sum(axis=1, dtype=np.float64) / self.n_estimators
+        return proba
+
+
+def main(argv=None):
+    import joblib
+    argv = sys.argv[1:] if argv is None else argv
+    directory = argv[0] if argv else 'models'
+    model = joblib.load(os.path.join(directory, 'career_model.pkl'))
+    encoders = {
+        name: joblib.load(os.path.join(directory, f'{name}_encoder.pkl'))
+        for name in ENCODER_NAMES if os.path.exists(os.path.join(directory, f'{name}_encoder.pkl'))
+    }
+    if not export_forest(model, directory, encoders):
+        print(f"WARNING: {type(model).__name__} is not a tree ensemble, nothing exported")
+        return 1
+    print(f"SUCCESS: Exported {len(model.estimators_)} trees to {os.path.join(directory, FOREST_DIRNAME)}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
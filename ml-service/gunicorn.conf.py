@@ -0,0 +1,29 @@
+import os
+import tempfile
+
+# gunicorn reads this file from the working directory by default. Workers
+# publish their metrics to a shared directory so /metrics on any worker
+# reports totals for the whole server.
+os.environ.setdefault('METRICS_DIR', os.path.join(tempfile.gettempdir(), f'ml-service-metrics-{os.getpid()}'))
+# Sampling runs started on one worker are announced to the others here
+os.environ.setdefault('PROFILE_CONTROL_DIR', os.path.join(tempfile.gettempdir(), f'ml-service-profiler-{os.getpid()}'))
+
+
+def on_starting(server):
+    """Drop metrics left behind by a previous server using the same directory"""
+    from metrics import clear_metrics_dir
+    clear_metrics_dir(os.environ['METRICS_DIR'])
+
+# With GUNICORN_PRELOAD=1 the master imports the app and loads the model
+# once, and workers share its pages copy-on-write. Memory-mapped artifacts
+# (the recommender index and the exported forest) are shared either way;
+# preloading also shares the catalog and encoders. Workers then stop being
+# restartable one by one with new code, so it is off by default.
+preload_app = os.environ.get('GUNICORN_PRELOAD', '').lower() in ('1', 'true', 'yes')
+
+
+def post_fork(server, worker):
+    """Give preloaded workers their own artifact watcher thread"""
+    if preload_app:
+        from app import manager
+        manager.restart_watch()
@@ -0,0 +1,176 @@
+import os
+import threading
+import time
+from datetime import datetime
+from predictor import ROLE_CATALOG_PATH, artifact_paths
+
+# Profiles every freshly built predictor must answer before it is swapped in
+CANNED_REQUESTS = [
+    {'degree': 'Computer Science', 'skills': ['Python', 'Machine Learning', 'SQL'], 'experience': 2},
+    {'degree': 'Information Technology', 'skills': ['Docker', 'Kubernetes', 'AWS'], 'experience': 5},
+    {'degree': 'Business', 'skills': ['Agile', 'Communication', 'Jira'], 'experience': 0},
+    {'degree': 'Other', 'skills': ['Underwater Basket Weaving'], 'experience': 12},
+    {'degree': 'Other', 'skills': [], 'experience': 1}
+]
+
+# Prediction cache counters, and those of the shared cache under 'shared'
+CACHE_EVENTS = ('hits', 'misses', 'evictions', 'expirations', 'invalidations')
+SHARED_CACHE_EVENTS = ('hits', 'misses', 'leaseWaits', 'leaseTimeouts', 'writes', 'droppedWrites', 'errors')
+
+
+def cache_events(stats):
+    """Cache counters from cache.stats(), keyed by (cache, event) with cache 'local' or 'shared'"""
+    events = {('local', event): stats[event] for event in CACHE_EVENTS}
+    if 'shared' in stats:
+        events.update({('shared', event): stats['shared'][event] for event in SHARED_CACHE_EVENTS})
+    return events
+
+
+class ReloadValidationError(Exception):
+    """Raised when a freshly built predictor fails the canned request check"""
+
+
+def validate_predictor(predictor, requests=CANNED_REQUESTS):
+    """Run the canned requests and check every response is well formed"""
+    known_roles = set(predictor.recommender.roles) | {'Generalist'}
+    batch = predictor.predict_many(requests)
+    for profile, batch_result in zip(requests, batch):
+        result = predictor.predict(profile['degree'], profile['skills'], profile['experience'])
+        prediction = result.get('prediction', {})
+        if prediction.get('careerRole') not in known_roles:
+            raise ReloadValidationError(f"Unknown role predicted for {profile['skills']}")
+        if not 0 <= prediction.get('probability', -1) <= 1:
+            raise ReloadValidationError(f"Probability out of range for {profile['skills']}")
+        if 'skillGap' not in result or 'insights' not in result:
+            raise ReloadValidationError(f"Incomplete response for {profile['skills']}")
+        if batch_result != result:
+            raise ReloadValidationError(f"Batch and single predictions differ for {profile['skills']}")
+
+
+class PredictorManager:
+    """
+    Owns the live predictor and replaces it without restarting the worker.
+    A reload builds and validates a new predictor in a background thread,
+    then swaps it in with a single reference assignment. Request handlers
+    read `current` once, so in-flight requests finish on the old predictor.
+    """
+
+    def __init__(self, factory, model_path='models/', catalog_path=ROLE_CATALOG_PATH):
+        self.factory = factory
+        self.model_path = model_path
+        self.catalog_path = catalog_path
+        self.current = factory()
+        self.reloading = False
+        self.last_reload = None
+        self.last_error = None
+        self.reload_count = 0
+        self._lock = threading.Lock()
+        self._watcher_pid = None
+        self._watch_interval = 0
+        self._fingerprint = self.artifact_fingerprint()
+        self._retired_cache_events = {}
+        self._swap_lock = threading.Lock()
+
+    def reload(self, wait=False):
+        """
+        Start a reload; returns False if one is already running. With
+        wait=True, blocks until it finishes and returns whether it succeeded.
+        """
+        with self._lock:
+            if self.reloading:
+                return False
+            self.reloading = True
+
+        if wait:
+            return self._reload()
+        threading.Thread(target=self._reload, name='predictor-reload', daemon=True).start()
+        return True
+
+    def _reload(self):
+        """Build, validate and swap in a new predictor"""
+        fingerprint = self.artifact_fingerprint()
+        try:
+            candidate = self.factory()
+            validate_predictor(candidate)
+            with self._swap_lock:
+                previous = self.current
+                self.current = candidate
+                self._retire(previous)
+            self.reload_count += 1
+            self.last_error = None
+            print(f"SUCCESS: Predictor reloaded ({previous.version} -> {candidate.version})")
+            return True
+        except Exception as e:
+            self.last_error = str(e)
+            print(f"WARNING: Predictor reload failed, keeping version {self.current.version} - {e}")
+            return False
+        finally:
+            # A failed build is not retried until the artifacts change again
+            self._fingerprint = fingerprint
+            self.last_reload = datetime.now().isoformat()
+            self.reloading = False
+
+    def _retire(self, predictor):
+        """Keep the cache counters of a swapped-out predictor"""
+        for key, value in cache_events(predictor.cache.stats()).items():
+            self._retired_cache_events[key] = self._retired_cache_events.get(key, 0) + value
+
+    def cache_events(self):
+        """
+        Cache counters of the live predictor plus those of every predictor
+        it replaced, so totals never drop on a reload
+        """
+        with self._swap_lock:
+            events = dict(self._retired_cache_events)
+            stats = self.current.cache.stats()
+        for key, value in cache_events(stats).items():
+            events[key] = events.get(key, 0) + value
+        return events
+
+    def artifact_fingerprint(self):
+        """Size and mtime of every artifact a predictor is built from"""
+        paths = artifact_paths(self.model_path)
+        if self.catalog_path:
+            paths.append(self.catalog_path)
+        fingerprint = []
+        for path in paths:
+            if os.path.exists(path):
+                stat = os.stat(path)
+                fingerprint.append((path, stat.st_size, stat.st_mtime_ns))
+        return tuple(fingerprint)
+
+    def watch(self, interval):
+        """
+        Poll artifacts every `interval` seconds and reload when they change.
+        Threads do not survive fork, so a worker forked from a preloading
+        master calls this again (see gunicorn.conf.py) to get its own watcher.
+        """
+        if interval <= 0 or self._watcher_pid == os.getpid():
+            return
+        self._watcher_pid = os.getpid()
+        self._watch_interval = interval
+
+        def poll():
+            while True:
+                time.sleep(interval)
+                try:
+                    if self.artifact_fingerprint() != self._fingerprint:
+                        print("Artifacts changed on disk, reloading predictor")
+                        self.reload(wait=True)
+                except Exception as e:
+                    print(f"WARNING: Artifact watch failed - {e}")
+
+        threading.Thread(target=poll, name='artifact-watch', daemon=True).start()
+
+    def restart_watch(self):
+        """Start the watcher in this process if the parent was watching"""
+        self.watch(self._watch_interval)
+
+    def status(self):
+        return {
+            'version': self.current.version,
+            'reloading': self.reloading,
+            'reloadCount': self.reload_count,
+            'lastReload': self.last_reload,
+            'lastError': self.last_error
+        }
@@ -0,0 +1,117 @@
+import warnings
+import numpy as np
+from skill_index import SKILL_INDEX
+
+# Degree code for degrees the encoder never saw; the trees treat it as
+# sorting below every known degree
+UNKNOWN_DEGREE = -1
+
+
+class RandomForestScorer:
+    """
+    Runs the trained RandomForest on raw profiles without pandas or the
+    MultiLabelBinarizer. Feature rows are written straight into one
+    preallocated float32 array: the degree code, experience, and a 1 in the
+    skill columns the profile actually has, found through a column map
+    built once per model.
+    """
+
+    def __init__(self, model, degree_encoder, role_encoder, skills_encoder):
+        self.model = model
+        # Joblib's thread pool costs more than it saves on request-sized batches
+        self.model.n_jobs = 1
+        self.n_features = model.n_features_in_
+        self.roles = [str(role) for role in role_encoder.classes_[model.classes_]]
+        self.degree_codes = {str(degree): code for code, degree in enumerate(degree_encoder.classes_)}
+
+        names = list(getattr(model, 'feature_names_in_', ['degree', 'experience'] + list(skills_encoder.classes_)))
+        self.degree_column = names.index('degree')
+        self.experience_column = names.index('experience')
+        # Canonical skill -> columns, so 'py' and 'Python' set the same indicator
+        self.skill_columns = {}
+        for column, name in enumerate(names):
+            if column in (self.degree_column, self.experience_column):
+                continue
+            self.skill_columns.setdefault(SKILL_INDEX.normalize(name), []).append(column)
+
+    def features(self, degrees, experiences, skill_lists):
+        """Feature matrix for profiles whose skills went through prepare_user_skills"""
+        X = np.zeros((len(degrees), self.n_features), dtype=np.float32)
+        X[:, self.degree_column] = [self.degree_codes.get(str(d), UNKNOWN_DEGREE) for d in degrees]
+        X[:, self.experience_column] = experiences
+
+        rows = []
+        columns = []
+        for i, skills in enumerate(skill_lists):
+            for skill in skills:
+                for column in self.skill_columns.get(skill, ()):
+                    rows.append(i)
+                    columns.append(column)
+        X[rows, columns] = 1
+        return X
+
+    def predict_proba(self, degrees, experiences, skill_lists):
+        """Class probabilities for a batch, columns ordered like self.roles"""
+        X = self.features(degrees, experiences, skill_lists)
+        with warnings.catch_warnings():
+            # Fitted on a DataFrame; the columns are in the same order
+            warnings.filterwarnings('ignore', message='X does not have valid feature names')
+            return self.model.predict_proba(X)
+
+
+class HybridRanker:
+    """
+    Re-ranks TF-IDF recommendations by blending cosine similarity with the
+    RandomForest probability of each role:
+        score = (1 - rf_weight) * similarity + rf_weight * probability
+    Candidates are the TF-IDF top-k plus every catalog role the forest
+    knows. Any other role has probability 0 and similarity at most the k-th
+    best, so it cannot outrank the candidates.
+    """
+
+    def __init__(self, recommender, scorer, rf_weight):
+        self.recommender = recommender
+        self.scorer = scorer
+        self.rf_weight = rf_weight
+
+    def rerank(self, degrees, experiences, skill_lists, recommendations, top_n):
+        """Blended top_n for a batch of prepared skill lists and their TF-IDF recommendations"""
+        results = [list(recs) for recs in recommendations]
+        rows = [i for i, skills in enumerate(skill_lists) if skills]
+        if not rows:
+            return results
+
+        proba = self.scorer.predict_proba(
+            [degrees[i] for i in rows], [experiences[i] for i in rows], [skill_lists[i] for i in rows]
+        )
+        # Role positions, similarities and results all come from one state
+        state = self.recommender.snapshot()
+        positions = state.role_positions
+        known = [(j, positions[role]) for j, role in enumerate(self.scorer.roles) if role in positions]
+        rf_columns = [j for j, _ in known]
+        rf_indices = [idx for _, idx in known]
+        similarities = self.recommender.similarities([skill_lists[i] for i in rows], rf_indices, state)
+
+        for row, i in enumerate(rows):
+            candidates = {
+                positions[rec['role']]: (rec['similarity_score'], 0.0)
+                for rec in recommendations[i] if rec['role'] in positions
+            }
+            for col, (j, idx) in enumerate(zip(rf_columns, rf_indices)):
+                similarity = candidates.get(idx, (similarities[row, col],))[0]
+                candidates[idx] = (similarity, float(proba[row, j]))
+
+            blended = {
+                idx: (1 - self.rf_weight) * similarity + self.rf_weight * probability
+                for idx, (similarity, probability) in candidates.items()
+            }
+            ranked = sorted(blended, key=lambda idx: (-blended[idx], idx))[:top_n]
+
+            results[i] = []
+            for idx in ranked:
+                similarity, probability = candidates[idx]
+                result = state.build_result(idx, blended[idx], skill_lists[i])
+                result['similarity_score'] = float(similarity)
+                result['rf_probability'] = probability
+                results[i].append(result)
+        return results
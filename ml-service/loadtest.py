@@ -0,0 +1,449 @@
+"""
+End-to-end load test of the ML service over HTTP, run on one machine.
+
+    python loadtest.py --profile constant --rate 200 --duration 30
+    python loadtest.py --launch --configs 1x1,2x4,4x8 --profile steps --rates 50,100,200,400,800
+    python loadtest.py --launch --configs 2x1 --asgi --profile burst --rate 100 --burst-rate 600
+
+Profiles are built from the role catalog: each one takes a share of one
+role's skills (so skill co-occurrence matches the catalog) plus a few
+skills from the server's /api/skills palette, sometimes as a synonym or in
+lowercase. The schedule is open-loop: Poisson arrival times at the
+profile's rate (constant, ramp, bursts or steps) are drawn up front. Every
+request is sent at its time whether earlier ones have finished or not, and
+latency counts from that time. A slow server therefore shows queueing the
+way real clients would see it, not hidden by a client that waits.
+
+With --launch, a gunicorn server is started on a free local port for each
+workers x threads configuration and stopped after its run. The steps
+profile reports the saturation point of each configuration: the highest
+rate whose throughput, p99 latency and error rate are still within bounds.
+"""
+import argparse
+import http.client
+import json
+import os
+import socket
+import subprocess
+import sys
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import quote, urlsplit
+import numpy as np
+from data_constants import DEGREE_MAP, EXTENDED_SKILL_MAPPING, SKILL_SYNONYMS
+
+PROFILES = ('constant', 'ramp', 'burst', 'steps')
+# Share of requests per endpoint
+DEFAULT_MIX = {'predict': 0.8, 'suggest': 0.1, 'what-if': 0.05, 'batch': 0.05}
+# Profiles per batch request
+BATCH_SIZE = 10
+# Threads sending requests; each keeps one keep-alive connection
+CLIENT_THREADS = 256
+REQUEST_TIMEOUT = 10
+# A step is sustained while it completes this share of its target rate...
+SATURATION_THROUGHPUT = 0.95
+# ...with no more than this share of errors and p99 latency below --slo-ms
+SATURATION_ERROR_RATE = 0.01
+DEFAULT_SLO_MS = 500
+# Client lag (send time minus scheduled time) above this means every
+# client thread was busy and requests went out late
+MAX_CLIENT_LAG_MS = 50
+# Seconds to wait for a launched server to answer /api/health
+LAUNCH_TIMEOUT = 60
+LATENCY_PERCENTILES = (50, 90, 99)
+
+
+def rate_segments(profile, rate, duration, end_rate=None, burst_rate=None, burst_seconds=2, burst_every=10,
+                  rates=(), step_seconds=10):
+    """
+    The schedule as (label, seconds, start rate, end rate) segments; the
+    rate changes linearly within a segment. Results are reported per label.
+    """
+    if profile == 'constant':
+        return [('constant', duration, rate, rate)]
+    if profile == 'ramp':
+        return [('ramp', duration, rate, end_rate if end_rate is not None else rate * 10)]
+    if profile == 'burst':
+        if not 0 < burst_seconds < burst_every:
+            raise ValueError('Bursts must last more than 0 seconds and less than the time between them')
+        burst_rate = burst_rate if burst_rate is not None else rate * 5
+        segments = []
+        elapsed = 0
+        while elapsed < duration:
+            base = min(burst_every - burst_seconds, duration - elapsed)
+            if base > 0:
+                segments.append(('base', base, rate, rate))
+            burst = min(burst_seconds, duration - elapsed - base)
+            if burst > 0:
+                segments.append(('burst', burst, burst_rate, burst_rate))
+            elapsed += base + burst
+        return segments
+    if profile == 'steps':
+        return [(f'{step:g} rps', step_seconds, step, step) for step in rates]
+    raise ValueError(f'Unknown profile: {profile}')
+
+
+def schedule(segments, rng):
+    """
+    Poisson arrival times (seconds from the start) and labels for the
+    segments, by thinning: candidates at the peak rate are kept with
+    probability rate(t) / peak
+    """
+    times = []
+    labels = []
+    offset = 0.0
+    for label, seconds, start_rate, end_rate in segments:
+        peak = max(start_rate, end_rate)
+        if peak > 0 and seconds > 0:
+            candidates = np.sort(rng.uniform(0, seconds, rng.poisson(peak * seconds)))
+            rates = start_rate + (end_rate - start_rate) * candidates / seconds
+            kept = candidates[rng.random(len(candidates)) * peak < rates]
+            times.extend((offset + kept).tolist())
+            labels.extend([label] * len(kept))
+        offset += seconds
+    return times, labels
+
+
+class TrafficModel:
+    """
+    Request payloads for the service drawn from the catalog's skill
+    distributions: a degree, a role plausible for it, 40-100% of that
+    role's skills and up to three skills from the palette
+    """
+
+    def __init__(self, palette, rng, mapping=EXTENDED_SKILL_MAPPING, mix=None):
+        self.rng = rng
+        self.palette = sorted(palette)
+        self.mapping = mapping
+        self.roles = list(mapping)
+        self.degrees = list(DEGREE_MAP) + ['Other']
+        self.synonyms = {skill.lower(): variants for skill, variants in SKILL_SYNONYMS.items()}
+        mix = mix or DEFAULT_MIX
+        self.endpoints = list(mix)
+        weights = np.array([mix[endpoint] for endpoint in self.endpoints], dtype=np.float64)
+        self.weights = weights / weights.sum()
+
+    def _pick(self, items):
+        return items[int(self.rng.integers(len(items)))]
+
+    def _variant(self, skill):
+        """The skill as users type it: usually verbatim, sometimes a synonym or lowercase"""
+        roll = self.rng.random()
+        if roll < 0.1 and skill.lower() in self.synonyms:
+            return self._pick(self.synonyms[skill.lower()])
+        if roll < 0.2:
+            return skill.lower()
+        return skill
+
+    def profile(self):
+        degree = self._pick(self.degrees)
+        roles = [role for role in DEGREE_MAP.get(degree, ()) if role in self.mapping] or self.roles
+        skills = self.mapping[self._pick(roles)]
+        count = max(1, int(round(len(skills) * self.rng.uniform(0.4, 1.0))))
+        chosen = [skills[i] for i in self.rng.choice(len(skills), size=count, replace=False)]
+        chosen += [self._pick(self.palette) for _ in range(int(self.rng.integers(0, 4)))]
+        return {
+            'degree': degree,
+            'skills': [self._variant(skill) for skill in dict.fromkeys(chosen)],
+            # Mostly early-career, like the people asking for career advice
+            'experience': int(min(self.rng.exponential(3), 20))
+        }
+
+    def request(self):
+        """(endpoint, method, path, body) of one request"""
+        endpoint = self.endpoints[int(self.rng.choice(len(self.endpoints), p=self.weights))]
+        if endpoint == 'predict':
+            return endpoint, 'POST', '/api/predict', self.profile()
+        if endpoint == 'batch':
+            return endpoint, 'POST', '/api/predict/batch', {'profiles': [self.profile() for _ in range(BATCH_SIZE)]}
+        if endpoint == 'what-if':
+            return endpoint, 'POST', '/api/predict/what-if', {'skills': self.profile()['skills']}
+        if endpoint == 'suggest':
+            skill = self._pick(self.palette)
+            prefix = skill[:int(self.rng.integers(1, min(len(skill), 4) + 1))]
+            return endpoint, 'GET', f'/api/skills/suggest?q={quote(prefix)}', None
+        if endpoint == 'skills':
+            return endpoint, 'GET', '/api/skills', None
+        raise ValueError(f'Unknown endpoint: {endpoint}')
+
+
+def parse_mix(text):
+    """'predict=0.8,suggest=0.2' -> {'predict': 0.8, 'suggest': 0.2}"""
+    mix = {}
+    for part in text.split(','):
+        endpoint, _, share = part.partition('=')
+        mix[endpoint.strip()] = float(share)
+    return mix
+
+
+def fetch_palette(url, timeout=REQUEST_TIMEOUT):
+    """Skill names the server offers, or the catalog's skills if it does not answer"""
+    parts = urlsplit(url)
+    try:
+        connection = http.client.HTTPConnection(parts.hostname, parts.port or 80, timeout=timeout)
+        connection.request('GET', '/api/skills')
+        response = connection.getresponse()
+        if response.status == 200:
+            return json.loads(response.read())['skills']
+    except (OSError, ValueError, KeyError) as e:
+        print(f"WARNING: Could not fetch /api/skills - {e}; using the catalog's skills", file=sys.stderr)
+    return sorted({skill for skills in EXTENDED_SKILL_MAPPING.values() for skill in skills})
+
+
+def run_schedule(url, times, requests, client_threads=CLIENT_THREADS, timeout=REQUEST_TIMEOUT):
+    """
+    Send requests[i] at times[i] seconds from now. Returns one
+    (latency, client lag, status) per request, in seconds; status is the
+    HTTP code or the name of the exception that ended the request.
+    """
+    parts = urlsplit(url)
+    results = [None] * len(times)
+    local = threading.local()
+    encoded = [
+        (method, path, json.dumps(body).encode('utf-8') if body is not None else None)
+        for _, method, path, body in requests
+    ]
+
+    def send(i, scheduled):
+        started = time.perf_counter()
+        method, path, body = encoded[i]
+        headers = {'Content-Type': 'application/json'} if body is not None else {}
+        try:
+            if getattr(local, 'connection', None) is None:
+                local.connection = http.client.HTTPConnection(parts.hostname, parts.port or 80, timeout=timeout)
+            local.connection.request(method, path, body=body, headers=headers)
+            response = local.connection.getresponse()
+            response.read()
+            status = response.status
+            if response.getheader('Connection', '').lower() == 'close':
+                local.connection.close()
+                local.connection = None
+        except (OSError, http.client.HTTPException) as e:
+            status = type(e).__name__
+            if getattr(local, 'connection', None) is not None:
+                local.connection.close()
+            local.connection = None
+        results[i] = (time.perf_counter() - scheduled, started - scheduled, status)
+
+    with ThreadPoolExecutor(client_threads, thread_name_prefix='loadtest') as pool:
+        start = time.perf_counter() + 0.05
+        for i, at in enumerate(times):
+            delay = start + at - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            pool.submit(send, i, start + at)
+    return results
+
+
+def _percentiles(values):
+    if not len(values):
+        return {f'p{p}': None for p in LATENCY_PERCENTILES} | {'max': None}
+    ms = np.asarray(values) * 1000
+    summary = {f'p{p}': round(float(np.percentile(ms, p)), 2) for p in LATENCY_PERCENTILES}
+    summary['max'] = round(float(ms.max()), 2)
+    return summary
+
+
+def summarize(results, seconds, target_rps=None, completed=None):
+    """
+    Latency percentiles (ms), throughput and errors of a group of results.
+    Throughput counts `completed` successful responses if given (those
+    that arrived within the group's time window), otherwise all of them.
+    """
+    ok = [latency for latency, _, status in results if isinstance(status, int) and status < 500]
+    errors = Counter(str(status) for _, _, status in results if not (isinstance(status, int) and status < 500))
+    lags = [lag for _, lag, _ in results]
+    return {
+        'sent': len(results),
+        'ok': len(ok),
+        'errors': sum(errors.values()),
+        'errorRate': round(sum(errors.values()) / len(results), 4) if results else 0.0,
+        'errorsByStatus': dict(errors),
+        'targetRps': round(target_rps, 2) if target_rps is not None else round(len(results) / seconds, 2),
+        'throughputRps': round((len(ok) if completed is None else completed) / seconds, 2) if seconds else 0.0,
+        'latencyMs': _percentiles(ok),
+        'clientLagP99Ms': _percentiles(lags)['p99']
+    }
+
+
+def saturation_point(phases, slo_ms=DEFAULT_SLO_MS):
+    """
+    Highest target rate, in step order, that was sustained: enough
+    throughput, few errors and p99 within the SLO. None if the first step
+    already failed.
+    """
+    sustained = None
+    for summary in phases.values():
+        p99 = summary['latencyMs']['p99']
+        if (summary['throughputRps'] < SATURATION_THROUGHPUT * summary['targetRps']
+                or summary['errorRate'] > SATURATION_ERROR_RATE or p99 is None or p99 > slo_ms):
+            break
+        sustained = summary['targetRps']
+    return sustained
+
+
+def load_test(url, segments, seed=0, mix=None, client_threads=CLIENT_THREADS, slo_ms=DEFAULT_SLO_MS):
+    """Run one schedule against url; returns summaries per label and per endpoint"""
+    rng = np.random.default_rng(seed)
+    times, labels = schedule(segments, rng)
+    model = TrafficModel(fetch_palette(url), rng, mix=mix)
+    requests = [model.request() for _ in times]
+    results = run_schedule(url, times, requests, client_threads)
+
+    # A phase's throughput is what the server answered while it lasted;
+    # answers to its requests that came later count for the next phase
+    finished = np.sort([at + latency for at, (latency, _, status) in zip(times, results)
+                        if isinstance(status, int) and status < 400])
+    durations = Counter()
+    targets = Counter()
+    completed = Counter()
+    offset = 0.0
+    for label, seconds, start_rate, end_rate in segments:
+        durations[label] += seconds
+        targets[label] += seconds * (start_rate + end_rate) / 2
+        completed[label] += int(np.searchsorted(finished, offset + seconds) - np.searchsorted(finished, offset))
+        offset += seconds
+    phases = {}
+    for label in dict.fromkeys(label for label, *_ in segments):
+        group = [result for result, other in zip(results, labels) if other == label]
+        phases[label] = summarize(group, durations[label], targets[label] / durations[label], completed[label])
+    total = sum(durations.values())
+    endpoints = {
+        endpoint: summarize([result for result, request in zip(results, requests) if request[0] == endpoint], total)
+        for endpoint in dict.fromkeys(request[0] for request in requests)
+    }
+    report = {'phases': phases, 'endpoints': endpoints, 'total': summarize(results, total)}
+    if len(segments) > 1 and all(label.endswith(' rps') for label in phases):
+        report['saturationRps'] = saturation_point(phases, slo_ms)
+    if (report['total']['clientLagP99Ms'] or 0) > MAX_CLIENT_LAG_MS:
+        print(f"WARNING: Requests left the client up to {report['total']['clientLagP99Ms']} ms late (p99) because "
+              "every client thread was waiting; latency still counts from the scheduled time, but past "
+              "saturation raise --client-threads to keep the offered rate", file=sys.stderr)
+    return report
+
+
+def _free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def launch_server(workers, threads, asgi=False, port=None):
+    """Start gunicorn from this directory and wait for /api/health; returns (process, url)"""
+    port = port or _free_port()
+    command = [sys.executable, '-m', 'gunicorn', '--workers', str(workers), '--bind', f'127.0.0.1:{port}',
+               '--log-level', 'warning']
+    if asgi:
+        command += ['-k', 'uvicorn.workers.UvicornWorker', 'asgi:app']
+    else:
+        command += ['--threads', str(threads), 'app:app']
+    process = subprocess.Popen(command, cwd=os.path.dirname(os.path.abspath(__file__)),
+                               stdout=subprocess.DEVNULL, stderr=sys.stderr)
+
+    deadline = time.monotonic() + LAUNCH_TIMEOUT
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f'gunicorn exited with status {process.returncode}')
+        try:
+            connection = http.client.HTTPConnection('127.0.0.1', port, timeout=1)
+            connection.request('GET', '/api/health')
+            if connection.getresponse().status == 200:
+                return process, f'http://127.0.0.1:{port}'
+        except OSError:
+            pass
+        time.sleep(0.2)
+    stop_server(process)
+    raise RuntimeError(f'Server did not become healthy within {LAUNCH_TIMEOUT}s')
+
+
+def stop_server(process):
+    process.terminate()
+    try:
+        process.wait(10)
+    except subprocess.TimeoutExpired:
+        process.kill()
+        process.wait()
+
+
+def parse_config(text):
+    """'4x8' -> (4 workers, 8 threads)"""
+    workers, _, threads = text.lower().partition('x')
+    return int(workers), int(threads or 1)
+
+
+def print_report(config, report):
+    print(f"\n{config}")
+    print(f"  {'phase':<14} {'target/s':>9} {'done/s':>9} {'p50 ms':>9} {'p90 ms':>9} {'p99 ms':>9} {'errors':>8}")
+    for label, summary in list(report['phases'].items()) + [('total', report['total'])]:
+        latency = summary['latencyMs']
+        print(f"  {label:<14} {summary['targetRps']:>9} {summary['throughputRps']:>9} {str(latency['p50']):>9} "
+              f"{str(latency['p90']):>9} {str(latency['p99']):>9} {summary['errorRate']:>8.2%}")
+    for endpoint, summary in report['endpoints'].items():
+        print(f"  {endpoint:<14} {'':>9} {summary['throughputRps']:>9} {str(summary['latencyMs']['p50']):>9} "
+              f"{str(summary['latencyMs']['p90']):>9} {str(summary['latencyMs']['p99']):>9} {summary['errorRate']:>8.2%}")
+    if 'saturationRps' in report:
+        print(f"  saturation: {report['saturationRps']} rps")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Open-loop load test of the ML service')
+    parser.add_argument('--url', default='http://127.0.0.1:5001', help='server to test when not launching one')
+    parser.add_argument('--launch', action='store_true', help='start a local gunicorn server per --configs')
+    parser.add_argument('--configs', default='2x4', help='comma-separated WORKERSxTHREADS to launch')
+    parser.add_argument('--asgi', action='store_true', help='launch the micro-batching ASGI app with uvicorn workers')
+    parser.add_argument('--profile', choices=PROFILES, default='constant')
+    parser.add_argument('--rate', type=float, default=50, help='requests/s (start rate of a ramp, base rate of bursts)')
+    parser.add_argument('--end-rate', type=float, help='ramp: final requests/s (default 10x --rate)')
+    parser.add_argument('--burst-rate', type=float, help='burst: requests/s during bursts (default 5x --rate)')
+    parser.add_argument('--burst-seconds', type=float, default=2)
+    parser.add_argument('--burst-every', type=float, default=10, help='burst: seconds from one burst to the next')
+    parser.add_argument('--duration', type=float, default=30, help='seconds (constant, ramp, burst)')
+    parser.add_argument('--rates', default='25,50,100,200,400,800', help='steps: comma-separated requests/s')
+    parser.add_argument('--step-seconds', type=float, default=10)
+    parser.add_argument('--mix', help="share per endpoint, e.g. 'predict=0.8,suggest=0.1,what-if=0.05,batch=0.05'")
+    parser.add_argument('--slo-ms', type=float, default=DEFAULT_SLO_MS, help='p99 bound of a sustained step')
+    parser.add_argument('--client-threads', type=int, default=CLIENT_THREADS)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', help='write the JSON report to this file')
+    args = parser.parse_args(argv)
+    if args.profile == 'burst' and not 0 < args.burst_seconds < args.burst_every:
+        parser.error('--burst-seconds must be greater than 0 and less than --burst-every')
+
+    segments = rate_segments(
+        args.profile, args.rate, args.duration, args.end_rate, args.burst_rate, args.burst_seconds,
+        args.burst_every, [float(rate) for rate in args.rates.split(',') if rate.strip()], args.step_seconds
+    )
+    mix = parse_mix(args.mix) if args.mix else None
+    report = {'meta': {'profile': args.profile, 'segments': segments, 'seed': args.seed, 'mix': mix or DEFAULT_MIX},
+              'runs': {}}
+    targets = [(config, parse_config(config)) for config in args.configs.split(',')] if args.launch \
+        else [(args.url, None)]
+
+    for name, config in targets:
+        process = None
+        url = args.url
+        try:
+            if config is not None:
+                name = f"{config[0]} workers (asgi)" if args.asgi else f"{config[0]} workers x {config[1]} threads"
+                print(f"Launching {name}...", file=sys.stderr)
+                process, url = launch_server(*config, asgi=args.asgi)
+            report['runs'][name] = load_test(url, segments, args.seed, mix, args.client_threads, args.slo_ms)
+        except (OSError, RuntimeError) as e:
+            print(f"ERROR: {name} - {e}", file=sys.stderr)
+            return 1
+        finally:
+            if process is not None:
+                stop_server(process)
+        print_report(name, report['runs'][name])
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"SUCCESS: Report written to {args.output}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,295 @@
+import os
+import sys
+import json
+import glob
+import atexit
+import time
+import threading
+from contextlib import contextmanager
+
+# Shared directory where each worker publishes its metrics; unset means a
+# single process serves everything
+METRICS_DIR = os.environ.get('METRICS_DIR')
+# Seconds between two publishes of the same worker
+FLUSH_INTERVAL = 1.0
+
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+SIZE_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 250, 1000, 10000)
+
+
+def _label_key(labels):
+    return tuple(sorted(labels.items()))
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(label_key, extra=()):
+    pairs = list(label_key) + list(extra)
+    if not pairs:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in pairs) + '}'
+
+
+def _format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+class MetricsRegistry:
+    """
+    Minimal Prometheus-style counters, gauges and histograms.
+    With METRICS_DIR set, every worker publishes its own snapshot to that
+    directory from a background thread and /metrics merges the snapshots
+    of all workers, so a scrape hitting any gunicorn worker sees
+    service-wide totals. Counters and histograms of exited workers keep
+    counting; gauges only include live workers.
+    """
+
+    def __init__(self, directory=METRICS_DIR):
+        self.directory = directory
+        self._definitions = {}
+        self._counters = {}
+        self._gauges = {}
+        self._histograms = {}
+        self._collectors = []
+        self._lock = threading.Lock()
+        self._publisher_pid = None
+
+    def counter(self, name, help_text):
+        self._definitions[name] = ('counter', help_text, None)
+
+    def gauge(self, name, help_text):
+        self._definitions[name] = ('gauge', help_text, None)
+
+    def histogram(self, name, help_text, buckets=LATENCY_BUCKETS):
+        self._definitions[name] = ('histogram', help_text, tuple(buckets))
+
+    def add_collector(self, collector):
+        """Register a callable returning {(name, label_key): value} gauges/counters read at snapshot time"""
+        self._collectors.append(collector)
+
+    def inc(self, name, value=1, **labels):
+        key = (name, _label_key(labels))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def set(self, name, value, **labels):
+        with self._lock:
+            self._gauges[(name, _label_key(labels))] = value
+
+    def observe(self, name, value, **labels):
+        buckets = self._definitions[name][2]
+        key = (name, _label_key(labels))
+        with self._lock:
+            state = self._histograms.get(key)
+            if state is None:
+                state = self._histograms[key] = [[0] * len(buckets), 0.0, 0]
+            for i, bound in enumerate(buckets):
+                if value <= bound:
+                    state[0][i] += 1
+                    break
+            state[1] += value
+            state[2] += 1
+
+    @contextmanager
+    def timer(self, name, **labels):
+        """Observe the wall time of the block into a histogram"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - start, **labels)
+
+    def snapshot(self):
+        """JSON-serializable copy of this process's metrics"""
+        collected = {}
+        for collector in self._collectors:
+            try:
+                collected.update(collector())
+            except Exception as e:
+                print(f"WARNING: Metrics collector failed - {e}")
+
+        with self._lock:
+            counters = dict(self._counters)
+            gauges = dict(self._gauges)
+            histograms = {key: [list(state[0]), state[1], state[2]] for key, state in self._histograms.items()}
+
+        for key, value in collected.items():
+            if self._definitions.get(key[0], ('gauge',))[0] == 'counter':
+                counters[key] = value
+            else:
+                gauges[key] = value
+
+        encode = lambda items: [[name, [list(pair) for pair in labels], value] for (name, labels), value in items.items()]
+        return {
+            'pid': os.getpid(),
+            'counters': encode(counters),
+            'gauges': encode(gauges),
+            'histograms': encode(histograms)
+        }
+
+    def start_publisher(self):
+        """
+        Publish this process's snapshot every FLUSH_INTERVAL seconds and at
+        exit. Safe to call on every request: it only starts once per process,
+        so workers forked after import get their own thread.
+        """
+        if not self.directory or self._publisher_pid == os.getpid():
+            return
+        with self._lock:
+            if self._publisher_pid == os.getpid():
+                return
+            self._publisher_pid = os.getpid()
+
+        def publish():
+            while True:
+                time.sleep(FLUSH_INTERVAL)
+                try:
+                    self.flush()
+                except OSError as e:
+                    print(f"WARNING: Could not publish metrics - {e}")
+
+        threading.Thread(target=publish, name='metrics-publisher', daemon=True).start()
+        atexit.register(self.flush)
+
+    def flush(self):
+        if not self.directory:
+            return
+        os.makedirs(self.directory, exist_ok=True)
+        path = os.path.join(self.directory, f'metrics-{os.getpid()}.json')
+        tmp_path = f'{path}.{threading.get_ident()}.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump(self.snapshot(), f)
+        os.replace(tmp_path, path)
+
+    def _snapshots(self):
+        """Snapshots of every worker, this one always fresh"""
+        if not self.directory:
+            return [self.snapshot()]
+        self.flush()
+        snapshots = []
+        for path in glob.glob(os.path.join(self.directory, 'metrics-*.json')):
+            try:
+                with open(path) as f:
+                    snapshot = json.load(f)
+            except (OSError, ValueError):
+                continue
+            snapshot['alive'] = _pid_alive(snapshot['pid'])
+            snapshots.append(snapshot)
+        return snapshots
+
+    def render(self):
+        """Prometheus text exposition format, aggregated over all workers"""
+        counters = {}
+        gauges = {}
+        histograms = {}
+        for snapshot in self._snapshots():
+            for name, labels, value in snapshot['counters']:
+                key = (name, tuple(tuple(pair) for pair in labels))
+                counters[key] = counters.get(key, 0) + value
+            if snapshot.get('alive', True):
+                for name, labels, value in snapshot['gauges']:
+                    key = (name, tuple(tuple(pair) for pair in labels))
+                    gauges[key] = gauges.get(key, 0) + value
+            for name, labels, (bucket_counts, total, count) in snapshot['histograms']:
+                key = (name, tuple(tuple(pair) for pair in labels))
+                state = histograms.setdefault(key, [[0] * len(bucket_counts), 0.0, 0])
+                state[0] = [a + b for a, b in zip(state[0], bucket_counts)]
+                state[1] += total
+                state[2] += count
+
+        lines = []
+        for name, (kind, help_text, buckets) in sorted(self._definitions.items()):
+            lines.append(f'# HELP {name} {help_text}')
+            lines.append(f'# TYPE {name} {kind}')
+            if kind == 'histogram':
+                for (metric, labels), (bucket_counts, total, count) in sorted(histograms.items()):
+                    if metric != name:
+                        continue
+                    cumulative = 0
+                    for bound, bucket_count in zip(buckets, bucket_counts):
+                        cumulative += bucket_count
+                        lines.append(f'{name}_bucket{_format_labels(labels, [("le", _format_value(bound))])} {cumulative}')
+                    lines.append(f'{name}_bucket{_format_labels(labels, [("le", "+Inf")])} {count}')
+                    lines.append(f'{name}_sum{_format_labels(labels)} {_format_value(total)}')
+                    lines.append(f'{name}_count{_format_labels(labels)} {count}')
+            else:
+                values = counters if kind == 'counter' else gauges
+                for (metric, labels), value in sorted(values.items()):
+                    if metric == name:
+                        lines.append(f'{name}{_format_labels(labels)} {_format_value(value)}')
+        return '\n'.join(lines) + '\n'
+
+
+def _pid_alive(pid):
+    if pid == os.getpid():
+        return True
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+# /proc/self/smaps_rollup fields reported by process_memory, in kB there
+_MEMORY_FIELDS = {
+    'Rss': 'rss', 'Pss': 'pss',
+    'Shared_Clean': 'shared', 'Shared_Dirty': 'shared',
+    'Private_Clean': 'private', 'Private_Dirty': 'private'
+}
+
+
+def process_memory():
+    """
+    Resident memory of this process in bytes. On Linux it is split into
+    pages shared with other processes (memory-mapped artifacts, pages
+    inherited from a preloading master) and private ones; pss charges
+    shared pages proportionally, so it sums across workers to the real
+    footprint. Elsewhere only the peak RSS is known.
+    """
+    try:
+        memory = {'rss': 0, 'pss': 0, 'shared': 0, 'private': 0}
+        with open('/proc/self/smaps_rollup') as f:
+            for line in f:
+                name, _, value = line.partition(':')
+                if name in _MEMORY_FIELDS:
+                    memory[_MEMORY_FIELDS[name]] += int(value.split()[0]) * 1024
+        return memory
+    except (OSError, ValueError):
+        import resource
+        # ru_maxrss is in kB on Linux and bytes on macOS
+        scale = 1 if sys.platform == 'darwin' else 1024
+        return {'maxRss': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * scale}
+
+
+def clear_metrics_dir(directory=METRICS_DIR):
+    """Remove snapshots left by a previous server run"""
+    if not directory:
+        return
+    for path in glob.glob(os.path.join(directory, 'metrics-*.json*')):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+
+METRICS = MetricsRegistry()
+METRICS.counter('ml_requests_total', 'HTTP requests by endpoint, method and status code')
+METRICS.histogram('ml_request_duration_seconds', 'HTTP request latency by endpoint')
+METRICS.histogram('ml_predict_stage_duration_seconds', 'Latency of each prediction pipeline stage')
+METRICS.histogram('ml_request_skills', 'Skills per predicted profile', SIZE_BUCKETS)
+METRICS.histogram('ml_batch_profiles', 'Profiles per batch prediction request', SIZE_BUCKETS)
+METRICS.counter('ml_prediction_cache_events_total', 'Prediction cache hits, misses, evictions and expirations')
+METRICS.gauge('ml_prediction_cache_entries', 'Entries held in the prediction cache')
+METRICS.counter('ml_shared_cache_events_total', 'Shared prediction cache hits, misses, lease waits, writes and errors')
+METRICS.gauge('ml_artifact_info', 'Workers serving each model/catalog version')
+METRICS.counter('ml_forest_fallbacks_total', 'Model loads that ignored a forest export and unpickled the model')
+METRICS.gauge('ml_catalog_roles', 'Roles in the active catalog')
+METRICS.gauge('ml_worker_memory_bytes', 'Worker memory by kind (rss, pss, shared, private), summed over live workers')
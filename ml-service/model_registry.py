@@ -0,0 +1,131 @@
+import os
+import json
+import time
+
+# Registry location inside the model directory, and the file naming the
+# version CareerPredictor serves
+REGISTRY_DIRNAME = 'registry'
+PROMOTED_FILENAME = 'PROMOTED'
+METADATA_FILENAME = 'metadata.json'
+
+
+class RegistryError(ValueError):
+    """Raised for an unknown or incomplete model version"""
+
+
+class ModelRegistry:
+    """
+    Versioned model artifacts on the local filesystem. Every version is a
+    directory holding the model, its encoders and a metadata.json with the
+    parameters and metrics it was selected on; PROMOTED names the version
+    the service loads. Promotion is an atomic file replace, so a watching
+    service never sees a half-written choice.
+    """
+
+    def __init__(self, root):
+        self.root = root
+
+    @classmethod
+    def for_model_path(cls, model_path):
+        return cls(os.path.join(model_path, REGISTRY_DIRNAME))
+
+    def path(self, version):
+        return os.path.join(self.root, version)
+
+    def new_version(self, family, taken=()):
+        """
+        Unique, time-ordered version id for a candidate of the given family.
+        Nothing is created until add(); pass the ids handed out but not
+        added yet as taken.
+        """
+        stamp = time.strftime('%Y%m%d-%H%M%S')
+        n = 1
+        while os.path.exists(self.path(f'{stamp}-{family}-{n}')) or f'{stamp}-{family}-{n}' in taken:
+            n += 1
+        return f'{stamp}-{family}-{n}'
+
+    def staging_path(self, version):
+        """Directory a version's artifacts are written to before add() moves it into the registry"""
+        return os.path.join(self.root, f'.staging-{version}')
+
+    def add(self, version, metadata):
+        """
+        Write metadata next to the staged artifacts of version and move the
+        directory into the registry in one rename, so a version only ever
+        appears complete
+        """
+        staging = self.staging_path(version)
+        path = os.path.join(staging, METADATA_FILENAME)
+        tmp_path = f'{path}.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump(dict(metadata, version=version), f, indent=2)
+        os.replace(tmp_path, path)
+        os.rename(staging, self.path(version))
+
+    def get(self, version):
+        path = os.path.join(self.path(version), METADATA_FILENAME)
+        if not os.path.exists(path):
+            raise RegistryError(f'Unknown model version: {version}')
+        with open(path) as f:
+            return json.load(f)
+
+    def versions(self):
+        """Metadata of every complete version, oldest first"""
+        if not os.path.isdir(self.root):
+            return []
+        found = []
+        for version in sorted(os.listdir(self.root)):
+            # Candidates still being staged are not versions yet
+            if not version.startswith('.') and os.path.exists(os.path.join(self.path(version), METADATA_FILENAME)):
+                found.append(self.get(version))
+        return found
+
+    def promote(self, version):
+        """Make `version` the one the service loads"""
+        self.get(version)
+        path = os.path.join(self.root, PROMOTED_FILENAME)
+        tmp_path = f'{path}.tmp'
+        with open(tmp_path, 'w') as f:
+            f.write(version)
+        os.replace(tmp_path, path)
+
+    def promoted(self):
+        """The promoted version, or None if nothing was promoted"""
+        path = os.path.join(self.root, PROMOTED_FILENAME)
+        if not os.path.exists(path):
+            return None
+        with open(path) as f:
+            return f.read().strip() or None
+
+
+def resolve_model_dir(model_path):
+    """Directory to load model artifacts from: the promoted version if any, else model_path"""
+    registry = ModelRegistry.for_model_path(model_path)
+    version = registry.promoted()
+    if version is None:
+        return model_path
+    if not os.path.isdir(registry.path(version)):
+        print(f"WARNING: Promoted model version {version} is missing, using {model_path}")
+        return model_path
+    return registry.path(version)
+
+
+def select_best(candidates, min_accuracy=None, max_latency_ms=None, max_size_kb=None,
+                accuracy_tolerance=0.005):
+    """
+    Pick the candidate to promote from metadata dicts. Candidates breaking a
+    latency, size or accuracy budget are dropped; among those within
+    accuracy_tolerance of the best held-out accuracy, the fastest wins and
+    artifact size breaks ties. Returns None if nothing fits the budgets.
+    """
+    eligible = [
+        c for c in candidates
+        if (min_accuracy is None or c['metrics']['heldout_accuracy'] >= min_accuracy)
+        and (max_latency_ms is None or c['metrics']['latency_ms_per_1k'] <= max_latency_ms)
+        and (max_size_kb is None or c['metrics']['size_kb'] <= max_size_kb)
+    ]
+    if not eligible:
+        return None
+    best_accuracy = max(c['metrics']['heldout_accuracy'] for c in eligible)
+    contenders = [c for c in eligible if c['metrics']['heldout_accuracy'] >= best_accuracy - accuracy_tolerance]
+    return min(contenders, key=lambda c: (c['metrics']['latency_ms_per_1k'], c['metrics']['size_kb'], c['version']))
@@ -1,59 +1,231 @@
 import os
-import joblib
+import hashlib
 import json
 import numpy as np
 from datetime import datetime
-from data_constants import (
-    SALARY_DATA, EXTENDED_SKILL_MAPPING, SKILL_SYNONYMS, 
-    DEGREE_MAP, MAX_SKILLS_TO_CHECK
-)
+from data_constants import MAX_SKILLS_TO_CHECK
+from catalog import RoleCatalog, iter_catalog_rows, load_catalog
+from skill_index import SKILL_INDEX, SkillTrie
 from tfidf_recommender import TfidfRecommender
+from recommender_index import INDEX_FILENAME
+from shared_cache import create_cache
+from model_registry import ModelRegistry, PROMOTED_FILENAME, resolve_model_dir
+from metrics import METRICS
+from hybrid import HybridRanker, RandomForestScorer
+from response_assembly import ResponseAssembler
+from forest import ENCODER_NAMES, FOREST_DIRNAME, FOREST_MANIFEST, ForestArrays
+from skill_embeddings import EMBEDDINGS_FILENAME, EmbeddingRanker
+
+REQUIRED_FIELDS = ['degree', 'skills', 'experience']
+TOP_N_RECOMMENDATIONS = 4
+MODEL_FILES = [
+    'career_model.pkl', 'degree_encoder.pkl', 'role_encoder.pkl',
+    'skills_encoder.pkl', 'skill_role_mapping.json',
+    os.path.join(FOREST_DIRNAME, FOREST_MANIFEST)
+]
+
+# Prediction cache bounds, overridable from the environment
+CACHE_SIZE = int(os.environ.get('PREDICTION_CACHE_SIZE', 2048))
+CACHE_TTL = float(os.environ.get('PREDICTION_CACHE_TTL', 3600))
+
+# Optional JSONL/CSV role catalog replacing the built-in constants
+ROLE_CATALOG_PATH = os.environ.get('ROLE_CATALOG_PATH')
+
+# Share of the ranking score given to the RandomForest in hybrid mode;
+# 0 ranks by TF-IDF similarity alone
+HYBRID_RF_WEIGHT = float(os.environ.get('HYBRID_RF_WEIGHT', 0))
+
+# Share of a role's TF-IDF weight covered by its Critical skills, then by
+# Critical plus Important ones; the rest are Nice-to-have
+IMPORTANCE_TIERS = ((1 / 3, 'Critical'), (2 / 3, 'Important'))
+
+# Ranking engines selectable per request: exact skill matching by TF-IDF,
+# or skill embeddings that also credit related skills
+ENGINES = ('tfidf', 'embedding')
+DEFAULT_ENGINE = 'tfidf'
+
+# Most skill additions returned by what_if
+WHAT_IF_MAX_RESULTS = 50
+
+# Histogram receiving the latency of each prediction stage
+STAGE_METRIC = 'ml_predict_stage_duration_seconds'
+
+def artifact_paths(model_path):
+    """
+    Every file a predictor is built from: the registry's promotion marker,
+    the model files of the version being served, the recommender index and
+    the skill embeddings
+    """
+    model_dir = resolve_model_dir(model_path)
+    return (
+        [os.path.join(ModelRegistry.for_model_path(model_path).root, PROMOTED_FILENAME)]
+        + [os.path.join(model_dir, name) for name in MODEL_FILES]
+        + [os.path.join(model_path, INDEX_FILENAME), os.path.join(model_path, EMBEDDINGS_FILENAME)]
+    )
+
+def experience_bucket(experience):
+    """
+    Collapse experience to the thresholds the prediction actually branches
+    on (confidence boost, salary multiplier, insights). Keep in sync with
+    predict_with_tfidf and generate_insights.
+    """
+    return (
+        experience < 1, experience <= 1, experience < 2, experience < 3,
+        experience <= 3, experience >= 5, experience <= 6, experience <= 10
+    )
 
 class CareerPredictor:
-    def __init__(self, model_path='models/'):
+    def __init__(self, model_path='models/', cache=None, catalog=None, rf_weight=HYBRID_RF_WEIGHT):
         self.model_path = model_path
+        self.model_dir = model_path
+        self.rf_weight = rf_weight
+        self.hybrid = None
         self.model = None
+        # 'forest' for a memory-mapped export, 'pickle' otherwise
+        self.model_source = None
         self.degree_encoder = None
         self.role_encoder = None
         self.skills_encoder = None
         self.skill_role_mapping = {}
-        self.recommender = TfidfRecommender()
+        self.version = None
+        # Per-role skill gap structures and the skill list/autocomplete
+        # index, rebuilt lazily for each version
+        self.gap_profiles = {}
+        self.available_skills = None
+        self.skills_etag = None
+        self.suggester = None
+        self.cache = cache if cache is not None else create_cache(max_size=CACHE_SIZE, ttl=CACHE_TTL)
+        if catalog is None:
+            catalog = load_catalog(ROLE_CATALOG_PATH) if ROLE_CATALOG_PATH else RoleCatalog.default()
+        self.catalog = catalog
+        self.responses = ResponseAssembler(self.catalog)
+        self.recommender = TfidfRecommender(
+            skill_mapping=self.catalog.skill_mapping,
+            index_path=os.path.join(model_path, INDEX_FILENAME)
+        )
+        # Optional; built offline by train_model.py or skill_embeddings.py
+        self.embeddings = EmbeddingRanker.load(self.recommender, os.path.join(model_path, EMBEDDINGS_FILENAME))
         self._load_models()
 
     def _load_models(self):
         """Load models and encoders if they exist"""
         try:
-            if os.path.exists(os.path.join(self.model_path, 'career_model.pkl')):
-                self.model = joblib.load(os.path.join(self.model_path, 'career_model.pkl'))
-                self.degree_encoder = joblib.load(os.path.join(self.model_path, 'degree_encoder.pkl'))
-                self.role_encoder = joblib.load(os.path.join(self.model_path, 'role_encoder.pkl'))
-                self.skills_encoder = joblib.load(os.path.join(self.model_path, 'skills_encoder.pkl'))
+            # A version promoted in the model registry wins over loose files
+            self.model_dir = resolve_model_dir(self.model_path)
+            if os.path.exists(os.path.join(self.model_dir, 'career_model.pkl')):
+                # Tree ensembles exported as arrays are memory-mapped and
+                # shared by all workers instead of unpickled into each
+                self.model = ForestArrays.load(self.model_dir)
+                self.model_source = 'forest' if self.model is not None else 'pickle'
+                if self.model is None and os.path.exists(os.path.join(self.model_dir, FOREST_DIRNAME, FOREST_MANIFEST)):
+                    # The export is there but stale or unreadable, so this
+                    # worker holds its own unpickled copy of the model
+                    METRICS.inc('ml_forest_fallbacks_total')
+                encoders = self.model.encoders if self.model is not None else {}
+                if self.model is None or set(encoders) != set(ENCODER_NAMES):
+                    # Only pickled models and old exports need joblib, and
+                    # through the pickles scikit-learn
+                    import joblib
+                    if self.model is None:
+                        self.model = joblib.load(os.path.join(self.model_dir, 'career_model.pkl'))
+                    encoders = {
+                        name: joblib.load(os.path.join(self.model_dir, f'{name}_encoder.pkl'))
+                        for name in ENCODER_NAMES
+                    }
+                self.degree_encoder = encoders['degree']
+                self.role_encoder = encoders['role']
+                self.skills_encoder = encoders['skills']
                 print("SUCCESS: Models loaded successfully")
+                if self.rf_weight > 0:
+                    scorer = RandomForestScorer(self.model, self.degree_encoder, self.role_encoder, self.skills_encoder)
+                    self.hybrid = HybridRanker(self.recommender, scorer, self.rf_weight)
             else:
                 print("WARNING: Model files not found. Using rule-based fallback.")
 
-            mapping_path = os.path.join(self.model_path, 'skill_role_mapping.json')
+            mapping_path = os.path.join(self.model_dir, 'skill_role_mapping.json')
             if os.path.exists(mapping_path):
                 with open(mapping_path, 'r') as f:
                     self.skill_role_mapping = json.load(f)
         except Exception as e:
             print(f"WARNING: Could not load models - {e}")
 
+        # Registry version being served, None for loose files in model_path
+        self.model_version = None if self.model_dir == self.model_path else os.path.basename(self.model_dir)
+        
+        # Anything cached against the previous catalog or models is stale
+        self._catalog_changed()
+
+    def _compute_version(self):
+        """Fingerprint of the role catalog and the model files on disk"""
+        digest = hashlib.sha1()
+        digest.update(f"{self.recommender.checksum}:{self.recommender.revision}".encode('utf-8'))
+        digest.update(f"rf_weight:{self.rf_weight if self.hybrid else 0}".encode('utf-8'))
+        digest.update(json.dumps(self.catalog.salary_data, sort_keys=True).encode('utf-8'))
+        for path in artifact_paths(self.model_path):
+            if os.path.exists(path):
+                stat = os.stat(path)
+                digest.update(f"{path}:{stat.st_size}:{stat.st_mtime_ns}".encode('utf-8'))
+        return digest.hexdigest()[:12]
+
+    def upsert_role(self, role, skills, salary=None, degrees=None):
+        """Add or update a catalog role at runtime without a full refit"""
+        self.catalog.upsert(role, skills, salary, degrees)
+        self.recommender.add_role(role, skills)
+        self._catalog_changed()
+
+    def remove_role(self, role):
+        """Remove a catalog role at runtime; returns False if it is unknown"""
+        removed = self.catalog.remove(role)
+        if removed:
+            self.recommender.remove_role(role)
+            self._catalog_changed()
+        return removed
+
+    def apply_catalog_updates(self, path):
+        """
+        Stream upserts/removals from a JSONL/CSV file; returns counts per
+        action, with removals of roles not in the catalog counted as unknown
+        """
+        counts = {'upsert': 0, 'remove': 0, 'unknown': 0}
+        for row in iter_catalog_rows(path):
+            action = self.catalog.apply_row(row)
+            if action == 'remove':
+                self.recommender.remove_role(row['role'])
+            elif action == 'upsert':
+                self.recommender.add_role(row['role'], row['skills'])
+            counts[action] += 1
+        self._catalog_changed()
+        return counts
+
+    def _catalog_changed(self):
+        """Bump the version and drop everything derived from the old catalog or models"""
+        self.version = self._compute_version()
+        self.cache.set_version(self.version)
+        self.gap_profiles = {}
+        self.available_skills = None
+        self.skills_etag = None
+        self.suggester = None
+        self.responses = ResponseAssembler(self.catalog)
+
+    def cache_key(self, degree, unique_skills, experience, engine=DEFAULT_ENGINE):
+        """Cache key for a profile whose skills went through prepare_user_skills"""
+        # Every stage only sees the resolved skills, so 'JS' and 'javascript'
+        # share an entry. The forest reads experience as a raw feature, so
+        # hybrid mode cannot bucket it.
+        experience_key = experience if self.hybrid is not None else experience_bucket(experience)
+        return (str(degree), frozenset(unique_skills), experience_key, engine)
+
+    def engine_error(self, engine):
+        """Error message if engine cannot serve predictions, None if it can"""
+        if engine not in ENGINES:
+            return f"Field engine must be one of: {', '.join(ENGINES)}"
+        if engine == 'embedding' and self.embeddings is None:
+            return 'Embedding engine is not available: no skill embeddings were built'
+        return None
+
     def normalize_skill(self, skill):
         """Normalize a skill to its canonical form using synonym mapping"""
-        skill_lower = skill.lower().strip()
-        
-        # Check if it's already a canonical form
-        if skill_lower in SKILL_SYNONYMS:
-            return skill_lower
-        
-        # Check if it's a synonym
-        for canonical, synonyms in SKILL_SYNONYMS.items():
-            if skill_lower in synonyms:
-                return canonical
-        
-        # Return as-is if no mapping found
-        return skill_lower
+        return SKILL_INDEX.normalize(skill)
 
     def match_skill_with_synonyms(self, user_skill, required_skill):
         """
@@ -66,14 +238,8 @@ class CareerPredictor:
         if user_norm == req_norm:
             return 100
         
-        user_canonical = user_norm
-        req_canonical = req_norm
-        
-        for canonical, synonyms in SKILL_SYNONYMS.items():
-            if user_norm in synonyms:
-                user_canonical = canonical
-            if req_norm in synonyms:
-                req_canonical = canonical
+        user_canonical = SKILL_INDEX.canonical.get(user_norm, user_norm)
+        req_canonical = SKILL_INDEX.canonical.get(req_norm, req_norm)
         
         if user_canonical == req_canonical:
             return 95
@@ -101,10 +267,11 @@ class CareerPredictor:
         
         return 0
 
-    def predict_with_tfidf(self, degree, skills, experience):
+    def predict_with_tfidf(self, degree, skills, experience, recommendations=None):
         """TF-IDF and Cosine Similarity based prediction logic"""
         # Generate recommendations based on user skills
-        recommendations = self.recommender.recommend(skills, top_n=4)
+        if recommendations is None:
+            recommendations = self.recommender.recommend(skills, top_n=TOP_N_RECOMMENDATIONS)
         
         if not recommendations:
             predicted_role = "Generalist"
@@ -126,62 +293,94 @@ class CareerPredictor:
                 alt_prob = item['matchScore'] / 100.0
                 alternatives.append({
                     'role': item['role'],
-                    'probability': float(f"{alt_prob:.2f}"),
+                    'probability': round(alt_prob, 2),
                     'matchScore': item['matchScore']
                 })
-
-        salary_info = SALARY_DATA.get(predicted_role, {'min': 400000, 'max': 1000000, 'avg': 700000})
-        exp_mult = 0.8 if experience <= 1 else 1.0 if experience <= 3 else 1.5 if experience <= 6 else 2.2 if experience <= 10 else 3.0
             
         return {
             'careerRole': predicted_role,
-            'probability': float(f"{confidence:.2f}"),
+            'probability': round(confidence, 2),
             'confidence': 'Very High' if confidence > 0.85 else 'High' if confidence > 0.7 else 'Medium' if confidence > 0.4 else 'Low',
-            'salaryRange': {
-                'min': int(salary_info['min'] * exp_mult),
-                'max': int(salary_info['max'] * exp_mult),
-                'average': int(salary_info['avg'] * exp_mult),
-                'currency': 'INR'
-            },
+            'salaryRange': self.responses.salary_range(predicted_role, experience),
             'alternativeCareers': alternatives
         }
 
-    def analyze_skill_gap(self, user_skills, predicted_role, experience, probability=None):
-        """Analyze skill gaps for predicted role"""
-        required_skills = EXTENDED_SKILL_MAPPING.get(predicted_role, [])
+    def gap_profile(self, role):
+        """
+        A role's canonical skills ranked by importance, built once per
+        catalog version. Importance is the skill's weight in the role's
+        TF-IDF vector: skills few roles ask for weigh more than ones every
+        role lists. impactOnSuccess is the share of the role vector a skill
+        carries, and the tiers split that vector into thirds.
+        """
+        profile = self.gap_profiles.get(role)
+        if profile is not None:
+            return profile
+
+        required_skills = self.catalog.skill_mapping.get(role, [])
         if not required_skills and self.skill_role_mapping:
-             required_skills = list(self.skill_role_mapping.get(predicted_role, {}).keys())
-        
-        required_skills = required_skills[:MAX_SKILLS_TO_CHECK]
-        user_skills_lower = [s.lower() for s in user_skills]
-        
+            required_skills = list(self.skill_role_mapping.get(role, {}).keys())
+        # Canonical id -> every spelling the catalog uses for it, so a role
+        # listing both 'React' and 'React Native' names both
+        spellings = {}
+        for skill in required_skills:
+            spellings.setdefault(SKILL_INDEX.normalize(skill), {}).setdefault(skill.lower(), skill)
+        names = {skill: ' / '.join(variants.values()) for skill, variants in spellings.items()}
+
+        canonical = list(names)
+        weights = self.recommender.skill_weights(canonical)
+        ranked = []
+        covered = 0.0
+        for idx in np.argsort(-weights, kind='stable'):
+            share = float(weights[idx]) ** 2
+            importance = next((tier for bound, tier in IMPORTANCE_TIERS if covered < bound), 'Nice-to-have')
+            ranked.append((canonical[idx], names[canonical[idx]], importance, round(share * 100, 1)))
+            covered += share
+
+        profile = {'skills': frozenset(canonical), 'ranked': ranked}
+        self.gap_profiles[role] = profile
+        return profile
+
+    def analyze_skill_gap(self, user_skills, predicted_role, experience, probability=None, unique_skills=None,
+                          spellings=None):
+        """
+        Analyze skill gaps for predicted role. Skills are compared by
+        canonical id, like the recommender's matched_skills_count. Matching
+        skills are named as spellings maps their canonical ids (by default
+        as the user spelled them; ids it lacks are reported as-is), missing
+        ones in the catalog's spellings.
+        """
+        if spellings is None:
+            resolved = self.recommender.resolve_user_skills(user_skills)
+            spellings = user_spellings(user_skills, resolved)
+            if unique_skills is None:
+                unique_skills = list(dict.fromkeys(resolved))
+        if unique_skills is None:
+            unique_skills = self.recommender.prepare_user_skills(user_skills)
+        profile = self.gap_profile(predicted_role)
+        matched = profile['skills'].intersection(unique_skills)
+
         matching_skills = []
-        missing_skills = []
-        for req in required_skills:
-            if req.lower() in user_skills_lower:
-                matching_skills.append(req)
-            else:
-                missing_skills.append(req)
-        
         missing_skills_detailed = []
-        for idx, skill in enumerate(missing_skills):
-            importance = 'Critical' if idx < 3 else 'Important' if idx < 6 else 'Nice-to-have'
-            impact = 20 - (idx * 1.5)
-            missing_skills_detailed.append({
-                'skill': skill,
-                'importance': importance,
-                'impactOnSuccess': impact
-            })
+        for canonical, name, importance, impact in profile['ranked']:
+            if canonical in matched:
+                matching_skills.append(spellings.get(canonical, canonical))
+            elif len(missing_skills_detailed) < MAX_SKILLS_TO_CHECK:
+                missing_skills_detailed.append({
+                    'skill': name,
+                    'importance': importance,
+                    'impactOnSuccess': impact
+                })
         
         recommended_skills = []
-        for idx, skill in enumerate(missing_skills[:5]):
+        for idx, item in enumerate(missing_skills_detailed[:5]):
             recommended_skills.append({
-                'skill': skill,
+                'skill': item['skill'],
                 'reason': f'Essential for {predicted_role} role',
                 'priority': 5 - idx
             })
         
-        overall_match = int(probability * 100) if probability is not None else int((len(matching_skills) / max(len(required_skills), 1)) * 100)
+        overall_match = int(probability * 100) if probability is not None else int((len(matched) / max(len(profile['ranked']), 1)) * 100)
         
         return {
             'matchingSkills': matching_skills,
@@ -191,42 +390,14 @@ class CareerPredictor:
         }
 
     def generate_insights(self, role, experience, skill_match):
-        """Generate career insights"""
-        high_demand_roles = ['Software Engineer', 'Data Scientist', 'ML Engineer', 'AI Engineer', 'DevOps Engineer', 'Data Engineer', 'Full Stack Developer', 'Cloud Architect', 'Cybersecurity Analyst', 'Blockchain Developer']
-        market_demand = 'High' if role in high_demand_roles else 'Medium'
-        
-        if role in ['AI Engineer', 'ML Engineer', 'Data Scientist', 'Cybersecurity Analyst', 'Cloud Architect', 'Blockchain Developer']:
-            growth_potential = 'Very High'
-        elif experience < 3 and skill_match > 60:
-            growth_potential = 'High'
-        else:
-            growth_potential = 'Medium'
-        
-        recommendations = []
-        if skill_match < 70:
-            recommendations.append('Focus on acquiring missing critical skills through projects or certifications.')
-        if experience < 2:
-            recommendations.append('Build a strong portfolio of projects on GitHub.')
-            recommendations.append('Participate in hackathons to gain practical experience.')
-        recommendations.append('Network with professionals on LinkedIn in your target role.')
-        recommendations.append('Stay updated with industry trends.')
-        
-        industry_trends = [
-            'AI and Generative AI adoption is creating massive demand for AI/ML engineers.',
-            'Cloud-native architectures are becoming the standard (AWS/Azure/GCP).',
-            'Cybersecurity is a top priority for all enterprises.',
-            'Remote and hybrid work models are stabilizing.'
-        ]
-        
-        return {
-            'marketDemand': market_demand,
-            'growthPotential': growth_potential,
-            'recommendations': recommendations,
-            'industryTrends': industry_trends
-        }
+        """Generate career insights from the role's prebuilt parts"""
+        return self.responses.insights(role, experience, skill_match)
 
     def get_available_skills(self):
-        """Get list of available skills"""
+        """Get list of available skills, built once per version"""
+        if self.available_skills is not None:
+            return self.available_skills
+
         default_skills = [
             'Python', 'JavaScript', 'Java', 'C++', 'C#', 'Go', 'Rust', 'Swift', 'Kotlin', 'PHP', 'Ruby',
             'SQL', 'NoSQL', 'MongoDB', 'PostgreSQL', 'Redis', 'Cassandra', 'Elasticsearch',
@@ -244,28 +415,231 @@ class CareerPredictor:
         if self.skills_encoder is not None:
              final_skills.update(self.skills_encoder.classes_)
              
-        return sorted(list(final_skills))
+        skills = sorted(str(skill) for skill in final_skills)
+        self.skills_etag = hashlib.sha1(json.dumps(skills).encode('utf-8')).hexdigest()[:16]
+        self.available_skills = skills
+        return skills
+
+    def suggest_skills(self, prefix, limit=10):
+        """Ranked available skills whose name or a synonym starts with prefix"""
+        if self.suggester is None:
+            self.suggester = SkillTrie(self.get_available_skills(), self.recommender.skill_role_counts())
+        return self.suggester.suggest(prefix, limit)
+
+    def predict(self, degree, skills, experience, engine=DEFAULT_ENGINE, use_cache=True):
+        """Main prediction entry point; use_cache=False runs every stage even for a cached profile"""
+        error = self.engine_error(engine)
+        if error:
+            raise ValueError(error)
+        METRICS.observe('ml_request_skills', len(skills))
+        with METRICS.timer(STAGE_METRIC, stage='normalize'):
+            resolved = self.recommender.resolve_user_skills(skills)
+            unique_skills = list(dict.fromkeys(resolved))
+        with METRICS.timer(STAGE_METRIC, stage='cache_lookup'):
+            key = self.cache_key(degree, unique_skills, experience, engine)
+            cached = self.cache.get(key) if use_cache else None
+        if cached is not None:
+            result = cached
+        elif not use_cache:
+            result = self._predict_prepared(degree, skills, experience, engine, unique_skills)
+        else:
+            # Concurrent misses of one profile, in any worker sharing the
+            # cache, are computed once
+            result = self.cache.compute(
+                key, lambda: self._predict_prepared(degree, skills, experience, engine, unique_skills)
+            )
+        return spell_matches(result, user_spellings(skills, resolved))
 
-    def predict(self, degree, skills, experience):
-        """Main prediction entry point"""
-        # Uses the new TF-IDF engine instead of the old rule-based fallback
-        prediction_result = self.predict_with_tfidf(degree, skills, experience)
+    def _predict_prepared(self, degree, skills, experience, engine, unique_skills):
+        """Prediction for a profile whose skills went through prepare_user_skills, bypassing the cache"""
+        if engine == 'embedding':
+            with METRICS.timer(STAGE_METRIC, stage='embedding'):
+                recommendations = self.embeddings.recommend_prepared(unique_skills, top_n=TOP_N_RECOMMENDATIONS)
+        else:
+            # Uses the new TF-IDF engine instead of the old rule-based fallback
+            with METRICS.timer(STAGE_METRIC, stage='tfidf'):
+                recommendations = self.recommender.recommend_prepared(unique_skills, top_n=TOP_N_RECOMMENDATIONS)
+            if self.hybrid is not None:
+                with METRICS.timer(STAGE_METRIC, stage='hybrid'):
+                    recommendations = self.hybrid.rerank(
+                        [degree], [experience], [unique_skills], [recommendations], TOP_N_RECOMMENDATIONS
+                    )[0]
+        prediction_result = self.predict_with_tfidf(degree, skills, experience, recommendations=recommendations)
+        return self._assemble_prediction(prediction_result, skills, experience, unique_skills)
+
+    def predict_many(self, profiles):
+        """
+        Predict for a batch of profiles, scoring all of them with a single
+        vectorized pass per engine. Returns one entry per profile, in
+        order: the prediction, or a dict with an 'error' key.
+        """
+        results = [None] * len(profiles)
+        spellings = {}
+        keys = {}
+        valid = {engine: [] for engine in ENGINES}
+        skill_lists = {engine: [] for engine in ENGINES}
+        for i, profile in enumerate(profiles):
+            error = validate_profile(profile)
+            engine = profile.get('engine', DEFAULT_ENGINE) if not error else None
+            error = error or self.engine_error(engine)
+            if error:
+                results[i] = {'error': error}
+                continue
+            METRICS.observe('ml_request_skills', len(profile['skills']))
+            resolved = self.recommender.resolve_user_skills(profile['skills'])
+            spellings[i] = user_spellings(profile['skills'], resolved)
+            unique_skills = list(dict.fromkeys(resolved))
+            key = self.cache_key(profile['degree'], unique_skills, profile['experience'], engine)
+            cached = self.cache.get(key)
+            if cached is not None:
+                results[i] = cached
+            else:
+                keys[i] = key
+                valid[engine].append(i)
+                skill_lists[engine].append(unique_skills)
         
-        skill_gap = self.analyze_skill_gap(
-            skills, 
-            prediction_result['careerRole'],
-            experience,
-            prediction_result['probability']
-        )
+        recommendations = {}
+        with METRICS.timer(STAGE_METRIC, stage='tfidf_batch'):
+            recommendations['tfidf'] = self.recommender.recommend_many(
+                skill_lists['tfidf'],
+                top_n=TOP_N_RECOMMENDATIONS,
+                prepared=True
+            )
+        if self.hybrid is not None:
+            with METRICS.timer(STAGE_METRIC, stage='hybrid'):
+                recommendations['tfidf'] = self.hybrid.rerank(
+                    [profiles[i]['degree'] for i in valid['tfidf']],
+                    [profiles[i]['experience'] for i in valid['tfidf']],
+                    skill_lists['tfidf'],
+                    recommendations['tfidf'],
+                    TOP_N_RECOMMENDATIONS
+                )
+        recommendations['embedding'] = []
+        if valid['embedding']:
+            with METRICS.timer(STAGE_METRIC, stage='embedding_batch'):
+                recommendations['embedding'] = self.embeddings.recommend_many(
+                    skill_lists['embedding'],
+                    top_n=TOP_N_RECOMMENDATIONS
+                )
         
-        insights = self.generate_insights(
-            prediction_result['careerRole'],
-            experience,
-            skill_gap['overallMatch']
-        )
+        for engine in ENGINES:
+            for i, unique_skills, item_recommendations in zip(valid[engine], skill_lists[engine], recommendations[engine]):
+                profile = profiles[i]
+                try:
+                    prediction_result = self.predict_with_tfidf(
+                        profile['degree'],
+                        profile['skills'],
+                        profile['experience'],
+                        recommendations=item_recommendations
+                    )
+                    results[i] = self._assemble_prediction(
+                        prediction_result, profile['skills'], profile['experience'], unique_skills
+                    )
+                    self.cache.put(keys[i], results[i])
+                except Exception as e:
+                    results[i] = {'error': 'Prediction failed', 'message': str(e)}
+        
+        return [
+            spell_matches(result, spellings[i]) if 'error' not in result else result
+            for i, result in enumerate(results)
+        ]
+
+    def what_if(self, skills, pairs=False, limit=10):
+        """
+        Skills missing from the user's top roles ranked by the match they
+        would lead to, from one vectorized pass of the TF-IDF recommender.
+        Ranks by TF-IDF similarity alone, also in hybrid mode.
+        """
+        unique_skills = self.recommender.prepare_user_skills(skills)
+        with METRICS.timer(STAGE_METRIC, stage='what_if'):
+            result = self.recommender.what_if(unique_skills, TOP_N_RECOMMENDATIONS, pairs)
+        current = result['current']
+        # Show skills in the catalog's spelling of the roles they come from
+        names = {}
+        for item in current:
+            for canonical, name, _, _ in self.gap_profile(item['role'])['ranked']:
+                names.setdefault(canonical, name)
+
+        def entries(additions):
+            return [
+                {
+                    'addSkills': [names.get(skill, skill) for skill in item['skills']],
+                    'predictedRole': item['top']['role'],
+                    'matchScore': item['top']['matchScore'],
+                    'matchGain': item['top']['matchScore'] - current[0]['matchScore'],
+                    'roleGains': [
+                        {'role': role['role'], 'similarityGain': round(float(gain), 4)}
+                        for role, gain in zip(current, item['gains'])
+                    ]
+                }
+                for item in additions[:limit]
+            ]
+
+        response = {
+            'predictedRole': current[0]['role'],
+            'matchScore': current[0]['matchScore'],
+            'alternatives': [{'role': item['role'], 'matchScore': item['matchScore']} for item in current[1:]],
+            'skills': entries(result['additions'])
+        }
+        if pairs:
+            response['pairs'] = entries(result['pairs'])
+        return response
+
+    def _assemble_prediction(self, prediction_result, skills, experience, unique_skills):
+        """Run skill gap analysis and insights on top of a role prediction"""
+        # Cached predictions are shared by every spelling of the same skills,
+        # so matches stay canonical ids until spell_matches names them the
+        # way the requesting user did
+        with METRICS.timer(STAGE_METRIC, stage='skill_gap'):
+            skill_gap = self.analyze_skill_gap(
+                skills, 
+                prediction_result['careerRole'],
+                experience,
+                prediction_result['probability'],
+                unique_skills,
+                spellings={}
+            )
+        
+        with METRICS.timer(STAGE_METRIC, stage='insights'):
+            insights = self.generate_insights(
+                prediction_result['careerRole'],
+                experience,
+                skill_gap['overallMatch']
+            )
         
         return {
             'prediction': prediction_result,
             'skillGap': skill_gap,
             'insights': insights
         }
+
+
+def user_spellings(user_skills, resolved):
+    """Canonical id -> the user's first spelling of it, from skills and their resolve_user_skills ids"""
+    spellings = {}
+    for skill, canonical in zip(user_skills, resolved):
+        spellings.setdefault(canonical, skill)
+    return spellings
+
+
+def spell_matches(result, spellings):
+    """Copy of a prediction whose matchingSkills are named as spellings maps their canonical ids"""
+    skill_gap = result['skillGap']
+    matching = [spellings.get(skill, skill) for skill in skill_gap['matchingSkills']]
+    return dict(result, skillGap=dict(skill_gap, matchingSkills=matching))
+
+
+def validate_profile(profile):
+    """Return an error message for a malformed profile, or None if it is usable"""
+    if not isinstance(profile, dict):
+        return 'Profile must be an object'
+    for field in REQUIRED_FIELDS:
+        if field not in profile:
+            return f'Missing required field: {field}'
+    skills = profile['skills']
+    if not isinstance(skills, list) or not all(isinstance(s, str) for s in skills):
+        return 'Field skills must be a list of strings'
+    experience = profile['experience']
+    if isinstance(experience, bool) or not isinstance(experience, (int, float)):
+        return 'Field experience must be a number'
+    return None
@@ -0,0 +1,269 @@
+"""
+Opt-in profiling for finding where a slow request spends its time.
+
+profile_call runs one call under cProfile (deterministic, every function
+call is recorded) and SamplingProfiler samples the stacks of live threads
+for a while and writes them as folded stacks, the input format of
+flamegraph.pl, speedscope and inferno. Nothing here runs unless a caller
+asks for it, so the service pays nothing while profiling is off.
+
+A sampling run started in one gunicorn worker is announced in a control
+directory every worker watches (PROFILE_CONTROL_DIR, set up by
+gunicorn.conf.py like METRICS_DIR), so all workers sample the same window
+and the worker that started the run merges their stacks into one file.
+"""
+import io
+import os
+import sys
+import glob
+import json
+import time
+import uuid
+import cProfile
+import pstats
+import tempfile
+import threading
+from collections import Counter
+from datetime import datetime
+
+# Where profiles are written; one .prof file per profiled request and one
+# .folded file per sampling run
+PROFILE_DIR = os.environ.get('PROFILE_DIR', os.path.join(tempfile.gettempdir(), 'ml-service-profiles'))
+# Functions listed in the text summary of a profiled call
+PROFILE_SUMMARY_LINES = 40
+# Seconds between stack samples; ~200 samples/s per thread costs little
+SAMPLE_INTERVAL = 0.005
+# Longest sampling run the admin endpoint accepts
+MAX_SAMPLE_SECONDS = 300
+# Directory through which workers announce sampling runs to each other;
+# without one a run only samples the worker it was started in
+PROFILE_CONTROL_DIR = os.environ.get('PROFILE_CONTROL_DIR')
+CONTROL_FILENAME = 'sampling-run.json'
+# Seconds between checks of the control directory for announced runs
+CONTROL_POLL_INTERVAL = 0.25
+# Seconds past the end of a run the starting worker waits for the stacks
+# of the other workers before merging what it has
+MERGE_GRACE_SECONDS = 5
+
+
+def _profile_path(prefix, extension, directory=None):
+    directory = directory or PROFILE_DIR
+    os.makedirs(directory, exist_ok=True)
+    stamp = datetime.now().strftime('%Y%m%d-%H%M%S-%f')
+    return os.path.join(directory, f'{prefix}-{stamp}-{os.getpid()}.{extension}')
+
+
+def profile_call(func, *args, directory=None, **kwargs):
+    """
+    Run func under cProfile. Returns its result and a summary: the .prof
+    file the stats were dumped to (for pstats, snakeviz, gprof2dot) and the
+    slowest functions by cumulative time as text.
+    """
+    profiler = cProfile.Profile()
+    result = profiler.runcall(func, *args, **kwargs)
+    path = _profile_path('request', 'prof', directory)
+    profiler.dump_stats(path)
+
+    text = io.StringIO()
+    stats = pstats.Stats(profiler, stream=text)
+    stats.sort_stats('cumulative').print_stats(PROFILE_SUMMARY_LINES)
+    return result, {
+        'file': path,
+        'totalSeconds': round(stats.total_tt, 6),
+        'stats': text.getvalue()
+    }
+
+
+def _frame_name(frame):
+    code = frame.f_code
+    return f'{os.path.basename(code.co_filename)}:{code.co_name}'
+
+
+def _run_path(directory, run_id, suffix):
+    return os.path.join(directory, f'samples-{run_id}{suffix}')
+
+
+def _read_folded(path):
+    """Counter of stacks in a folded-stacks file"""
+    stacks = Counter()
+    with open(path) as f:
+        for line in f:
+            stack, _, count = line.rstrip('\n').rpartition(' ')
+            if stack:
+                stacks[stack] += int(count)
+    return stacks
+
+
+def _write_folded(path, stacks):
+    tmp_path = f'{path}.{os.getpid()}.tmp'
+    with open(tmp_path, 'w') as f:
+        for stack, count in stacks.most_common():
+            f.write(f'{stack} {count}\n')
+    os.replace(tmp_path, path)
+
+
+class SamplingProfiler:
+    """
+    Samples the Python stacks of this process's threads every
+    SAMPLE_INTERVAL seconds from a background thread and counts identical
+    stacks. Unless all_threads is set, only threads registered with
+    enter() (those serving a request) are sampled, so idle workers waiting
+    on sockets do not drown the profile. One run at a time.
+    
+    With a control directory, start() also announces the run there. Every
+    process that called watch() samples until the same deadline and writes
+    its part as samples-<run>-<pid>.folded; the starting process then sums
+    the parts into samples-<run>.folded, which its last_run points at.
+    """
+
+    def __init__(self, interval=SAMPLE_INTERVAL, control_dir=PROFILE_CONTROL_DIR):
+        self.interval = interval
+        self.control_dir = control_dir
+        self.running = False
+        self.last_run = None
+        self._active = set()
+        self._lock = threading.Lock()
+        self._done = threading.Event()
+        self._watcher_pid = None
+
+    def enter(self):
+        """Mark the calling thread as serving a request"""
+        self._active.add(threading.get_ident())
+
+    def exit(self):
+        self._active.discard(threading.get_ident())
+
+    def start(self, seconds, all_threads=False, directory=None):
+        """Start sampling for `seconds`; returns False if a run is already going"""
+        run = {
+            'id': f"{datetime.now().strftime('%Y%m%d-%H%M%S')}-{uuid.uuid4().hex[:6]}",
+            'pid': os.getpid(),
+            'deadline': time.time() + seconds,
+            'allThreads': all_threads,
+            'directory': directory or PROFILE_DIR
+        }
+        if not self._begin(run, merge=bool(self.control_dir)):
+            return False
+        if self.control_dir:
+            try:
+                os.makedirs(self.control_dir, exist_ok=True)
+                path = os.path.join(self.control_dir, CONTROL_FILENAME)
+                tmp_path = f'{path}.{os.getpid()}.tmp'
+                with open(tmp_path, 'w') as f:
+                    json.dump(run, f)
+                os.replace(tmp_path, path)
+            except OSError as e:
+                print(f"WARNING: Could not announce sampling run to other workers - {e}")
+        return True
+
+    def watch(self):
+        """
+        Follow runs other processes announce in the control directory.
+        Safe to call on every request: it only starts once per process,
+        so workers forked after import get their own thread.
+        """
+        if not self.control_dir or self._watcher_pid == os.getpid():
+            return
+        with self._lock:
+            if self._watcher_pid == os.getpid():
+                return
+            self._watcher_pid = os.getpid()
+        threading.Thread(target=self._follow, name='sampling-profiler-control', daemon=True).start()
+
+    def _follow(self):
+        path = os.path.join(self.control_dir, CONTROL_FILENAME)
+        seen = None
+        while True:
+            try:
+                with open(path) as f:
+                    run = json.load(f)
+            except (OSError, ValueError):
+                run = None
+            if run is not None and run['id'] != seen:
+                seen = run['id']
+                if run['pid'] != os.getpid() and run['deadline'] > time.time():
+                    self._begin(run, merge=False)
+            time.sleep(CONTROL_POLL_INTERVAL)
+
+    def _begin(self, run, merge):
+        with self._lock:
+            if self.running:
+                return False
+            # Requests that were in flight when the last run ended never exited
+            self._active.clear()
+            self.running = True
+            self._done.clear()
+        os.makedirs(run['directory'], exist_ok=True)
+        # Marks this process as taking part, so the merge waits for its stacks
+        open(_run_path(run['directory'], run['id'], f'-{os.getpid()}.started'), 'w').close()
+        threading.Thread(target=self._run, args=(run, merge), name='sampling-profiler', daemon=True).start()
+        return True
+
+    def wait(self, timeout=None):
+        """Block until the current run has written its file; returns its summary"""
+        self._done.wait(timeout)
+        return self.last_run
+
+    def _run(self, run, merge):
+        own = threading.get_ident()
+        stacks = Counter()
+        samples = 0
+        started = time.perf_counter()
+        directory = run['directory']
+        try:
+            while time.time() < run['deadline']:
+                for ident, frame in sys._current_frames().items():
+                    if ident == own or not (run['allThreads'] or ident in self._active):
+                        continue
+                    names = []
+                    while frame is not None:
+                        names.append(_frame_name(frame))
+                        frame = frame.f_back
+                    stacks[';'.join(reversed(names))] += 1
+                samples += 1
+                time.sleep(self.interval)
+
+            path = _run_path(directory, run['id'], f'-{os.getpid()}.folded')
+            _write_folded(path, stacks)
+            self.last_run = {
+                'file': path,
+                'seconds': round(time.perf_counter() - started, 3),
+                'samples': samples,
+                'stacks': len(stacks),
+                'workers': 1,
+                'finished': datetime.now().isoformat()
+            }
+            if merge:
+                self.last_run.update(self._merge(run))
+        except Exception as e:
+            print(f"WARNING: Sampling profiler failed - {e}")
+            self.last_run = {'file': None, 'error': str(e), 'finished': datetime.now().isoformat()}
+        finally:
+            try:
+                os.remove(_run_path(directory, run['id'], f'-{os.getpid()}.started'))
+            except OSError:
+                pass
+            self.running = False
+            self._done.set()
+
+    def _merge(self, run):
+        """Sum the parts of every process that took part in a run into one file"""
+        directory = run['directory']
+        started = _run_path(glob.escape(directory), run['id'], '-*.started')
+        give_up = run['deadline'] + MERGE_GRACE_SECONDS
+        while time.time() < give_up:
+            pending = [
+                marker for marker in glob.glob(started)
+                if not os.path.exists(marker[:-len('.started')] + '.folded')
+            ]
+            if not pending:
+                break
+            time.sleep(CONTROL_POLL_INTERVAL)
+
+        stacks = Counter()
+        parts = glob.glob(_run_path(glob.escape(directory), run['id'], '-*.folded'))
+        for part in parts:
+            stacks.update(_read_folded(part))
+        path = _run_path(directory, run['id'], '.folded')
+        _write_folded(path, stacks)
+        return {'file': path, 'stacks': len(stacks), 'workers': len(parts)}
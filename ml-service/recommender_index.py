@@ -0,0 +1,119 @@
+import os
+import glob
+import json
+import uuid
+import hashlib
+import numpy as np
+from scipy import sparse
+
+# Bump whenever the arrays stored in the artifact change meaning
+INDEX_FORMAT_VERSION = 2
+INDEX_FILENAME = 'tfidf_index.json'
+
+# Weights of the role matrix and its postings. float32 halves the pages
+# every worker maps compared to float64.
+MATRIX_DTYPE = np.float32
+
+
+def catalog_checksum(skill_mapping, synonyms):
+    """Checksum of the catalog inputs a recommender index is built from"""
+    payload = json.dumps(
+        {'format': INDEX_FORMAT_VERSION, 'roles': skill_mapping, 'synonyms': synonyms},
+        sort_keys=True
+    )
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+def _array_path(path, token, name):
+    """Array file of the save identified by token, next to the manifest"""
+    base = path[:-len('.json')] if path.endswith('.json') else path
+    return f"{base}.{token}.{name}.npy"
+
+
+def save_index(path, checksum, roles, role_skills_list, vocabulary, idf, tfidf_matrix, postings):
+    """
+    Write a recommender index artifact: a JSON manifest naming one
+    uncompressed .npy file per array, so workers can memory-map the role
+    matrix and its postings instead of each holding a private copy.
+    """
+    tfidf_matrix = sparse.csr_matrix(tfidf_matrix, dtype=MATRIX_DTYPE)
+    postings = sparse.csc_matrix(postings, dtype=MATRIX_DTYPE)
+    arrays = {
+        'idf': np.asarray(idf, dtype=np.float64),
+        'data': tfidf_matrix.data,
+        'indices': tfidf_matrix.indices,
+        'indptr': tfidf_matrix.indptr,
+        'postings_data': postings.data,
+        'postings_indices': postings.indices,
+        'postings_indptr': postings.indptr
+    }
+
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+
+    # Arrays go to files unique to this save and the manifest naming them is
+    # renamed into place last, so readers never see a partial index
+    token = uuid.uuid4().hex[:12]
+    for name, array in arrays.items():
+        np.save(_array_path(path, token, name), array)
+    manifest = {
+        'format_version': INDEX_FORMAT_VERSION,
+        'checksum': checksum,
+        'token': token,
+        'shape': list(tfidf_matrix.shape),
+        'roles': list(roles),
+        'role_skills': [list(skills) for skills in role_skills_list],
+        'vocabulary': list(vocabulary)
+    }
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, 'w') as f:
+        json.dump(manifest, f)
+    os.replace(tmp_path, path)
+
+    # Earlier saves are unreferenced now; processes that mapped them keep
+    # their pages until they let go
+    for stale in glob.glob(_array_path(glob.escape(path), '*', '*')):
+        if f".{token}." not in os.path.basename(stale):
+            try:
+                os.remove(stale)
+            except OSError:
+                pass
+
+
+def load_index(path, checksum):
+    """
+    Load a recommender index artifact with its arrays memory-mapped
+    read-only. Returns None if it is missing, unreadable, from another
+    format version or built from another catalog.
+    """
+    if not path or not os.path.exists(path):
+        return None
+
+    try:
+        with open(path) as f:
+            manifest = json.load(f)
+        if manifest.get('format_version') != INDEX_FORMAT_VERSION:
+            print(f"WARNING: Recommender index {path} has an unsupported format version")
+            return None
+        if manifest['checksum'] != checksum:
+            print(f"WARNING: Recommender index {path} is stale for the current catalog")
+            return None
+
+        def array(name):
+            return np.load(_array_path(path, manifest['token'], name), mmap_mode='r', allow_pickle=False)
+
+        shape = tuple(manifest['shape'])
+        return {
+            'roles': manifest['roles'],
+            'role_skills_list': manifest['role_skills'],
+            'vocabulary': manifest['vocabulary'],
+            'idf': array('idf'),
+            'tfidf_matrix': sparse.csr_matrix((array('data'), array('indices'), array('indptr')), shape=shape),
+            'postings': sparse.csc_matrix(
+                (array('postings_data'), array('postings_indices'), array('postings_indptr')), shape=shape
+            )
+        }
+    except Exception as e:
+        print(f"WARNING: Could not load recommender index {path} - {e}")
+        return None
@@ -0,0 +1,109 @@
+"""
+Static parts of prediction responses, built once per role and version.
+
+Market demand, growth tier and salary bands only depend on the role, and
+insight texts only on two thresholds, so requests pick prebuilt pieces
+instead of rebuilding lists and formatting numbers. The pieces are shared
+between responses (like cached predictions are) and must not be mutated.
+"""
+
+# Salary used for roles without catalog salary data
+DEFAULT_SALARY = {'min': 400000, 'max': 1000000, 'avg': 700000}
+
+# Salary multiplier for experience up to each bound (years); beyond the last
+# bound EXPERIENCE_MULTIPLIER_MAX applies
+EXPERIENCE_MULTIPLIERS = ((1, 0.8), (3, 1.0), (6, 1.5), (10, 2.2))
+EXPERIENCE_MULTIPLIER_MAX = 3.0
+
+HIGH_DEMAND_ROLES = frozenset([
+    'Software Engineer', 'Data Scientist', 'ML Engineer', 'AI Engineer', 'DevOps Engineer', 'Data Engineer',
+    'Full Stack Developer', 'Cloud Architect', 'Cybersecurity Analyst', 'Blockchain Developer'
+])
+VERY_HIGH_GROWTH_ROLES = frozenset([
+    'AI Engineer', 'ML Engineer', 'Data Scientist', 'Cybersecurity Analyst', 'Cloud Architect', 'Blockchain Developer'
+])
+
+INDUSTRY_TRENDS = [
+    'AI and Generative AI adoption is creating massive demand for AI/ML engineers.',
+    'Cloud-native architectures are becoming the standard (AWS/Azure/GCP).',
+    'Cybersecurity is a top priority for all enterprises.',
+    'Remote and hybrid work models are stabilizing.'
+]
+
+_SKILLS_ADVICE = ['Focus on acquiring missing critical skills through projects or certifications.']
+_JUNIOR_ADVICE = [
+    'Build a strong portfolio of projects on GitHub.',
+    'Participate in hackathons to gain practical experience.'
+]
+_GENERAL_ADVICE = [
+    'Network with professionals on LinkedIn in your target role.',
+    'Stay updated with industry trends.'
+]
+# Recommendations by (skill match below 70, experience below 2 years)
+RECOMMENDATIONS = {
+    (low_match, junior): (_SKILLS_ADVICE if low_match else []) + (_JUNIOR_ADVICE if junior else []) + _GENERAL_ADVICE
+    for low_match in (False, True) for junior in (False, True)
+}
+
+
+def experience_band(experience):
+    """Index of the salary multiplier that applies to an experience level"""
+    for band, (bound, _) in enumerate(EXPERIENCE_MULTIPLIERS):
+        if experience <= bound:
+            return band
+    return len(EXPERIENCE_MULTIPLIERS)
+
+
+class ResponseAssembler:
+    """
+    Per-role static response parts for a role catalog. Each role is built
+    on first use; the predictor replaces the assembler whenever its version
+    changes, so catalog upserts never pay for the whole catalog.
+    """
+
+    def __init__(self, catalog):
+        self.catalog = catalog
+        self.roles = {}
+
+    def role(self, role):
+        """Static parts of a role: market demand, growth tier and salary range per experience band"""
+        parts = self.roles.get(role)
+        if parts is not None:
+            return parts
+
+        salary = self.catalog.salary_data.get(role, DEFAULT_SALARY)
+        multipliers = [multiplier for _, multiplier in EXPERIENCE_MULTIPLIERS] + [EXPERIENCE_MULTIPLIER_MAX]
+        parts = {
+            'market_demand': 'High' if role in HIGH_DEMAND_ROLES else 'Medium',
+            'very_high_growth': role in VERY_HIGH_GROWTH_ROLES,
+            'salary_ranges': [
+                {
+                    'min': int(salary['min'] * multiplier),
+                    'max': int(salary['max'] * multiplier),
+                    'average': int(salary['avg'] * multiplier),
+                    'currency': 'INR'
+                }
+                for multiplier in multipliers
+            ]
+        }
+        self.roles[role] = parts
+        return parts
+
+    def salary_range(self, role, experience):
+        return self.role(role)['salary_ranges'][experience_band(experience)]
+
+    def insights(self, role, experience, skill_match):
+        parts = self.role(role)
+        if parts['very_high_growth']:
+            growth_potential = 'Very High'
+        elif experience < 3 and skill_match > 60:
+            growth_potential = 'High'
+        else:
+            growth_potential = 'Medium'
+
+        return {
+            'marketDemand': parts['market_demand'],
+            'growthPotential': growth_potential,
+            'recommendations': RECOMMENDATIONS[(skill_match < 70, experience < 2)],
+            'industryTrends': INDUSTRY_TRENDS
+        }
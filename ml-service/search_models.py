@@ -0,0 +1,237 @@
+"""
+Hyperparameter search over model families, recorded in the model registry.
+
+    python search_models.py search --cpus 4 --promote --max-latency-ms 50
+    python search_models.py list
+    python search_models.py promote 20240101-120000-random_forest-1
+
+Every candidate is cross-validated and refit on the same generated training
+set, then scored on a held-out chunk. Fit time, predict_proba latency per
+1k rows (single-threaded, through the memory-mapped forest export for tree
+models, as served), artifact size and accuracy are stored with the
+artifacts under models/registry/<version>/. A candidate's directory only
+appears once all of it is written; failed candidates leave nothing behind.
+"""
+import argparse
+import itertools
+import os
+import sys
+import shutil
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import datetime
+import numpy as np
+from sklearn.ensemble import ExtraTreesClassifier, RandomForestClassifier
+from sklearn.linear_model import LogisticRegression, SGDClassifier
+from sklearn.model_selection import StratifiedKFold, cross_val_score
+from threadpoolctl import threadpool_limits
+from forest import ForestArrays
+from model_registry import ModelRegistry, RegistryError, select_best
+from train_model import (
+    RANDOM_SEED, ROLES, chunk_features, generate_dataset, load_chunk, save_artifacts
+)
+
+# Candidate grid per model family; every combination is one candidate
+SEARCH_SPACE = {
+    'random_forest': {'n_estimators': [25, 100], 'max_depth': [10, 15], 'min_samples_split': [5]},
+    'extra_trees': {'n_estimators': [25, 100], 'max_depth': [10, 15], 'min_samples_split': [5]},
+    'sgd': {'alpha': [1e-4, 1e-3]},
+    'logistic_regression': {'C': [0.1, 1.0]}
+}
+DEFAULT_SAMPLES = 20000
+DEFAULT_FOLDS = 3
+# Rows per latency measurement and timed repetitions (the fastest is kept)
+LATENCY_ROWS = 1000
+LATENCY_REPEATS = 5
+
+
+def make_model(family, params, seed=RANDOM_SEED):
+    """Unfitted estimator; everything runs single-threaded so --cpus is the real budget"""
+    if family == 'random_forest':
+        return RandomForestClassifier(random_state=seed, n_jobs=1, **params)
+    if family == 'extra_trees':
+        return ExtraTreesClassifier(random_state=seed, n_jobs=1, **params)
+    if family == 'sgd':
+        return SGDClassifier(loss='log_loss', random_state=seed, **params)
+    if family == 'logistic_regression':
+        return LogisticRegression(max_iter=1000, **params)
+    raise ValueError(f'Unknown model family: {family}')
+
+
+def expand_grid(families=None):
+    """(family, params) for every grid point of the selected families"""
+    candidates = []
+    for family, grid in SEARCH_SPACE.items():
+        if families and family not in families:
+            continue
+        names = sorted(grid)
+        for values in itertools.product(*(grid[name] for name in names)):
+            candidates.append((family, dict(zip(names, values))))
+    return candidates
+
+
+def load_training_set(paths):
+    chunks = [load_chunk(path) for path in paths]
+    X = np.concatenate([chunk_features(chunk) for chunk in chunks])
+    y = np.concatenate([chunk['role'] for chunk in chunks])
+    skill_counts = np.zeros((len(ROLES), chunks[0]['skills'].shape[1]), dtype=np.int64)
+    for chunk in chunks:
+        np.add.at(skill_counts, chunk['role'], chunk['skills'].astype(np.int64))
+    return X, y, skill_counts
+
+
+def measure_latency(model, X):
+    """Fastest predict_proba time over LATENCY_ROWS rows, in ms per 1k rows"""
+    rows = np.resize(X, (LATENCY_ROWS, X.shape[1]))
+    best = None
+    for _ in range(LATENCY_REPEATS):
+        start = time.perf_counter()
+        model.predict_proba(rows)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best * 1000 * 1000 / LATENCY_ROWS
+
+
+def evaluate_candidate(task):
+    """Cross-validate, refit, measure and register one candidate (runs in a worker process)"""
+    family, params, train_paths, validation_path, folds, seed, registry_root, version = task
+    with threadpool_limits(1):
+        X, y, skill_counts = load_training_set(train_paths)
+        cv_scores = cross_val_score(
+            make_model(family, params, seed), X, y,
+            cv=StratifiedKFold(folds, shuffle=True, random_state=seed), n_jobs=1
+        )
+
+        start = time.perf_counter()
+        model = make_model(family, params, seed).fit(X, y)
+        fit_seconds = time.perf_counter() - start
+
+        validation = load_chunk(validation_path)
+        X_val = chunk_features(validation)
+        heldout_accuracy = model.score(X_val, validation['role'])
+
+    registry = ModelRegistry(registry_root)
+    directory = registry.staging_path(version)
+    os.makedirs(directory)
+    try:
+        save_artifacts(directory, model, skill_counts)
+        # Tree models are served through their memory-mapped export, so
+        # that is what gets timed; other models through the pickle
+        served = ForestArrays.load(directory) or model
+        with threadpool_limits(1):
+            latency = measure_latency(served, X_val)
+        metadata = {
+            'family': family,
+            'params': params,
+            'created': datetime.now().isoformat(),
+            'training': {'samples': int(len(y)), 'folds': folds, 'seed': seed},
+            'serving': 'forest' if isinstance(served, ForestArrays) else 'pickle',
+            'metrics': {
+                'cv_accuracy_mean': round(float(cv_scores.mean()), 5),
+                'cv_accuracy_std': round(float(cv_scores.std()), 5),
+                'heldout_accuracy': round(float(heldout_accuracy), 5),
+                'fit_seconds': round(fit_seconds, 4),
+                'latency_ms_per_1k': round(latency, 4),
+                'size_kb': round(os.path.getsize(os.path.join(directory, 'career_model.pkl')) / 1024, 1)
+            }
+        }
+        registry.add(version, metadata)
+    except BaseException:
+        shutil.rmtree(directory, ignore_errors=True)
+        raise
+    return dict(metadata, version=version)
+
+
+def search(registry, families=None, samples=DEFAULT_SAMPLES, folds=DEFAULT_FOLDS, cpus=None,
+           seed=RANDOM_SEED):
+    """Evaluate every candidate in a process pool of `cpus` workers; returns their metadata"""
+    candidates = expand_grid(families)
+    cpus = max(1, min(cpus or os.cpu_count() or 1, len(candidates)))
+    results = []
+    with tempfile.TemporaryDirectory() as data_dir:
+        train_paths, validation_path = generate_dataset(data_dir, samples, samples, workers=1, seed=seed)
+        versions = []
+        for family, _ in candidates:
+            versions.append(registry.new_version(family, taken=versions))
+        tasks = [
+            (family, params, train_paths, validation_path, folds, seed, registry.root, version)
+            for (family, params), version in zip(candidates, versions)
+        ]
+        print(f"Evaluating {len(tasks)} candidates on {cpus} CPU(s)...")
+        with ProcessPoolExecutor(max_workers=cpus) as pool:
+            futures = {pool.submit(evaluate_candidate, task): task for task in tasks}
+            for future in as_completed(futures):
+                family, params = futures[future][:2]
+                try:
+                    results.append(future.result())
+                    print_candidate(results[-1])
+                except Exception as e:
+                    print(f"WARNING: Candidate {family} {params} failed - {e}")
+    return results
+
+
+def print_candidate(candidate):
+    m = candidate['metrics']
+    print(f"{candidate['version']:<42} acc {m['heldout_accuracy']:.4f} (cv {m['cv_accuracy_mean']:.4f}) "
+          f"fit {m['fit_seconds']:7.2f}s  {m['latency_ms_per_1k']:8.2f} ms/1k  {m['size_kb']:9.1f} KB  "
+          f"{candidate['params']}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Search model families and manage the model registry')
+    parser.add_argument('--model-path', default='models/', help='model directory holding the registry')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    run = commands.add_parser('search', help='evaluate candidates and register them')
+    run.add_argument('--families', nargs='+', choices=sorted(SEARCH_SPACE), help='model families to search')
+    run.add_argument('--samples', type=int, default=DEFAULT_SAMPLES)
+    run.add_argument('--folds', type=int, default=DEFAULT_FOLDS)
+    run.add_argument('--cpus', type=int, help='worker processes, each single-threaded (default: CPU count)')
+    run.add_argument('--seed', type=int, default=RANDOM_SEED)
+    run.add_argument('--promote', action='store_true', help='promote the best candidate within the budgets')
+    for cmd in (run, commands.add_parser('best', help='show the best registered version within the budgets')):
+        cmd.add_argument('--min-accuracy', type=float)
+        cmd.add_argument('--max-latency-ms', type=float, help='max predict_proba ms per 1k rows')
+        cmd.add_argument('--max-size-kb', type=float)
+        cmd.add_argument('--accuracy-tolerance', type=float, default=0.005,
+                         help='accuracy within this of the best counts as a tie, broken by latency then size')
+    commands.add_parser('list', help='list registered versions')
+    promote = commands.add_parser('promote', help='promote a version for the service to load')
+    promote.add_argument('version')
+    args = parser.parse_args(argv)
+
+    registry = ModelRegistry.for_model_path(args.model_path)
+    if args.command == 'list':
+        promoted = registry.promoted()
+        for candidate in registry.versions():
+            print(('* ' if candidate['version'] == promoted else '  '), end='')
+            print_candidate(candidate)
+        return 0
+    if args.command == 'promote':
+        try:
+            registry.promote(args.version)
+        except RegistryError as e:
+            print(f"ERROR: {e}")
+            return 1
+        print(f"SUCCESS: Promoted {args.version}")
+        return 0
+
+    candidates = (
+        search(registry, args.families, args.samples, args.folds, args.cpus, args.seed)
+        if args.command == 'search' else registry.versions()
+    )
+    best = select_best(candidates, args.min_accuracy, args.max_latency_ms, args.max_size_kb,
+                       args.accuracy_tolerance)
+    if best is None:
+        print("WARNING: No candidate fits the accuracy/latency/size budgets")
+        return 1
+    print(f"Best: {best['version']}")
+    if getattr(args, 'promote', False):
+        registry.promote(best['version'])
+        print(f"SUCCESS: Promoted {best['version']}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
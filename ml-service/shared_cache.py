@@ -0,0 +1,507 @@
+"""
+A prediction cache shared by every worker on a box (SQLite) or by every
+box (Redis). A profile scored by one gunicorn worker is then a hit for the
+others, and the entries survive restarts.
+
+    PREDICTION_CACHE_BACKEND=sqlite:////dev/shm/ml-predictions.db
+    PREDICTION_CACHE_BACKEND=redis://localhost:6379/0
+
+SharedPredictionCache keeps the per-process PredictionCache in front of
+the shared store. Entries are namespaced by the predictor version, a
+fingerprint of the catalog and the model files, so a reload never serves
+results computed from other artifacts. Writes are queued and stored in
+batches by one background thread per process (write-behind). A miss takes
+a short lease on its key, and other processes missing the same key wait
+for that result instead of computing it as well.
+"""
+import os
+import time
+import atexit
+import hashlib
+import sqlite3
+import threading
+from collections import deque
+from fast_json import dumps, loads
+from prediction_cache import PredictionCache
+
+# Where shared predictions are stored; empty keeps every worker's cache private
+CACHE_BACKEND = os.environ.get('PREDICTION_CACHE_BACKEND', '')
+# The SQLite store is trimmed back below this size, least recently used first
+SHARED_CACHE_MAX_BYTES = int(float(os.environ.get('SHARED_CACHE_MAX_MB', 256)) * 1024 * 1024)
+# Share of SHARED_CACHE_MAX_BYTES a trim frees down to, so trims are rare
+TRIM_TARGET = 0.9
+# Seconds between trims of the SQLite store
+TRIM_INTERVAL = 10
+# Seconds between write-behind flushes, and queued writes that force one
+FLUSH_INTERVAL = 0.01
+FLUSH_BATCH_SIZE = 256
+# Writes queued beyond this are dropped; they are only cache entries
+MAX_PENDING_WRITES = 10000
+# How long a lease protects a computation, and how often waiters check
+# the shared store for its result
+LEASE_SECONDS = 5.0
+LEASE_POLL_INTERVAL = 0.005
+# Bump whenever keys or stored values change meaning
+CACHE_FORMAT_VERSION = 1
+# Prefixes of entry and lease keys in Redis
+REDIS_ENTRY_PREFIX = 'ml-predict:'
+REDIS_LEASE_PREFIX = 'ml-predict-lease:'
+
+
+def storage_key(version, key):
+    """
+    Key of a PredictionCache key in the shared store. Skill sets are sorted:
+    frozenset order depends on the per-process string hash seed.
+    """
+    parts = [sorted(part) if isinstance(part, frozenset) else part for part in key]
+    digest = hashlib.sha1(dumps(parts)).hexdigest()
+    return f'{CACHE_FORMAT_VERSION}:{version}:{digest}'
+
+
+class SQLiteBackend:
+    """
+    Entries in one SQLite file in WAL mode, so readers in every worker
+    never wait for a writer. Put the file on /dev/shm for a store in
+    shared memory, or on disk to keep it across reboots. Every thread opens
+    its own connection, and a forked worker opens new ones.
+    """
+
+    name = 'sqlite'
+
+    def __init__(self, path, max_bytes=SHARED_CACHE_MAX_BYTES):
+        self.path = path
+        self.max_bytes = max_bytes
+        self._local = threading.local()
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        connection = self._connection()
+        connection.execute(
+            'CREATE TABLE IF NOT EXISTS entries (key TEXT PRIMARY KEY, value BLOB NOT NULL, '
+            'size INTEGER NOT NULL, expires REAL NOT NULL, accessed REAL NOT NULL)'
+        )
+        connection.execute('CREATE INDEX IF NOT EXISTS entries_accessed ON entries (accessed)')
+        connection.execute('CREATE TABLE IF NOT EXISTS leases (key TEXT PRIMARY KEY, expires REAL NOT NULL)')
+
+    def _connection(self):
+        connection = getattr(self._local, 'connection', None)
+        if connection is None or self._local.pid != os.getpid():
+            connection = sqlite3.connect(self.path, timeout=5, isolation_level=None, check_same_thread=False)
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.execute('PRAGMA synchronous=NORMAL')
+            self._local.connection = connection
+            self._local.pid = os.getpid()
+        return connection
+
+    def _transaction(self, statements):
+        """Run (sql, rows) pairs in one write transaction; returns the last cursor"""
+        connection = self._connection()
+        connection.execute('BEGIN IMMEDIATE')
+        try:
+            cursor = None
+            for sql, rows in statements:
+                cursor = connection.executemany(sql, rows)
+            connection.execute('COMMIT')
+            return cursor
+        except BaseException:
+            connection.execute('ROLLBACK')
+            raise
+
+    def get(self, key):
+        row = self._connection().execute('SELECT value, expires FROM entries WHERE key = ?', (key,)).fetchone()
+        if row is None or row[1] <= time.time():
+            return None
+        return row[0]
+
+    def write(self, entries, touched=(), released=()):
+        """Store (key, value, expires) entries, mark keys as used and release leases"""
+        now = time.time()
+        self._transaction([
+            ('INSERT OR REPLACE INTO entries VALUES (?, ?, ?, ?, ?)',
+             [(key, value, len(value), expires, now) for key, value, expires in entries]),
+            ('UPDATE entries SET accessed = ? WHERE key = ?', [(now, key) for key in touched]),
+            ('DELETE FROM leases WHERE key = ?', [(key,) for key in released])
+        ])
+
+    def acquire(self, key, seconds):
+        """Take the lease on key unless another process holds a live one"""
+        now = time.time()
+        cursor = self._transaction([
+            ('DELETE FROM leases WHERE key = ? AND expires <= ?', [(key, now)]),
+            ('INSERT OR IGNORE INTO leases VALUES (?, ?)', [(key, now + seconds)])
+        ])
+        return cursor.rowcount == 1
+
+    def release(self, key):
+        self._transaction([('DELETE FROM leases WHERE key = ?', [(key,)])])
+
+    def delete(self, key):
+        self._transaction([('DELETE FROM entries WHERE key = ?', [(key,)])])
+
+    def trim(self):
+        """Drop expired entries, then the least recently used down to TRIM_TARGET; returns how many went"""
+        now = time.time()
+        connection = self._connection()
+        self._transaction([('DELETE FROM leases WHERE expires <= ?', [(now,)])])
+        expired = self._transaction([('DELETE FROM entries WHERE expires <= ?', [(now,)])]).rowcount
+        excess = connection.execute('SELECT COALESCE(SUM(size), 0) FROM entries').fetchone()[0] - self.max_bytes
+        if excess <= 0:
+            return expired
+        excess += self.max_bytes * (1 - TRIM_TARGET)
+        evicted = []
+        cursor = connection.execute('SELECT key, size FROM entries ORDER BY accessed')
+        for key, size in cursor:
+            evicted.append((key,))
+            excess -= size
+            if excess <= 0:
+                break
+        cursor.close()
+        self._transaction([('DELETE FROM entries WHERE key = ?', evicted)])
+        return expired + len(evicted)
+
+    def clear(self):
+        self._transaction([('DELETE FROM entries', [()]), ('DELETE FROM leases', [()])])
+
+    def stats(self):
+        entries, size = self._connection().execute('SELECT COUNT(*), COALESCE(SUM(size), 0) FROM entries').fetchone()
+        return {'entries': entries, 'bytes': size, 'maxBytes': self.max_bytes}
+
+
+class RedisBackend:
+    """
+    Entries in Redis or a server speaking its protocol, shared across
+    boxes. Entries expire through Redis TTLs. Size-based eviction is left to
+    the server: run it with maxmemory and maxmemory-policy allkeys-lru.
+    Needs the redis package.
+    """
+
+    name = 'redis'
+
+    def __init__(self, url):
+        import redis
+        self.client = redis.Redis.from_url(url)
+
+    def get(self, key):
+        return self.client.get(REDIS_ENTRY_PREFIX + key)
+
+    def write(self, entries, touched=(), released=()):
+        # Reads already refresh Redis's LRU clock, so touched keys need nothing
+        now = time.time()
+        pipe = self.client.pipeline(transaction=False)
+        for key, value, expires in entries:
+            pipe.set(REDIS_ENTRY_PREFIX + key, value, px=max(1, int((expires - now) * 1000)))
+        for key in released:
+            pipe.delete(REDIS_LEASE_PREFIX + key)
+        pipe.execute()
+
+    def acquire(self, key, seconds):
+        return bool(self.client.set(REDIS_LEASE_PREFIX + key, os.getpid(), nx=True, px=int(seconds * 1000)))
+
+    def release(self, key):
+        self.client.delete(REDIS_LEASE_PREFIX + key)
+
+    def delete(self, key):
+        self.client.delete(REDIS_ENTRY_PREFIX + key)
+
+    def trim(self):
+        return 0
+
+    def clear(self):
+        for prefix in (REDIS_ENTRY_PREFIX, REDIS_LEASE_PREFIX):
+            keys = list(self.client.scan_iter(match=prefix + '*', count=1000))
+            if keys:
+                self.client.delete(*keys)
+
+    def stats(self):
+        return {'bytes': self.client.info('memory').get('used_memory')}
+
+
+class WriteBehind:
+    """
+    Writes to a backend queued by request threads and stored in batches
+    by one daemon thread per process, started on first use so forked
+    workers get their own. Leases are released with the batch that
+    stores their result.
+    """
+
+    def __init__(self, backend, interval=FLUSH_INTERVAL, batch_size=FLUSH_BATCH_SIZE,
+                 max_pending=MAX_PENDING_WRITES, trim_interval=TRIM_INTERVAL):
+        self.backend = backend
+        self.interval = interval
+        self.batch_size = batch_size
+        self.max_pending = max_pending
+        self.trim_interval = trim_interval
+        self.written = 0
+        self.dropped = 0
+        self.errors = 0
+        self.evicted = 0
+        self._pid = None
+        self._start_lock = threading.Lock()
+        self._reset()
+
+    def _reset(self):
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._entries = deque()
+        self._touched = set()
+        self._released = []
+        self._last_trim = time.monotonic()
+        self._last_error = None
+
+    def _ensure_thread(self):
+        if self._pid == os.getpid():
+            return
+        with self._start_lock:
+            if self._pid == os.getpid():
+                return
+            if self._pid is not None:
+                # Forked: the parent's queue and thread are not ours
+                self._reset()
+            else:
+                atexit.register(self.flush)
+            self._pid = os.getpid()
+            threading.Thread(target=self._run, name='shared-cache-writer', daemon=True).start()
+
+    def submit(self, key, value, expires, release=False):
+        """Queue an entry; with release, the key's lease is released once it is stored"""
+        self._ensure_thread()
+        with self._lock:
+            if len(self._entries) >= self.max_pending:
+                self.dropped += 1
+                if not release:
+                    return
+                # A lease still has to be released, or waiters sit out its timeout
+                self._released.append(key)
+            else:
+                self._entries.append((key, value, expires, release))
+            if len(self._entries) >= self.batch_size:
+                self._wake.set()
+
+    def touch(self, key):
+        """Record a shared hit, so size-based eviction keeps the entry"""
+        self._ensure_thread()
+        with self._lock:
+            self._touched.add(key)
+
+    def flush(self):
+        """Store everything queued so far"""
+        with self._lock:
+            if not (self._entries or self._touched or self._released):
+                return
+            entries, self._entries = self._entries, deque()
+            touched, self._touched = self._touched, set()
+            released, self._released = self._released, []
+        released += [key for key, _, _, release in entries if release]
+        try:
+            self.backend.write([entry[:3] for entry in entries], touched, released)
+            self.written += len(entries)
+            self._last_error = None
+        except Exception as e:
+            self.errors += 1
+            if str(e) != self._last_error:
+                print(f"WARNING: Shared prediction cache write failed - {e}")
+                self._last_error = str(e)
+
+    def _run(self):
+        while True:
+            self._wake.wait(self.interval)
+            self._wake.clear()
+            self.flush()
+            if time.monotonic() - self._last_trim >= self.trim_interval:
+                self._last_trim = time.monotonic()
+                try:
+                    self.evicted += self.backend.trim()
+                except Exception as e:
+                    print(f"WARNING: Shared prediction cache trim failed - {e}")
+
+
+_backends = {}
+_backends_lock = threading.Lock()
+
+
+def open_backend(url):
+    """
+    The backend for a sqlite:///path or redis:// URL, opened once per
+    process and shared by every predictor built in it, with its writer
+    """
+    with _backends_lock:
+        if url not in _backends:
+            if url.startswith('sqlite:///'):
+                backend = SQLiteBackend(url[len('sqlite:///'):])
+            elif url.split('://', 1)[0] in ('redis', 'rediss', 'unix'):
+                backend = RedisBackend(url)
+            else:
+                raise ValueError(f'Unsupported prediction cache backend: {url}')
+            backend.writer = WriteBehind(backend)
+            _backends[url] = backend
+        return _backends[url]
+
+
+class SharedPredictionCache:
+    """
+    PredictionCache interface over a shared backend, with this process's
+    LRU cache in front of it. Backend errors and entries that do not decode
+    make lookups misses and are never raised to callers. Cached values are shared between callers and
+    must not be mutated.
+    """
+
+    def __init__(self, backend, max_size=2048, ttl=3600, lease_seconds=LEASE_SECONDS):
+        self.backend = backend
+        self.local = PredictionCache(max_size, ttl)
+        self.ttl = ttl
+        self.lease_seconds = lease_seconds
+        self.version = None
+        self.shared_hits = 0
+        self.shared_misses = 0
+        self.lease_waits = 0
+        self.lease_timeouts = 0
+        self.errors = 0
+
+    @property
+    def enabled(self):
+        return self.ttl > 0
+
+    def _failed(self, action, error):
+        self.errors += 1
+        print(f"WARNING: Shared prediction cache {action} failed - {error}")
+
+    def _decode(self, shared_key, data):
+        """
+        The value stored as data, or None if it does not decode (a torn
+        or foreign write); the entry is then deleted so it gets recomputed
+        """
+        try:
+            return loads(data)
+        except (ValueError, TypeError) as e:
+            self._failed('decode', e)
+        try:
+            self.backend.delete(shared_key)
+        except Exception as e:
+            self._failed('delete', e)
+        return None
+
+    def get(self, key):
+        """Return the cached value for key from this process or the shared store, or None"""
+        value = self.local.get(key)
+        if value is not None or not self.enabled:
+            return value
+        shared_key = storage_key(self.version, key)
+        try:
+            data = self.backend.get(shared_key)
+        except Exception as e:
+            self._failed('read', e)
+            return None
+        value = self._decode(shared_key, data) if data is not None else None
+        if value is None:
+            self.shared_misses += 1
+            return None
+        self.shared_hits += 1
+        self.local.put(key, value)
+        self.backend.writer.touch(shared_key)
+        return value
+
+    def put(self, key, value):
+        """Store a value here and queue it for the shared store"""
+        if not self.enabled:
+            return
+        self.local.put(key, value)
+        self.backend.writer.submit(storage_key(self.version, key), dumps(value), time.time() + self.ttl)
+
+    def compute(self, key, func):
+        """
+        Store and return func() for a key that get() just missed. Threads
+        of this process wait for each other, and processes for the one
+        holding the key's lease: they poll the shared store for its result
+        and compute themselves only if the lease runs out first.
+        """
+        if not self.enabled:
+            return func()
+        return self.local.compute(key, lambda: self._compute_shared(key, func))
+
+    def _compute_shared(self, key, func):
+        shared_key = storage_key(self.version, key)
+        try:
+            leased = self.backend.acquire(shared_key, self.lease_seconds)
+        except Exception as e:
+            self._failed('lease', e)
+            return func()
+
+        if not leased:
+            self.lease_waits += 1
+            deadline = time.monotonic() + self.lease_seconds
+            while time.monotonic() < deadline:
+                time.sleep(LEASE_POLL_INTERVAL)
+                try:
+                    data = self.backend.get(shared_key)
+                except Exception as e:
+                    self._failed('read', e)
+                    break
+                if data is not None:
+                    value = self._decode(shared_key, data)
+                    if value is None:
+                        # Corrupt result: compute it here rather than wait out the lease
+                        break
+                    self.shared_hits += 1
+                    return value
+            else:
+                self.lease_timeouts += 1
+            return func()
+
+        try:
+            value = func()
+        except BaseException:
+            try:
+                self.backend.release(shared_key)
+            except Exception as e:
+                self._failed('lease release', e)
+            raise
+        self.backend.writer.submit(shared_key, dumps(value), time.time() + self.ttl, release=True)
+        return value
+
+    def set_version(self, version):
+        """Look up entries of another artifact version from now on"""
+        self.local.set_version(version)
+        self.version = version
+
+    def clear(self):
+        """Drop this process's entries; the shared store keeps its own"""
+        self.local.clear()
+
+    def stats(self):
+        stats = self.local.stats()
+        # Shared hits were local misses first
+        stats['hits'] += self.shared_hits
+        stats['misses'] -= self.shared_hits
+        lookups = stats['hits'] + stats['misses']
+        stats['hitRate'] = round(stats['hits'] / lookups, 4) if lookups else 0.0
+        writer = self.backend.writer
+        shared = {
+            'backend': self.backend.name,
+            'hits': self.shared_hits,
+            'misses': self.shared_misses,
+            'leaseWaits': self.lease_waits,
+            'leaseTimeouts': self.lease_timeouts,
+            'writes': writer.written,
+            'droppedWrites': writer.dropped,
+            'evictions': writer.evicted,
+            'errors': self.errors + writer.errors
+        }
+        try:
+            shared.update(self.backend.stats())
+        except Exception as e:
+            shared['error'] = str(e)
+        stats['shared'] = shared
+        return stats
+
+
+def create_cache(backend_url=CACHE_BACKEND, max_size=2048, ttl=3600):
+    """
+    SharedPredictionCache over backend_url, or a per-process
+    PredictionCache when no backend is configured or it cannot be opened
+    """
+    if backend_url:
+        try:
+            return SharedPredictionCache(open_backend(backend_url), max_size, ttl)
+        except Exception as e:
+            print(f"WARNING: Could not open shared prediction cache {backend_url} - {e}; caching per process")
+    return PredictionCache(max_size, ttl)
@@ -0,0 +1,276 @@
+"""
+Dense skill embeddings, so related skills earn partial credit: 'Keras'
+counts toward TensorFlow-heavy roles even though the TF-IDF engine only
+matches exact canonical skills.
+
+    python skill_embeddings.py models/ --dimensions 32
+
+learns the embeddings from the role catalog (train_model.py also folds in
+skill co-occurrence from its training data) and writes them next to the
+recommender index. Skill vectors are stored as int8 codes with one float32
+scale per skill and memory-mapped by the service. Users and roles are
+idf-weighted sums of their skills' vectors, so scoring a user is one
+(roles x dimensions) matrix-vector product.
+"""
+import os
+import sys
+import glob
+import json
+import uuid
+import argparse
+import numpy as np
+from scipy import sparse
+from skill_index import SKILL_INDEX
+from tfidf_recommender import top_k_indices
+
+EMBEDDINGS_FILENAME = 'skill_embeddings.json'
+# Bump whenever the stored arrays change meaning
+EMBEDDINGS_FORMAT_VERSION = 1
+DEFAULT_DIMENSIONS = 32
+# Weight of the co-occurrence rows against the catalog's role rows in the
+# factorized matrix
+COOCCURRENCE_WEIGHT = 0.5
+# Largest int8 code; a skill's largest component is stored as +-QUANT_LEVELS
+QUANT_LEVELS = 127
+
+
+def ppmi(counts):
+    """Positive pointwise mutual information of a symmetric co-occurrence count matrix"""
+    counts = np.asarray(counts, dtype=np.float64)
+    total = counts.sum()
+    if not total:
+        return np.zeros_like(counts)
+    marginals = counts.sum(axis=1)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        pmi = np.log(counts * total / np.outer(marginals, marginals))
+    pmi[~np.isfinite(pmi)] = 0
+    np.fill_diagonal(pmi, 0)
+    return np.maximum(pmi, 0)
+
+
+def _normalize_rows(matrix):
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1
+    return matrix / norms
+
+
+def learn_embeddings(recommender, cooccurrence=None, skills=None, dimensions=DEFAULT_DIMENSIONS, seed=0):
+    """
+    Unit skill vectors from a truncated SVD of the recommender's role x
+    skill TF-IDF rows, optionally stacked with PPMI rows of a skill x skill
+    co-occurrence count matrix over `skills` (e.g. from training profiles).
+    Skills sharing roles or profiles end up close together. Returns the
+    canonical terms and their (terms x dimensions) float32 vectors.
+    """
+    # Learning is offline; the service only loads the result
+    from sklearn.utils.extmath import randomized_svd
+    state = recommender.snapshot()
+    terms = list(state.feature_names)
+    rows = [state.tfidf_matrix]
+    if cooccurrence is not None:
+        # Training skills are merged by canonical form; ones the catalog
+        # does not list get their own columns
+        canonical = [SKILL_INDEX.normalize(skill) for skill in skills]
+        for term in canonical:
+            if term not in state.vocabulary and term not in terms:
+                terms.append(term)
+        columns = {term: i for i, term in enumerate(terms)}
+        merge = sparse.csr_matrix(
+            (np.ones(len(canonical)), ([columns[term] for term in canonical], np.arange(len(canonical)))),
+            shape=(len(terms), len(canonical))
+        )
+        counts = (merge @ sparse.csr_matrix(cooccurrence, dtype=np.float64) @ merge.T).toarray()
+        weights = _normalize_rows(ppmi(counts)) * COOCCURRENCE_WEIGHT
+        rows = [sparse.hstack((rows[0], sparse.csr_matrix((rows[0].shape[0], len(terms) - rows[0].shape[1])))),
+                sparse.csr_matrix(weights[np.any(weights, axis=1)])]
+    matrix = sparse.vstack(rows).tocsr().astype(np.float64)
+
+    dimensions = max(1, min(dimensions, min(matrix.shape)))
+    _, sigma, components = randomized_svd(matrix, dimensions, random_state=seed)
+    vectors = _normalize_rows(components.T * sigma)
+    return terms, vectors.astype(np.float32)
+
+
+def quantize(vectors):
+    """Symmetric per-row int8 quantization; returns (codes, scales)"""
+    vectors = np.asarray(vectors, dtype=np.float32)
+    scales = np.abs(vectors).max(axis=1) / QUANT_LEVELS if len(vectors) else np.empty(0, dtype=np.float32)
+    scales[scales == 0] = 1
+    codes = np.rint(vectors / scales[:, np.newaxis]).astype(np.int8)
+    return codes, scales.astype(np.float32)
+
+
+def _array_path(path, token, name):
+    """Array file of the save identified by token, next to the manifest"""
+    base = path[:-len('.json')] if path.endswith('.json') else path
+    return f"{base}.{token}.{name}.npy"
+
+
+def save_embeddings(path, terms, vectors, source=None):
+    """
+    Write quantized embeddings: a JSON manifest with the terms and one
+    .npy file each for the int8 codes and the per-term scales
+    """
+    codes, scales = quantize(vectors)
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+
+    # Same layout as the recommender index: files unique to this save, the
+    # manifest renamed into place last
+    token = uuid.uuid4().hex[:12]
+    np.save(_array_path(path, token, 'codes'), codes)
+    np.save(_array_path(path, token, 'scales'), scales)
+    manifest = {
+        'format_version': EMBEDDINGS_FORMAT_VERSION,
+        'token': token,
+        'dimensions': int(codes.shape[1]),
+        'terms': list(terms),
+        'source': source or {}
+    }
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, 'w') as f:
+        json.dump(manifest, f)
+    os.replace(tmp_path, path)
+
+    for stale in glob.glob(_array_path(glob.escape(path), '*', '*')):
+        if f".{token}." not in os.path.basename(stale):
+            try:
+                os.remove(stale)
+            except OSError:
+                pass
+
+
+def load_embeddings(path):
+    """
+    Memory-map saved embeddings; returns (terms, codes, scales), or None if
+    they are missing, unreadable or from another format version
+    """
+    if not path or not os.path.exists(path):
+        return None
+    try:
+        with open(path) as f:
+            manifest = json.load(f)
+        if manifest.get('format_version') != EMBEDDINGS_FORMAT_VERSION:
+            print(f"WARNING: Skill embeddings {path} have an unsupported format version")
+            return None
+        codes = np.load(_array_path(path, manifest['token'], 'codes'), mmap_mode='r', allow_pickle=False)
+        scales = np.load(_array_path(path, manifest['token'], 'scales'), mmap_mode='r', allow_pickle=False)
+        if codes.shape != (len(manifest['terms']), manifest['dimensions']) or len(scales) != len(codes):
+            raise ValueError('array shapes do not match the manifest')
+        return manifest['terms'], codes, scales
+    except Exception as e:
+        print(f"WARNING: Could not load skill embeddings {path} - {e}")
+        return None
+
+
+class EmbeddingRanker:
+    """
+    Ranks catalog roles by cosine similarity of embeddings. A role vector
+    is the sum of its skills' vectors weighted by its TF-IDF row and is
+    rebuilt whenever the recommender publishes a new state; a user vector is
+    the idf-weighted sum of their skills' vectors. Skills without an
+    embedding contribute nothing. Results are build_result entries, like
+    the TF-IDF engine's.
+    """
+
+    def __init__(self, recommender, terms, codes, scales):
+        self.recommender = recommender
+        self.codes = codes
+        self.scales = scales
+        self.term_rows = {term: row for row, term in enumerate(terms)}
+        self.dimensions = codes.shape[1]
+        # The recommender state the role matrix was built from, swapped
+        # together with it
+        self._roles = (None, None)
+
+    @classmethod
+    def load(cls, recommender, path):
+        """Ranker over the embeddings saved at path; None if there are none"""
+        embeddings = load_embeddings(path)
+        return cls(recommender, *embeddings) if embeddings is not None else None
+
+    def vectors(self, terms):
+        """Dequantized vectors of terms, zero for terms without an embedding"""
+        vectors = np.zeros((len(terms), self.dimensions), dtype=np.float32)
+        rows = [self.term_rows.get(term, -1) for term in terms]
+        known = np.array([row >= 0 for row in rows], dtype=bool)
+        if known.any():
+            rows = np.array(rows)[known]
+            vectors[known] = self.codes[rows] * self.scales[rows, np.newaxis]
+        return vectors
+
+    def _refresh(self):
+        """The current recommender state and its (roles x dimensions) role matrix"""
+        state = self.recommender.snapshot()
+        if self._roles[0] is not state:
+            skill_vectors = self.vectors(state.feature_names)
+            self._roles = (state, _normalize_rows(state.tfidf_matrix @ skill_vectors).astype(np.float32))
+        return self._roles
+
+    @property
+    def role_matrix(self):
+        """Unit role vectors of the current catalog, rows in recommender.roles order"""
+        return self._refresh()[1]
+
+    def user_vectors(self, skill_lists):
+        """Unit user vectors for prepared skill lists"""
+        users = np.zeros((len(skill_lists), self.dimensions), dtype=np.float32)
+        for i, skills in enumerate(skill_lists):
+            if skills:
+                users[i] = self.recommender.skill_weights(skills) @ self.vectors(skills)
+        return _normalize_rows(users)
+
+    def recommend_many(self, skill_lists, top_n=3):
+        """Top roles for each list of skills that went through prepare_user_skills"""
+        state, role_matrix = self._refresh()
+        results = [[] for _ in skill_lists]
+        rows = [i for i, skills in enumerate(skill_lists) if skills]
+        if not rows or top_n <= 0:
+            return results
+        scores = self.user_vectors([skill_lists[i] for i in rows]) @ role_matrix.T
+        for i, row_scores, indices in zip(rows, scores, top_k_indices(scores, top_n)):
+            results[i] = [
+                state.build_result(idx, float(row_scores[idx]), skill_lists[i])
+                for idx in indices
+            ]
+        return results
+
+    def recommend_prepared(self, unique_user_skills, top_n=3):
+        return self.recommend_many([unique_user_skills], top_n)[0]
+
+
+def build_embeddings(recommender, path, cooccurrence=None, skills=None, dimensions=DEFAULT_DIMENSIONS):
+    """Learn embeddings for a recommender's catalog and save them to path"""
+    terms, vectors = learn_embeddings(recommender, cooccurrence, skills, dimensions)
+    save_embeddings(path, terms, vectors, {
+        'roles': len(recommender.roles),
+        'catalog': recommender.checksum[:12],
+        'cooccurrence_skills': len(skills) if cooccurrence is not None else 0
+    })
+    return terms, vectors
+
+
+def main(argv=None):
+    from catalog import RoleCatalog, load_catalog
+    from recommender_index import INDEX_FILENAME
+    from tfidf_recommender import TfidfRecommender
+    parser = argparse.ArgumentParser(description='Learn quantized skill embeddings from the role catalog')
+    parser.add_argument('model_dir', nargs='?', default='models')
+    parser.add_argument('--dimensions', type=int, default=DEFAULT_DIMENSIONS)
+    args = parser.parse_args(argv)
+
+    catalog_path = os.environ.get('ROLE_CATALOG_PATH')
+    catalog = load_catalog(catalog_path) if catalog_path else RoleCatalog.default()
+    recommender = TfidfRecommender(
+        skill_mapping=catalog.skill_mapping,
+        index_path=os.path.join(args.model_dir, INDEX_FILENAME)
+    )
+    path = os.path.join(args.model_dir, EMBEDDINGS_FILENAME)
+    terms, vectors = build_embeddings(recommender, path, dimensions=args.dimensions)
+    print(f"SUCCESS: Saved {len(terms)} skill embeddings ({vectors.shape[1]} dimensions) to {path}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,194 @@
+from functools import lru_cache
+from data_constants import SKILL_SYNONYMS
+
+# Minimum trigram Dice similarity for a fuzzy skill match
+FUZZY_THRESHOLD = 0.6
+# Shorter strings ('r', 'go', 'jav') are too ambiguous to correct
+FUZZY_MIN_LENGTH = 4
+# Resolved strings remembered per matcher
+FUZZY_MEMO_SIZE = 4096
+# Completions kept per prefix; the most a suggestion query can return
+SUGGEST_MAX_RESULTS = 20
+
+
+class SkillIndex:
+    """Compiled variant -> canonical skill lookup built from a synonym table"""
+
+    def __init__(self, synonyms):
+        self.canonical = {}
+        self.collisions = []
+
+        # Canonical names always map to themselves, even if another entry
+        # also lists them as a variant
+        for canonical in synonyms:
+            self.canonical[canonical] = canonical
+
+        # Variants keep the first canonical they were listed under, which is
+        # what the old linear scan over SKILL_SYNONYMS returned
+        for canonical, variants in synonyms.items():
+            for variant in variants:
+                variant = variant.lower().strip()
+                existing = self.canonical.get(variant)
+                if existing is None:
+                    self.canonical[variant] = canonical
+                elif existing != canonical and variant not in synonyms:
+                    self.collisions.append((variant, existing, canonical))
+
+        for variant, kept, dropped in self.collisions:
+            print(f"WARNING: Skill synonym '{variant}' maps to both '{kept}' and '{dropped}', using '{kept}'")
+
+    def normalize(self, skill):
+        """Normalize a skill to its canonical form, or its lowercase form if unknown"""
+        skill_lower = skill.lower().strip()
+        return self.canonical.get(skill_lower, skill_lower)
+
+    def __contains__(self, skill):
+        return skill in self.canonical
+
+    def __len__(self):
+        return len(self.canonical)
+
+
+# Shared index used by every normalization path
+SKILL_INDEX = SkillIndex(SKILL_SYNONYMS)
+
+
+def compact_skill(skill):
+    """Lowercase a skill and drop separators, so 'Tensor-Flow' and 'tensorflow' compare equal"""
+    return ''.join(ch for ch in skill.lower() if ch.isalnum() or ch in '+#')
+
+
+def _trigrams(text):
+    padded = f"$${text}$"
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class FuzzySkillMatcher:
+    """
+    Typo-tolerant lookup of canonical skills through a character trigram
+    index. Only targets sharing a trigram with the query (and of compatible
+    size) are scored, by Dice similarity of their trigram sets. Resolved
+    strings are memoized in an LRU.
+    """
+
+    def __init__(self, targets, threshold=FUZZY_THRESHOLD, min_length=FUZZY_MIN_LENGTH,
+                 memo_size=FUZZY_MEMO_SIZE):
+        self.threshold = threshold
+        self.min_length = min_length
+        self.exact = {}
+        self.keys = []
+        self.canonicals = []
+        self.gram_counts = []
+        self.postings = {}
+
+        for target, canonical in targets.items():
+            key = compact_skill(target)
+            if not key or key in self.exact:
+                continue
+            self.exact[key] = canonical
+            key_id = len(self.keys)
+            grams = _trigrams(key)
+            self.keys.append(key)
+            self.canonicals.append(canonical)
+            self.gram_counts.append(len(grams))
+            for gram in grams:
+                self.postings.setdefault(gram, []).append(key_id)
+
+        self.resolve = lru_cache(maxsize=memo_size)(self._resolve)
+
+    def _resolve(self, skill):
+        """Best canonical match for a skill, or None if nothing is close enough"""
+        key = compact_skill(skill)
+        if key in self.exact:
+            return self.exact[key]
+        if len(key) < self.min_length:
+            return None
+
+        grams = _trigrams(key)
+        shared = {}
+        for gram in grams:
+            for key_id in self.postings.get(gram, ()):
+                shared[key_id] = shared.get(key_id, 0) + 1
+
+        # Dice >= t needs the target's trigram count within these bounds
+        n = len(grams)
+        low = n * self.threshold / (2 - self.threshold)
+        high = n * (2 - self.threshold) / self.threshold
+
+        best_id = None
+        best_score = self.threshold
+        for key_id, common in shared.items():
+            size = self.gram_counts[key_id]
+            if size < low or size > high:
+                continue
+            score = 2 * common / (n + size)
+            if score > best_score or (score == best_score and (best_id is None or key_id < best_id)):
+                best_id, best_score = key_id, score
+        return None if best_id is None else self.canonicals[best_id]
+
+
+class SkillTrie:
+    """
+    Prefix index for skill autocomplete. Every skill is reachable through
+    its own lowercase name and every synonym of its canonical form, so 'js'
+    completes to JavaScript. Each node stores its ranked top completions,
+    so a query is one walk down the prefix and a slice: direct name
+    matches before synonym matches, then skills listed by more catalog
+    roles, then shorter names.
+    """
+
+    def __init__(self, skills, popularity=None, max_results=SUGGEST_MAX_RESULTS, index=SKILL_INDEX):
+        popularity = popularity or {}
+        self.skills = list(skills)
+        self.max_results = max_results
+        self.children = [{}]
+        candidates = [[]]
+
+        by_canonical = {}
+        for skill_id, skill in enumerate(self.skills):
+            by_canonical.setdefault(index.normalize(skill), []).append(skill_id)
+
+        def insert(key, skill_id, via_synonym):
+            skill = self.skills[skill_id]
+            rank = (via_synonym, -popularity.get(index.normalize(skill), 0), len(skill), skill.lower(), skill_id)
+            node = 0
+            candidates[node].append(rank)
+            for ch in key:
+                child = self.children[node].get(ch)
+                if child is None:
+                    child = len(self.children)
+                    self.children[node][ch] = child
+                    self.children.append({})
+                    candidates.append([])
+                node = child
+                candidates[node].append(rank)
+
+        for skill_id, skill in enumerate(self.skills):
+            insert(skill.lower().strip(), skill_id, False)
+        for variant, canonical in index.canonical.items():
+            for skill_id in by_canonical.get(canonical, ()):
+                if variant != self.skills[skill_id].lower().strip():
+                    insert(variant, skill_id, True)
+
+        # Best rank of each skill under a node, keeping max_results of them
+        self.top = []
+        for ranks in candidates:
+            seen = set()
+            top = []
+            for rank in sorted(ranks):
+                if rank[-1] in seen:
+                    continue
+                seen.add(rank[-1])
+                top.append(self.skills[rank[-1]])
+                if len(top) == max_results:
+                    break
+            self.top.append(top)
+
+    def suggest(self, prefix, limit=10):
+        """Up to `limit` ranked skills with a name or synonym starting with prefix"""
+        node = 0
+        for ch in prefix.lower().lstrip():
+            node = self.children[node].get(ch)
+            if node is None:
+                return []
+        return self.top[node][:limit]
@@ -0,0 +1,244 @@
+import pytest
+import json
+import app as app_module
+from app import app, manager
+from hot_reload import PredictorManager
+
+@pytest.fixture
+def client():
+    app.config['TESTING'] = True
+    with app.test_client() as client:
+        yield client
+
+def test_health_check(client):
+    """Test health check endpoint"""
+    response = client.get('/api/health')
+    assert response.status_code == 200
+    data = json.loads(response.data)
+    assert data['status'] == 'healthy'
+    memory = data['worker']['memoryBytes']
+    assert memory and all(value > 0 for key, value in memory.items() if key in ('rss', 'maxRss'))
+
+def test_prediction(client):
+    """Test career prediction endpoint"""
+    payload = {
+        'degree': 'Computer Science',
+        'skills': ['Python', 'JavaScript'],
+        'experience': 3
+    }
+    response = client.post('/api/predict',
+                          data=json.dumps(payload),
+                          content_type='application/json')
+    
+    assert response.status_code == 200
+    data = json.loads(response.data)
+    assert 'prediction' in data
+    assert 'skillGap' in data
+    assert 'insights' in data
+
+def test_prediction_encoding(client):
+    """Responses are compact, key-sorted JSON equal to the predictor's result"""
+    payload = {'degree': 'Computer Science', 'skills': ['Python', 'SQL'], 'experience': 7}
+    response = client.post('/api/predict', json=payload)
+    expected = manager.current.predict(payload['degree'], payload['skills'], payload['experience'])
+    assert response.data == json.dumps(expected, sort_keys=True, separators=(',', ':')).encode() + b'\n'
+    assert expected['prediction']['salaryRange']['currency'] == 'INR'
+
+def test_prediction_validation(client):
+    """Test prediction with missing fields"""
+    payload = {
+        'degree': 'Computer Science'
+        # Missing required fields
+    }
+    response = client.post('/api/predict',
+                          data=json.dumps(payload),
+                          content_type='application/json')
+    
+    assert response.status_code == 400
+    
+    payload = {'degree': 'Computer Science', 'skills': ['Python'], 'experience': 1, 'engine': 'word2vec'}
+    response = client.post('/api/predict', json=payload)
+    assert response.status_code == 400
+    assert 'engine' in json.loads(response.data)['error']
+
+def test_batch_prediction(client):
+    """Test batch endpoint matches single predictions and keeps order"""
+    profiles = [
+        {'degree': 'Computer Science', 'skills': ['Python', 'JavaScript'], 'experience': 3},
+        {'degree': 'Business'},
+        {'degree': 'Data Science', 'skills': ['SQL', 'Tableau', 'Excel'], 'experience': 0},
+        {'degree': 'Other', 'skills': [], 'experience': 1}
+    ]
+    response = client.post('/api/predict/batch',
+                          data=json.dumps({'profiles': profiles}),
+                          content_type='application/json')
+    
+    assert response.status_code == 200
+    results = json.loads(response.data)['results']
+    assert len(results) == len(profiles)
+    assert results[1]['error'] == 'Missing required field: skills'
+    
+    for idx in (0, 2, 3):
+        single = client.post('/api/predict',
+                            data=json.dumps(profiles[idx]),
+                            content_type='application/json')
+        assert results[idx] == json.loads(single.data)
+
+def test_batch_prediction_validation(client):
+    """Test batch endpoint without a profiles list"""
+    response = client.post('/api/predict/batch',
+                          data=json.dumps({'degree': 'Computer Science'}),
+                          content_type='application/json')
+    
+    assert response.status_code == 400
+
+def test_get_skills(client):
+    """Test get available skills endpoint"""
+    response = client.get('/api/skills')
+    assert response.status_code == 200
+    data = json.loads(response.data)
+    assert 'skills' in data
+    assert isinstance(data['skills'], list)
+
+def test_skills_revalidation(client):
+    """The skill list carries an ETag and answers a matching If-None-Match with 304"""
+    response = client.get('/api/skills')
+    etag = response.headers['ETag']
+    assert 'max-age' in response.headers['Cache-Control']
+    
+    cached = client.get('/api/skills', headers={'If-None-Match': etag})
+    assert cached.status_code == 304
+    assert cached.data == b''
+    assert cached.headers['ETag'] == etag
+
+def test_skills_suggest(client):
+    """Prefixes complete skill names and their synonyms, up to the limit"""
+    data = json.loads(client.get('/api/skills/suggest?q=js').data)
+    assert 'JavaScript' in data['suggestions']
+    
+    data = json.loads(client.get('/api/skills/suggest?q=Py&limit=3').data)
+    assert data['suggestions'][0] == 'Python'
+    assert len(data['suggestions']) <= 3
+    
+    assert json.loads(client.get('/api/skills/suggest?q=zzzz').data)['suggestions'] == []
+    assert client.get('/api/skills/suggest').status_code == 400
+    assert client.get('/api/skills/suggest?q=py&limit=500').status_code == 400
+
+def test_what_if(client):
+    """Missing skills are ranked by the match they lead to"""
+    response = client.post('/api/predict/what-if', json={'skills': ['Python', 'SQL'], 'pairs': True, 'limit': 5})
+    assert response.status_code == 200
+    data = json.loads(response.data)
+    assert len(data['skills']) == 5 and len(data['pairs']) == 5
+    scores = [item['matchScore'] for item in data['skills']]
+    assert scores == sorted(scores, reverse=True)
+    for item in data['skills']:
+        assert item['matchGain'] == item['matchScore'] - data['matchScore']
+        assert [gain['role'] for gain in item['roleGains']][0] == data['predictedRole']
+    assert all(len(item['addSkills']) == 2 for item in data['pairs'])
+    
+    assert client.post('/api/predict/what-if', json={'skills': []}).status_code == 400
+    assert client.post('/api/predict/what-if', json={'skills': ['Python'], 'limit': 0}).status_code == 400
+
+def test_reload_requires_admin_token(client, monkeypatch):
+    """Reload is refused without the configured admin token"""
+    monkeypatch.setattr(app_module, 'ADMIN_TOKEN', None)
+    assert client.post('/api/admin/reload').status_code == 403
+    
+    monkeypatch.setattr(app_module, 'ADMIN_TOKEN', 'secret')
+    response = client.post('/api/admin/reload', headers={'X-Admin-Token': 'wrong'})
+    assert response.status_code == 403
+
+def test_reload_swaps_predictor(client, monkeypatch):
+    """A successful reload swaps in a new predictor reported by health"""
+    monkeypatch.setattr(app_module, 'ADMIN_TOKEN', 'secret')
+    previous = manager.current
+    response = client.post('/api/admin/reload?wait=true', headers={'X-Admin-Token': 'secret'})
+    assert response.status_code == 200
+    assert manager.current is not previous
+    
+    health = json.loads(client.get('/api/health').data)
+    assert health['version'] == manager.current.version
+    assert health['reload']['lastError'] is None
+
+def test_failed_reload_keeps_current_predictor():
+    """A predictor that fails validation is never swapped in"""
+    class BrokenPredictor:
+        version = 'broken'
+        recommender = manager.current.recommender
+        
+        def predict_many(self, profiles):
+            raise RuntimeError('corrupt artifacts')
+    
+    reloads = PredictorManager(lambda: manager.current)
+    live = reloads.current
+    reloads.factory = BrokenPredictor
+    assert reloads.reload(wait=True) is False
+    assert reloads.current is live
+    assert 'corrupt artifacts' in reloads.status()['lastError']
+
+def test_cache_counters_survive_reload(client, monkeypatch):
+    """Cache event counters keep counting across a hot reload"""
+    monkeypatch.setattr(app_module, 'ADMIN_TOKEN', 'secret')
+    payload = {'degree': 'Computer Science', 'skills': ['Python', 'Docker'], 'experience': 4}
+    client.post('/api/predict', json=payload)
+    client.post('/api/predict', json=payload)
+    before = manager.cache_events()
+    assert before[('local', 'hits')] >= 1
+    
+    assert client.post('/api/admin/reload?wait=true', headers={'X-Admin-Token': 'secret'}).status_code == 200
+    after = manager.cache_events()
+    assert after[('local', 'hits')] >= before[('local', 'hits')] + manager.current.cache.stats()['hits']
+    assert all(after[key] >= value for key, value in before.items())
+
+def test_profiling_is_opt_in(client, monkeypatch, tmp_path):
+    """X-Profile and the sampling endpoint do nothing unless enabled and authorized"""
+    monkeypatch.setattr(app_module, 'ADMIN_TOKEN', 'secret')
+    payload = {'degree': 'Computer Science', 'skills': ['Python', 'SQL'], 'experience': 3}
+    headers = {'X-Profile': '1', 'X-Admin-Token': 'secret'}
+    assert 'profile' not in json.loads(client.post('/api/predict', json=payload, headers=headers).data)
+    assert client.post('/api/admin/profile', headers=headers).status_code == 403
+    
+    monkeypatch.setattr(app_module, 'PROFILING_ENABLED', True)
+    monkeypatch.setattr('profiling.PROFILE_DIR', str(tmp_path))
+    assert 'profile' not in json.loads(client.post('/api/predict', json=payload, headers={'X-Profile': '1'}).data)
+    data = json.loads(client.post('/api/predict', json=payload, headers=headers).data)
+    assert data['prediction'] and 'predictor.py' in data['profile']['stats']
+    assert data['profile']['file'].startswith(str(tmp_path)) and data['profile']['file'].endswith('.prof')
+
+def test_sampling_profiler_writes_folded_stacks(client, monkeypatch, tmp_path):
+    """Stacks of requests served while sampling are written as 'frame;frame count' lines"""
+    monkeypatch.setattr(app_module, 'ADMIN_TOKEN', 'secret')
+    monkeypatch.setattr('profiling.PROFILE_DIR', str(tmp_path))
+    monkeypatch.setattr(app_module, 'PROFILING_ENABLED', True)
+    headers = {'X-Admin-Token': 'secret'}
+    assert client.post('/api/admin/profile?seconds=1000', headers=headers).status_code == 400
+    assert client.post('/api/admin/profile?seconds=0.3', headers=headers).status_code == 202
+    assert client.post('/api/admin/profile?seconds=0.3', headers=headers).status_code == 409
+    
+    payload = {'degree': 'Computer Science', 'skills': ['Python', 'SQL'], 'experience': 3}
+    while app_module.sampler.running:
+        client.post('/api/predict', json=payload)
+        client.get('/api/skills/suggest?q=py')
+    run = json.loads(client.get('/api/admin/profile', headers=headers).data)['lastRun']
+    with open(run['file']) as f:
+        lines = f.read().splitlines()
+    assert run['samples'] > 0 and lines
+    assert run['file'].startswith(str(tmp_path))
+    assert all(line.rsplit(' ', 1)[1].isdigit() for line in lines)
+    assert any('app.py:' in line for line in lines)
+
+def test_metrics_endpoint(client):
+    """Requests and prediction stages show up in /metrics"""
+    payload = {'degree': 'Computer Science', 'skills': ['Python', 'Rust'], 'experience': 2}
+    client.post('/api/predict', data=json.dumps(payload), content_type='application/json')
+    
+    response = client.get('/metrics')
+    assert response.status_code == 200
+    assert response.mimetype == 'text/plain'
+    text = response.get_data(as_text=True)
+    assert 'ml_requests_total{endpoint="/api/predict",method="POST",status="200"}' in text
+    for stage in ('normalize', 'tfidf', 'skill_gap', 'insights'):
+        assert f'ml_predict_stage_duration_seconds_count{{stage="{stage}"}}' in text
+    assert f'version="{manager.current.version}"' in text
+    assert 'ml_prediction_cache_events_total{event="misses"}' in text
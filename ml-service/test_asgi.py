@@ -0,0 +1,77 @@
+import asyncio
+import json
+import asgi
+from app import manager
+
+async def call(path, method='GET', payload=None):
+    """Drive the ASGI app for one request and return (status, parsed body)"""
+    body = json.dumps(payload).encode() if payload is not None else b''
+    messages = [{'type': 'http.request', 'body': body, 'more_body': False}]
+    sent = []
+    
+    async def receive():
+        return messages.pop(0)
+    
+    async def send(message):
+        sent.append(message)
+    
+    scope = {
+        'type': 'http', 'method': method, 'path': path, 'query_string': b'',
+        'headers': [(b'content-type', b'application/json')]
+    }
+    await asgi.app(scope, receive, send)
+    return sent[0]['status'], json.loads(sent[1]['body'])
+
+PROFILES = [
+    {'degree': 'Computer Science', 'skills': ['Python', 'Machine Learning', 'SQL'], 'experience': 2},
+    {'degree': 'Information Technology', 'skills': ['Docker', 'Kubernets', 'AWS'], 'experience': 5},
+    {'degree': 'Business', 'skills': ['Agile', 'Communication'], 'experience': 0},
+    {'degree': 'Other', 'skills': [], 'experience': 1}
+]
+
+def test_concurrent_predicts_are_batched(monkeypatch):
+    """Concurrent requests are scored in one batch and match single-request mode"""
+    batches = []
+    
+    def predict_many(profiles):
+        batches.append(len(profiles))
+        return manager.current.predict_many(profiles)
+    
+    monkeypatch.setattr(asgi, 'batcher', asgi.MicroBatcher(predict_many, window=0.05, max_size=64))
+    manager.current.cache.clear()
+    
+    async def run():
+        return await asyncio.gather(*(call('/api/predict', 'POST', p) for p in PROFILES))
+    
+    responses = asyncio.run(run())
+    assert batches == [len(PROFILES)]
+    for profile, (status, body) in zip(PROFILES, responses):
+        assert status == 200
+        assert body == json.loads(json.dumps(
+            manager.current.predict(profile['degree'], profile['skills'], profile['experience'])
+        ))
+
+def test_max_size_dispatches_early(monkeypatch):
+    batches = []
+    
+    def predict_many(profiles):
+        batches.append(len(profiles))
+        return manager.current.predict_many(profiles)
+    
+    monkeypatch.setattr(asgi, 'batcher', asgi.MicroBatcher(predict_many, window=10, max_size=2))
+    
+    async def run():
+        return await asyncio.gather(*(call('/api/predict', 'POST', p) for p in PROFILES))
+    
+    asyncio.run(run())
+    assert batches == [2, 2]
+
+def test_validation_and_other_routes():
+    """Invalid predicts fail like the Flask app; other routes are served by Flask"""
+    status, body = asyncio.run(call('/api/predict', 'POST', {'degree': 'Computer Science'}))
+    assert status == 400
+    assert body['error'] == 'Missing required field: skills'
+    
+    status, body = asyncio.run(call('/api/health'))
+    assert status == 200
+    assert body['version'] == manager.current.version
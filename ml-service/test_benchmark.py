@@ -0,0 +1,25 @@
+import copy
+import numpy as np
+from benchmark import compare, run, synthetic_catalog, synthetic_profiles
+
+def test_synthetic_data_is_reproducible():
+    """The same seed always yields the same catalog and profiles"""
+    first = synthetic_catalog(300, np.random.default_rng(7))
+    second = synthetic_catalog(300, np.random.default_rng(7))
+    assert first == second and len(first) == 300
+    
+    profiles = synthetic_profiles(first, 20, np.random.default_rng(7))
+    assert all(1 <= len(p['skills']) <= 100 for p in profiles)
+
+def test_compare_flags_regressions():
+    """Slower throughput or higher memory beyond the tolerance is reported"""
+    report = run([21], n_profiles=5, repeat=1)
+    assert set(report['results']['21']) == {'build', 'normalize_skill', 'recommend', 'recommend_embedding', 'analyze_skill_gap', 'suggest_skills', 'respond', 'predict'}
+    assert compare(report, report) == []
+    
+    baseline = copy.deepcopy(report)
+    baseline['results']['21']['recommend']['ops_per_sec'] *= 2
+    baseline['results']['21']['predict']['peak_kb'] /= 2
+    regressions = compare(report, baseline, tolerance=0.25)
+    assert len(regressions) == 2
+    assert any('recommend / ops_per_sec' in line for line in regressions)
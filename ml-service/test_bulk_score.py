@@ -0,0 +1,76 @@
+import json
+import bulk_score as bulk_score_module
+from bulk_score import bulk_score, score_chunk
+from predictor import CareerPredictor
+
+PROFILES = [
+    {'degree': 'Computer Science', 'skills': ['Python', 'Docker', 'Kubernetes'], 'experience': 4},
+    {'_id': {'$oid': '65a1f0c2e4b0a1b2c3d4e5f6'},
+     'inputData': {'degree': 'Data Science', 'skills': ['SQL', 'Tableau'], 'experience': 0, 'interests': ['BI']}},
+    {'degree': 'Business', 'skills': ['Agile', 'Scrum'], 'experience': 9},
+    {'degree': 'Other'},
+    {'degree': 'Other', 'skills': ['React', 'TypeScript', 'CSS'], 'experience': 2}
+]
+
+def write_input(path, copies=3):
+    with open(path, 'w') as f:
+        for _ in range(copies):
+            for profile in PROFILES:
+                f.write(json.dumps(profile) + '\n')
+        f.write('not json\n')
+
+def read_jsonl(path):
+    with open(path) as f:
+        return [json.loads(line) for line in f]
+
+def test_results_match_predictor_in_input_order(tmp_path):
+    """Every line gets one entry, in order, equal to what the predictor returns"""
+    write_input(tmp_path / 'in.jsonl')
+    state = bulk_score(str(tmp_path / 'in.jsonl'), str(tmp_path / 'out.jsonl'),
+                       chunk_size=4, model_path=str(tmp_path / 'models'))
+    entries = read_jsonl(tmp_path / 'out.jsonl')
+    assert [entry['line'] for entry in entries] == list(range(1, 17))
+    assert state['lines'] == 16 and state['errors'] == 4
+
+    predictor = CareerPredictor(model_path=str(tmp_path / 'models'))
+    assert entries[1]['id'] == '65a1f0c2e4b0a1b2c3d4e5f6'
+    assert entries[1]['result'] == predictor.predict('Data Science', ['SQL', 'Tableau'], 0)
+    assert entries[3]['error'] == 'Missing required field: skills'
+    assert entries[-1]['error'].startswith('Invalid input')
+
+def test_resume_continues_from_checkpoint(tmp_path):
+    """A stopped run resumed from its checkpoint writes exactly what one full run writes"""
+    write_input(tmp_path / 'in.jsonl')
+    models = str(tmp_path / 'models')
+    bulk_score(str(tmp_path / 'in.jsonl'), str(tmp_path / 'full.csv'), 'csv', chunk_size=4, model_path=models)
+
+    bulk_score(str(tmp_path / 'in.jsonl'), str(tmp_path / 'part.csv'), 'csv', chunk_size=4, model_path=models, limit=6)
+    # A write that happened after the last checkpoint is discarded on resume
+    with open(tmp_path / 'part.csv', 'a') as f:
+        f.write('7,partial')
+    state = bulk_score(str(tmp_path / 'in.jsonl'), str(tmp_path / 'part.csv'), 'csv', chunk_size=5,
+                       model_path=models, resume=True)
+    assert state['lines'] == 16
+    assert (tmp_path / 'part.csv').read_text() == (tmp_path / 'full.csv').read_text()
+
+def test_process_pool_matches_single_process(tmp_path):
+    """Workers return chunks in input order"""
+    write_input(tmp_path / 'in.jsonl', copies=6)
+    models = str(tmp_path / 'models')
+    bulk_score(str(tmp_path / 'in.jsonl'), str(tmp_path / 'one.jsonl'), chunk_size=3, model_path=models)
+    bulk_score(str(tmp_path / 'in.jsonl'), str(tmp_path / 'pool.jsonl'), chunk_size=3, model_path=models, workers=2)
+    assert read_jsonl(tmp_path / 'pool.jsonl') == read_jsonl(tmp_path / 'one.jsonl')
+
+def test_failed_rows_keep_the_exception_message(monkeypatch):
+    """A prediction that raised reports its message in the output row, as predict_many does"""
+    class FailingPredictor:
+        def predict_many(self, profiles):
+            return [{'error': 'Prediction failed', 'message': 'catalog is empty'} for _ in profiles]
+
+    monkeypatch.setattr(bulk_score_module, '_predictor', FailingPredictor())
+    line = json.dumps(PROFILES[0]).encode('utf-8')
+    payload, scored, failed = score_chunk((1, [line], 'jsonl', None))
+    assert (scored, failed) == (0, 1)
+    assert json.loads(payload)['error'] == 'Prediction failed: catalog is empty'
+    payload, _, _ = score_chunk((1, [line], 'csv', None))
+    assert payload.decode('utf-8').rstrip('\n').endswith('Prediction failed: catalog is empty')
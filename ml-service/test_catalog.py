@@ -0,0 +1,54 @@
+from catalog import RoleCatalog, iter_catalog_rows, load_catalog
+from predictor import CareerPredictor
+from prediction_cache import PredictionCache
+
+def test_load_csv_and_jsonl(tmp_path):
+    """Both formats stream into the same catalog; bad rows are skipped"""
+    csv_path = tmp_path / 'roles.csv'
+    csv_path.write_text(
+        'role,skills,salary_min,salary_max,degrees\n'
+        'Quantum Engineer,Qiskit;Quantum Computing;Python,900000,3000000,Engineering|Mathematics\n'
+        ',Python,,,\n'
+        'Data Analyst,SQL;Excel,,,\n'
+    )
+    jsonl_path = tmp_path / 'roles.jsonl'
+    jsonl_path.write_text(
+        '{"role": "Quantum Engineer", "skills": ["Qiskit", "Quantum Computing", "Python"], '
+        '"salary": {"min": 900000, "max": 3000000}, "degrees": ["Engineering", "Mathematics"]}\n'
+        'not json\n'
+        '\n'
+        '{"role": "Data Analyst", "skills": "SQL;Excel"}\n'
+    )
+    
+    from_csv = load_catalog(str(csv_path))
+    from_jsonl = load_catalog(str(jsonl_path))
+    for catalog in (from_csv, from_jsonl):
+        assert list(catalog.skill_mapping) == ['Quantum Engineer', 'Data Analyst']
+        assert catalog.salary_data == {'Quantum Engineer': {'min': 900000, 'max': 3000000, 'avg': 1950000}}
+        assert catalog.degree_map == {'Engineering': ['Quantum Engineer'], 'Mathematics': ['Quantum Engineer']}
+
+def test_apply_catalog_updates(tmp_path):
+    """Runtime upserts and removals reach predictions and invalidate the cache"""
+    updates = tmp_path / 'updates.jsonl'
+    updates.write_text(
+        '{"role": "Quantum Engineer", "skills": ["Qiskit", "Quantum Computing", "Linear Algebra"], '
+        '"salary": {"min": 900000, "max": 3000000, "avg": 1500000}}\n'
+        '{"role": "Consultant", "action": "remove"}\n'
+        '{"role": "Astronaut", "action": "remove"}\n'
+    )
+    assert [row['action'] for row in iter_catalog_rows(str(updates))] == ['upsert', 'remove', 'remove']
+    
+    predictor = CareerPredictor(model_path=str(tmp_path), cache=PredictionCache(16, 60),
+                                catalog=RoleCatalog.default())
+    before = predictor.predict('Engineering', ['Qiskit', 'Quantum Computing'], 2)
+    version = predictor.version
+    
+    assert predictor.apply_catalog_updates(str(updates)) == {'upsert': 1, 'remove': 1, 'unknown': 1}
+    assert predictor.version != version
+    after = predictor.predict('Engineering', ['Qiskit', 'Quantum Computing'], 2)
+    assert after is not before
+    assert after['prediction']['careerRole'] == 'Quantum Engineer'
+    assert after['prediction']['salaryRange']['average'] == 1500000
+    assert 'Consultant' not in predictor.recommender.roles
+    # The shipped constants are never modified
+    assert 'Consultant' in RoleCatalog.default()
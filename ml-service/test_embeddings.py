@@ -0,0 +1,70 @@
+import numpy as np
+import pytest
+from train_model import SKILLS, generate_chunk
+from skill_embeddings import (
+    EMBEDDINGS_FILENAME, EmbeddingRanker, build_embeddings, learn_embeddings, load_embeddings
+)
+from predictor import CareerPredictor
+from prediction_cache import PredictionCache
+
+PROFILES = [
+    {'degree': 'Computer Science', 'skills': ['Keras', 'Pandas'], 'experience': 2, 'engine': 'embedding'},
+    {'degree': 'Computer Science', 'skills': ['Keras', 'Pandas'], 'experience': 2},
+    {'degree': 'Data Science', 'skills': ['SQL', 'Tableau', 'Excel'], 'experience': 0, 'engine': 'embedding'},
+    {'degree': 'Other', 'skills': ['Underwater Basket Weaving'], 'experience': 1, 'engine': 'embedding'}
+]
+
+@pytest.fixture(scope='module')
+def predictor(tmp_path_factory):
+    """A predictor whose model directory holds embeddings learned with training co-occurrence"""
+    path = tmp_path_factory.mktemp('models')
+    skills = generate_chunk(np.random.SeedSequence(3), 2000)['skills'].astype(np.int64)
+    build_embeddings(CareerPredictor(model_path=str(path)).recommender,
+                     str(path / EMBEDDINGS_FILENAME), skills.T @ skills, SKILLS)
+    return CareerPredictor(model_path=str(path), cache=PredictionCache(max_size=0))
+
+def test_quantized_round_trip(predictor, tmp_path):
+    """int8 codes memory-map back to nearly the learned unit vectors"""
+    terms, vectors = learn_embeddings(predictor.recommender, dimensions=16)
+    build_embeddings(predictor.recommender, str(tmp_path / 'e.json'), dimensions=16)
+    loaded_terms, codes, scales = load_embeddings(str(tmp_path / 'e.json'))
+    assert loaded_terms == terms and codes.dtype == np.int8 and not codes.flags.writeable
+
+    restored = codes * scales[:, np.newaxis]
+    cosines = np.sum(restored * vectors, axis=1) / np.linalg.norm(restored, axis=1)
+    assert np.allclose(np.linalg.norm(vectors, axis=1), 1, atol=1e-5)
+    assert cosines.min() > 0.999
+    assert load_embeddings(str(tmp_path / 'missing.json')) is None
+
+def test_related_skills_earn_credit(predictor):
+    """A role listing TensorFlow but not Keras scores above zero for a Keras user"""
+    recommender = predictor.recommender
+    role = next(role for role, skills in zip(recommender.roles, recommender.role_skills_list)
+                if 'tensorflow' in skills and 'keras' not in skills)
+    position = recommender.role_positions[role]
+    assert recommender.similarities([['keras']], [position])[0, 0] == 0
+
+    embeddings = predictor.embeddings
+    embeddings.recommend_many([['keras']])
+    score = embeddings.user_vectors([['keras']])[0] @ embeddings.role_matrix[position]
+    assert score > 0.1
+
+def test_engine_is_selected_per_profile(predictor):
+    """Batches mix engines and match single predictions; unusable engines are errors"""
+    batch = predictor.predict_many(PROFILES + [dict(PROFILES[0], engine='word2vec')])
+    for profile, result in zip(PROFILES, batch):
+        assert result == predictor.predict(profile['degree'], profile['skills'], profile['experience'],
+                                           profile.get('engine', 'tfidf'))
+    assert batch[0] != batch[1]
+    assert 'engine' in batch[-1]['error']
+
+    without = CareerPredictor(model_path=predictor.model_path + '-missing', cache=PredictionCache(max_size=0))
+    assert without.embeddings is None and without.engine_error('embedding')
+    with pytest.raises(ValueError):
+        without.predict('Computer Science', ['Python'], 1, 'embedding')
+
+def test_catalog_updates_rebuild_role_vectors(predictor):
+    """Roles added at runtime are ranked by the embedding engine too"""
+    predictor.upsert_role('Applied Deep Learning Engineer', ['Keras', 'TensorFlow', 'PyTorch', 'Deep Learning'])
+    top = predictor.embeddings.recommend_prepared(predictor.recommender.prepare_user_skills(['Keras', 'PyTorch']), 1)
+    assert top[0]['role'] == 'Applied Deep Learning Engineer'
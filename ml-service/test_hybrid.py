@@ -0,0 +1,160 @@
+import os
+import json
+import shutil
+import subprocess
+import sys
+import joblib
+import numpy as np
+import pandas as pd
+import pytest
+from sklearn.ensemble import RandomForestClassifier
+from sklearn.preprocessing import LabelEncoder, MultiLabelBinarizer
+from train_model import create_training_data
+from hybrid import RandomForestScorer
+from forest import EncoderClasses, ForestArrays, export_forest
+from skill_index import SKILL_INDEX
+from predictor import CareerPredictor
+from prediction_cache import PredictionCache
+from metrics import METRICS
+
+PROFILES = [
+    {'degree': 'Computer Science', 'skills': ['Python', 'Docker', 'Kubernetes', 'AWS'], 'experience': 4},
+    {'degree': 'Data Science', 'skills': ['SQL', 'Tableau', 'Excel'], 'experience': 0},
+    {'degree': 'Business', 'skills': ['Agile', 'Scrum', 'Risk Management'], 'experience': 9},
+    {'degree': 'Other', 'skills': ['React', 'TypeScript', 'CSS'], 'experience': 2}
+]
+
+@pytest.fixture(scope='module')
+def model_dir(tmp_path_factory):
+    """A small forest trained exactly like train_model does"""
+    df = create_training_data()
+    le_degree = LabelEncoder()
+    mlb_skills = MultiLabelBinarizer()
+    le_role = LabelEncoder()
+    X = pd.concat([
+        pd.DataFrame({'degree': le_degree.fit_transform(df['degree']), 'experience': df['experience'].values}),
+        pd.DataFrame(mlb_skills.fit_transform(df['skills']), columns=mlb_skills.classes_)
+    ], axis=1)
+    X.columns = [str(c) for c in X.columns]
+    model = RandomForestClassifier(n_estimators=10, max_depth=15, random_state=42)
+    model.fit(X, le_role.fit_transform(df['career_role']))
+    
+    path = tmp_path_factory.mktemp('models')
+    for name, obj in [('career_model', model), ('degree_encoder', le_degree),
+                      ('role_encoder', le_role), ('skills_encoder', mlb_skills)]:
+        joblib.dump(obj, path / f'{name}.pkl')
+    return str(path)
+
+def test_features_match_dataframe_pipeline(model_dir):
+    """Direct feature rows give the same probabilities as the pandas/MLB path"""
+    model = joblib.load(f'{model_dir}/career_model.pkl')
+    degree_encoder = joblib.load(f'{model_dir}/degree_encoder.pkl')
+    skills_encoder = joblib.load(f'{model_dir}/skills_encoder.pkl')
+    scorer = RandomForestScorer(model, degree_encoder, joblib.load(f'{model_dir}/role_encoder.pkl'), skills_encoder)
+    
+    known = PROFILES[:3]
+    X = pd.concat([
+        pd.DataFrame({'degree': degree_encoder.transform([p['degree'] for p in known]),
+                      'experience': [p['experience'] for p in known]}),
+        pd.DataFrame(skills_encoder.transform([p['skills'] for p in known]), columns=skills_encoder.classes_)
+    ], axis=1)
+    X.columns = [str(c) for c in X.columns]
+    expected = model.predict_proba(X)
+    
+    skill_lists = [[SKILL_INDEX.normalize(s) for s in p['skills']] for p in known]
+    actual = scorer.predict_proba([p['degree'] for p in known], [p['experience'] for p in known], skill_lists)
+    assert np.array_equal(actual, expected)
+
+def test_hybrid_batch_matches_single(model_dir):
+    predictor = CareerPredictor(model_path=model_dir, cache=PredictionCache(max_size=0), rf_weight=0.5)
+    assert predictor.hybrid is not None
+    
+    batch = predictor.predict_many(PROFILES)
+    for profile, result in zip(PROFILES, batch):
+        assert result == predictor.predict(profile['degree'], profile['skills'], profile['experience'])
+
+def test_rf_weight_controls_ranking(model_dir):
+    """Weight 0 is plain TF-IDF; weight 1 ranks by forest probability"""
+    tfidf_only = CareerPredictor(model_path=model_dir, cache=PredictionCache(max_size=0), rf_weight=0)
+    assert tfidf_only.hybrid is None
+    
+    forest = CareerPredictor(model_path=model_dir, cache=PredictionCache(max_size=0), rf_weight=1.0)
+    profile = PROFILES[0]
+    skills = forest.recommender.prepare_user_skills(profile['skills'])
+    proba = forest.hybrid.scorer.predict_proba([profile['degree']], [profile['experience']], [skills])[0]
+    in_catalog = [j for j, role in enumerate(forest.hybrid.scorer.roles) if role in forest.recommender.role_positions]
+    best = forest.hybrid.scorer.roles[max(in_catalog, key=lambda j: proba[j])]
+    
+    result = forest.predict(profile['degree'], profile['skills'], profile['experience'])
+    assert result['prediction']['careerRole'] == best
+
+def test_exported_forest_matches_sklearn(model_dir, tmp_path):
+    """The memory-mapped forest scores like the pickled one and is preferred by the predictor"""
+    model = joblib.load(f'{model_dir}/career_model.pkl')
+    for name in ('career_model', 'degree_encoder', 'role_encoder', 'skills_encoder'):
+        shutil.copy(f'{model_dir}/{name}.pkl', tmp_path)
+    assert export_forest(model, str(tmp_path))
+    
+    forest = ForestArrays.load(str(tmp_path))
+    assert list(forest.feature_names_in_) == list(model.feature_names_in_)
+    rng = np.random.default_rng(3)
+    X = pd.DataFrame((rng.random((200, model.n_features_in_)) < 0.2).astype(np.float32),
+                     columns=model.feature_names_in_)
+    X['experience'] = rng.integers(0, 15, len(X))
+    assert np.allclose(forest.predict_proba(X.values), model.predict_proba(X), atol=1e-6)
+    
+    mapped = CareerPredictor(model_path=str(tmp_path), cache=PredictionCache(max_size=0), rf_weight=0.5)
+    pickled = CareerPredictor(model_path=model_dir, cache=PredictionCache(max_size=0), rf_weight=0.5)
+    assert isinstance(mapped.model, ForestArrays)
+    for profile in PROFILES:
+        assert mapped.predict(**profile)['prediction']['careerRole'] == \
+            pickled.predict(**profile)['prediction']['careerRole']
+
+def test_export_with_encoders_needs_no_pickled_encoders(model_dir, tmp_path):
+    """Encoder classes stored in the export replace the encoder pickles"""
+    shutil.copy(f'{model_dir}/career_model.pkl', tmp_path)
+    encoders = {name: joblib.load(f'{model_dir}/{name}_encoder.pkl') for name in ('degree', 'role', 'skills')}
+    assert export_forest(joblib.load(f'{model_dir}/career_model.pkl'), str(tmp_path), encoders)
+    
+    mapped = CareerPredictor(model_path=str(tmp_path), cache=PredictionCache(max_size=0), rf_weight=0.5)
+    pickled = CareerPredictor(model_path=model_dir, cache=PredictionCache(max_size=0), rf_weight=0.5)
+    assert isinstance(mapped.skills_encoder, EncoderClasses)
+    assert list(mapped.skills_encoder.classes_) == list(encoders['skills'].classes_)
+    assert mapped.hybrid.scorer.roles == pickled.hybrid.scorer.roles
+    assert mapped.get_available_skills() == pickled.get_available_skills()
+
+def test_exported_forest_serves_without_sklearn(model_dir, tmp_path):
+    """A fresh interpreter serving an export never imports scikit-learn or joblib"""
+    shutil.copy(f'{model_dir}/career_model.pkl', tmp_path)
+    encoders = {name: joblib.load(f'{model_dir}/{name}_encoder.pkl') for name in ('degree', 'role', 'skills')}
+    assert export_forest(joblib.load(f'{model_dir}/career_model.pkl'), str(tmp_path), encoders)
+    
+    script = (
+        "import sys\n"
+        "from forest import ForestArrays\n"
+        "from predictor import CareerPredictor\n"
+        f"predictor = CareerPredictor(model_path={str(tmp_path)!r}, rf_weight=0.5)\n"
+        "assert isinstance(predictor.model, ForestArrays)\n"
+        "predictor.predict('Computer Science', ['Python', 'Docker'], 3)\n"
+        "print('loaded:', sorted(name for name in ('sklearn', 'joblib') if name in sys.modules))\n"
+    )
+    output = subprocess.run([sys.executable, '-c', script], cwd=os.path.dirname(os.path.abspath(__file__)),
+                            capture_output=True, text=True, check=True).stdout
+    assert 'loaded: []' in output
+
+def test_stale_export_fallback_is_reported(model_dir, tmp_path):
+    """Serving the pickle instead of a rejected export shows in model_source and metrics"""
+    for name in ('career_model', 'degree_encoder', 'role_encoder', 'skills_encoder'):
+        shutil.copy(f'{model_dir}/{name}.pkl', tmp_path)
+    assert export_forest(joblib.load(f'{model_dir}/career_model.pkl'), str(tmp_path))
+    assert CareerPredictor(model_path=str(tmp_path), cache=PredictionCache(max_size=0)).model_source == 'forest'
+    
+    manifest_path = tmp_path / 'forest' / 'forest.json'
+    manifest = json.loads(manifest_path.read_text())
+    manifest_path.write_text(json.dumps(dict(manifest, model_checksum='stale')))
+    before = METRICS.snapshot()['counters']
+    predictor = CareerPredictor(model_path=str(tmp_path), cache=PredictionCache(max_size=0))
+    after = METRICS.snapshot()['counters']
+    assert predictor.model_source == 'pickle'
+    fallbacks = lambda counters: sum(value for name, labels, value in counters if name == 'ml_forest_fallbacks_total')
+    assert fallbacks(after) == fallbacks(before) + 1
@@ -0,0 +1,68 @@
+import threading
+import pytest
+import numpy as np
+from werkzeug.serving import make_server
+from app import app
+from data_constants import DEGREE_MAP
+from loadtest import TrafficModel, load_test, main, rate_segments, saturation_point, schedule
+
+def test_schedule_follows_rate_profile():
+    """Arrivals are reproducible and track the profile's rate"""
+    segments = rate_segments('constant', 200, 10)
+    times, labels = schedule(segments, np.random.default_rng(1))
+    assert times == schedule(segments, np.random.default_rng(1))[0]
+    assert abs(len(times) - 2000) < 200 and times == sorted(times)
+
+    ramp, _ = schedule(rate_segments('ramp', 10, 10, end_rate=190), np.random.default_rng(1))
+    assert sum(t >= 5 for t in ramp) > 2 * sum(t < 5 for t in ramp)
+
+    times, labels = schedule(rate_segments('burst', 10, 20, burst_rate=100), np.random.default_rng(1))
+    assert labels.count('burst') > labels.count('base')
+    assert all(8 <= t % 10 for t, label in zip(times, labels) if label == 'burst')
+    assert [label for label, *_ in rate_segments('steps', 0, 0, rates=[50, 100])] == ['50 rps', '100 rps']
+    
+    # Segments add up to the duration and never run backwards
+    segments = rate_segments('burst', 10, 7, burst_seconds=3, burst_every=4)
+    assert all(seconds > 0 for _, seconds, *_ in segments)
+    assert sum(seconds for _, seconds, *_ in segments) == 7
+    with pytest.raises(ValueError):
+        rate_segments('burst', 10, 20, burst_seconds=3, burst_every=3)
+    with pytest.raises(SystemExit):
+        main(['--profile', 'burst', '--burst-seconds', '5', '--burst-every', '4'])
+
+def test_traffic_model_builds_valid_requests():
+    model = TrafficModel(['Python', 'Rust', 'Figma'], np.random.default_rng(2))
+    requests = [model.request() for _ in range(500)]
+    endpoints = [request[0] for request in requests]
+    assert 0.7 < endpoints.count('predict') / len(requests) < 0.9
+    for endpoint, method, path, body in requests:
+        if endpoint == 'predict':
+            assert body['degree'] in DEGREE_MAP or body['degree'] == 'Other'
+            assert body['skills'] and all(isinstance(skill, str) and skill for skill in body['skills'])
+            assert isinstance(body['experience'], int) and body['experience'] >= 0
+        elif endpoint == 'suggest':
+            assert method == 'GET' and path.startswith('/api/skills/suggest?q=')
+
+def test_load_test_against_local_server():
+    """An open-loop run against a locally served app completes without errors"""
+    server = make_server('127.0.0.1', 0, app, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    try:
+        report = load_test(f'http://127.0.0.1:{server.server_port}', rate_segments('constant', 40, 1), seed=3)
+    finally:
+        server.shutdown()
+    total = report['total']
+    assert total['sent'] > 10 and total['errors'] == 0
+    assert total['latencyMs']['p50'] <= total['latencyMs']['p99'] <= total['latencyMs']['max']
+    assert set(report['phases']) == {'constant'}
+    assert sum(summary['sent'] for summary in report['endpoints'].values()) == total['sent']
+
+def test_saturation_is_last_sustained_step():
+    def step(target, done, p99, error_rate=0.0):
+        return {'targetRps': target, 'throughputRps': done, 'errorRate': error_rate, 'latencyMs': {'p99': p99}}
+
+    phases = {'50 rps': step(50, 50, 20), '100 rps': step(100, 99, 40), '200 rps': step(200, 150, 900),
+              '400 rps': step(400, 400, 30)}
+    assert saturation_point(phases) == 100
+    assert saturation_point(phases, slo_ms=1000) == 100
+    assert saturation_point({'50 rps': step(50, 50, 20, error_rate=0.05)}) is None
@@ -118,6 +118,40 @@ def test_job_matching():
     
     return passed, failed
 
+def test_skill_gap_matches_recommender():
+    """Synonyms count as matches, consistently with matched_skills_count"""
+    skills = ['JS', 'ReactJS', 'node', 'HTML']
+    top = predictor.recommender.recommend(skills, top_n=1)[0]
+    gap = predictor.analyze_skill_gap(skills, top['role'], 2)
+    
+    assert 'JS' in gap['matchingSkills']
+    assert len(gap['matchingSkills']) == top['matched_skills_count']
+    missing = [item['skill'] for item in gap['missingSkills']]
+    assert not set(missing) & set(gap['matchingSkills'])
+    
+    # Missing skills come heaviest first, tiers never step back up
+    impacts = [item['impactOnSuccess'] for item in gap['missingSkills']]
+    assert impacts == sorted(impacts, reverse=True)
+    tiers = ['Critical', 'Important', 'Nice-to-have']
+    ranks = [tiers.index(item['importance']) for item in gap['missingSkills']]
+    assert ranks == sorted(ranks)
+    assert [item['skill'] for item in gap['recommendedSkills']] == missing[:5]
+
+def test_skill_gap_names():
+    """Matches keep the user's spelling; gaps list every catalog spelling of a skill"""
+    gap = predictor.analyze_skill_gap(['reactjs', 'Swift'], 'Mobile Developer', 2)
+    assert sorted(gap['matchingSkills']) == ['Swift', 'reactjs']
+    missing = [item['skill'] for item in predictor.analyze_skill_gap(['Swift'], 'Mobile Developer', 2)['missingSkills']]
+    assert 'React Native / React' in missing
+    
+    # Cached predictions are shared between spellings, but never their names
+    first = predictor.predict('Computer Science', ['JS', 'HTML', 'CSS'], 2)
+    second = predictor.predict('Computer Science', ['javascript', 'html', 'css'], 2)
+    assert 'JS' in first['skillGap']['matchingSkills']
+    assert 'javascript' in second['skillGap']['matchingSkills']
+    batch = predictor.predict_many([{'degree': 'Computer Science', 'skills': ['Js', 'HTML', 'CSS'], 'experience': 2}])
+    assert 'Js' in batch[0]['skillGap']['matchingSkills']
+
 if __name__ == '__main__':
     passed, failed = test_job_matching()
     sys.exit(0 if failed == 0 else 1)
@@ -0,0 +1,53 @@
+import json
+import os
+from metrics import MetricsRegistry
+
+def make_registry(directory=None):
+    registry = MetricsRegistry(directory)
+    registry.counter('requests_total', 'Requests')
+    registry.gauge('workers', 'Workers')
+    registry.histogram('latency_seconds', 'Latency', buckets=(0.1, 1.0))
+    return registry
+
+def test_render_prometheus_text():
+    """Counters, gauges and cumulative histogram buckets are rendered"""
+    registry = make_registry()
+    registry.inc('requests_total', endpoint='/api/predict', status='200')
+    registry.inc('requests_total', endpoint='/api/predict', status='200')
+    registry.set('workers', 1)
+    registry.observe('latency_seconds', 0.05)
+    registry.observe('latency_seconds', 0.5)
+    registry.observe('latency_seconds', 3)
+    
+    lines = registry.render().splitlines()
+    assert '# TYPE requests_total counter' in lines
+    assert 'requests_total{endpoint="/api/predict",status="200"} 2' in lines
+    assert 'workers 1' in lines
+    assert 'latency_seconds_bucket{le="0.1"} 1' in lines
+    assert 'latency_seconds_bucket{le="1"} 2' in lines
+    assert 'latency_seconds_bucket{le="+Inf"} 3' in lines
+    assert 'latency_seconds_count 3' in lines
+    assert 'latency_seconds_sum 3.55' in lines
+
+def test_workers_are_aggregated(tmp_path):
+    """Snapshots of other workers are merged; gauges of dead workers are dropped"""
+    live = make_registry(str(tmp_path))
+    live.inc('requests_total', status='200')
+    live.set('workers', 1)
+    live.observe('latency_seconds', 0.05)
+    
+    dead_worker = {
+        'pid': 2 ** 22 + 1,
+        'counters': [['requests_total', [['status', '200']], 4]],
+        'gauges': [['workers', [], 1]],
+        'histograms': [['latency_seconds', [], [[0, 2], 1.0, 2]]]
+    }
+    with open(os.path.join(tmp_path, 'metrics-dead.json'), 'w') as f:
+        json.dump(dead_worker, f)
+    
+    lines = live.render().splitlines()
+    assert 'requests_total{status="200"} 5' in lines
+    assert 'workers 1' in lines
+    assert 'latency_seconds_bucket{le="0.1"} 1' in lines
+    assert 'latency_seconds_bucket{le="1"} 3' in lines
+    assert 'latency_seconds_count 3' in lines
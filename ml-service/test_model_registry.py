@@ -0,0 +1,66 @@
+import os
+import pytest
+import search_models
+from model_registry import ModelRegistry, RegistryError, resolve_model_dir, select_best
+from prediction_cache import PredictionCache
+from predictor import CareerPredictor
+from search_models import evaluate_candidate, search
+from train_model import generate_dataset
+
+def candidate(version, accuracy, latency, size):
+    return {
+        'version': version,
+        'metrics': {'heldout_accuracy': accuracy, 'latency_ms_per_1k': latency, 'size_kb': size}
+    }
+
+def test_select_best_weighs_latency_and_size():
+    """Near-ties on accuracy go to the faster, then smaller model; budgets filter"""
+    candidates = [
+        candidate('forest', 0.990, 30.0, 2000),
+        candidate('small-forest', 0.988, 5.0, 300),
+        candidate('linear', 0.950, 0.5, 5)
+    ]
+    assert select_best(candidates)['version'] == 'small-forest'
+    assert select_best(candidates, accuracy_tolerance=0)['version'] == 'forest'
+    assert select_best(candidates, max_latency_ms=1)['version'] == 'linear'
+    assert select_best(candidates, max_size_kb=100, min_accuracy=0.98) is None
+
+def test_search_registers_and_promotes(tmp_path):
+    """Searched candidates are registered with metrics and the promoted one is served"""
+    registry = ModelRegistry.for_model_path(str(tmp_path))
+    assert resolve_model_dir(str(tmp_path)) == str(tmp_path)
+    with pytest.raises(RegistryError):
+        registry.promote('missing')
+    
+    results = search(registry, families=['sgd'], samples=2000, folds=2, cpus=1)
+    assert len(results) == 2
+    assert [v['version'] for v in registry.versions()] == sorted(r['version'] for r in results)
+    for result in results:
+        assert set(result['metrics']) >= {'heldout_accuracy', 'fit_seconds', 'latency_ms_per_1k', 'size_kb'}
+    
+    best = select_best(results)
+    registry.promote(best['version'])
+    predictor = CareerPredictor(model_path=str(tmp_path), cache=PredictionCache(max_size=0), rf_weight=0.5)
+    assert predictor.model_version == best['version']
+    assert predictor.hybrid is not None
+    assert predictor.predict('Computer Science', ['Python', 'Docker'], 3)['prediction']['careerRole']
+
+def test_candidates_appear_complete_or_not_at_all(tmp_path, monkeypatch):
+    """Tree candidates are timed through the forest export; a failed one leaves no directory"""
+    registry = ModelRegistry.for_model_path(str(tmp_path / 'models'))
+    train_paths, validation_path = generate_dataset(str(tmp_path / 'data'), 1000, 500, workers=1)
+    task = ('random_forest', {'n_estimators': 5, 'max_depth': 8}, train_paths, validation_path, 2, 0, registry.root)
+    
+    first = registry.new_version('random_forest')
+    second = registry.new_version('random_forest', taken=[first])
+    assert first != second and not os.path.exists(registry.root)
+    result = evaluate_candidate(task + (first,))
+    assert result['serving'] == 'forest'
+    assert [v['version'] for v in registry.versions()] == [first]
+    
+    def fail(*args):
+        raise OSError('disk full')
+    monkeypatch.setattr(search_models, 'save_artifacts', fail)
+    with pytest.raises(OSError):
+        evaluate_candidate(task + (second,))
+    assert sorted(os.listdir(registry.root)) == [first]
@@ -0,0 +1,55 @@
+from prediction_cache import PredictionCache
+from predictor import CareerPredictor
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+def test_lru_eviction_and_ttl():
+    """Least recently used entries are evicted first and entries expire"""
+    clock = FakeClock()
+    cache = PredictionCache(max_size=2, ttl=10, clock=clock)
+    cache.put('a', 1)
+    cache.put('b', 2)
+    assert cache.get('a') == 1
+    cache.put('c', 3)
+    assert cache.get('b') is None
+    assert cache.get('a') == 1
+    
+    clock.now = 11
+    assert cache.get('a') is None
+    stats = cache.stats()
+    assert stats['evictions'] == 1
+    assert stats['expirations'] == 1
+    assert stats['hits'] == 2
+
+def test_version_change_invalidates():
+    cache = PredictionCache(max_size=4, ttl=10)
+    cache.set_version('v1')
+    cache.put('a', 1)
+    cache.set_version('v1')
+    assert cache.get('a') == 1
+    cache.set_version('v2')
+    assert cache.get('a') is None
+    assert cache.stats()['invalidations'] == 1
+
+def test_predictor_cache_key_is_order_independent():
+    """Reordered and recased skills hit the same entry with the same result, in their own spelling"""
+    predictor = CareerPredictor(cache=PredictionCache(max_size=16, ttl=60))
+    first = predictor.predict('Computer Science', ['Python', 'SQL', 'Docker'], 2)
+    second = predictor.predict('Computer Science', ['docker', 'python', 'SQL'], 2.5)
+    assert second['prediction'] is first['prediction']
+    assert {skill.lower() for skill in second['skillGap']['matchingSkills']} == \
+        {skill.lower() for skill in first['skillGap']['matchingSkills']}
+    assert set(second['skillGap']['matchingSkills']) <= {'docker', 'python', 'SQL'}
+    assert predictor.cache.stats()['hits'] == 1
+    
+    uncached = CareerPredictor(cache=PredictionCache(max_size=0))
+    assert uncached.predict('Computer Science', ['docker', 'python', 'SQL'], 2.5) == second
+    
+    # Crossing an experience threshold is a different entry
+    predictor.predict('Computer Science', ['Python', 'SQL', 'Docker'], 5)
+    assert predictor.cache.stats()['misses'] == 2
@@ -0,0 +1,37 @@
+import os
+import time
+import multiprocessing
+from profiling import SamplingProfiler
+
+def busy_follower(control_dir, stop):
+    """A worker that watches the control directory and spins in a recognizable function"""
+    profiler = SamplingProfiler(control_dir=control_dir)
+    profiler.watch()
+    while not stop.is_set():
+        follower_spin()
+
+def follower_spin():
+    sum(range(1000))
+
+def test_runs_fan_out_to_watching_workers(tmp_path):
+    """A run started in one process is sampled by every watcher and merged into one file"""
+    context = multiprocessing.get_context('fork')
+    stop = context.Event()
+    follower = context.Process(target=busy_follower, args=(str(tmp_path / 'control'), stop))
+    follower.start()
+    try:
+        time.sleep(0.5)
+        profiler = SamplingProfiler(control_dir=str(tmp_path / 'control'))
+        assert profiler.start(1.0, all_threads=True, directory=str(tmp_path / 'profiles'))
+        run = profiler.wait(10)
+    finally:
+        stop.set()
+        follower.join(5)
+
+    assert run['workers'] == 2
+    parts = sorted(os.listdir(tmp_path / 'profiles'))
+    assert len(parts) == 3 and os.path.basename(run['file']) in parts
+    assert not any(part.endswith('.started') for part in parts)
+    with open(run['file']) as f:
+        lines = f.read().splitlines()
+    assert any('test_profiling.py:follower_spin' in line for line in lines)
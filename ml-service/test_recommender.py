@@ -0,0 +1,231 @@
+import numpy as np
+from tfidf_recommender import TfidfRecommender, top_k_indices
+from recommender_index import load_index
+from data_constants import EXTENDED_SKILL_MAPPING
+
+recommender = TfidfRecommender()
+
+PROFILES = [
+    ['Python', 'Machine Learning', 'Statistics', 'Pandas', 'Tableau'],
+    ['Docker', 'Kubernetes', 'AWS', 'CI/CD', 'Linux'],
+    ['js', 'ReactJS', 'node'],
+    ['Underwater Basket Weaving'],
+    [],
+    ['SQL']
+]
+
+def test_top_k_indices_orders_ties_by_index():
+    """Ties are broken by the lower column index, including at the cutoff"""
+    scores = np.array([
+        [0.0, 0.5, 0.0, 0.5, 0.9, 0.0],
+        [0.0, 0.0, 0.0, 0.0, 0.0, 0.0]
+    ])
+    assert top_k_indices(scores, 4).tolist() == [[4, 1, 3, 0], [0, 1, 2, 3]]
+    assert top_k_indices(scores, 10).shape == (2, 6)
+
+def test_fit_matches_tfidf_vectorizer():
+    """The numpy fit gives the vocabulary, idf and rows scikit-learn would"""
+    from sklearn.feature_extraction.text import TfidfVectorizer
+    vectorizer = TfidfVectorizer(analyzer=lambda skills: skills)
+    expected = vectorizer.fit_transform(recommender.role_skills_list)
+    assert recommender.vocabulary == vectorizer.vocabulary_
+    assert np.allclose(recommender.idf, vectorizer.idf_)
+    assert np.allclose(recommender.tfidf_matrix.toarray(), expected.toarray(), atol=1e-7)
+
+def test_recommend_many_matches_recommend():
+    """Batch scoring returns exactly what per-user scoring returns"""
+    batch = recommender.recommend_many(PROFILES, top_n=4)
+    assert len(batch) == len(PROFILES)
+    for skills, results in zip(PROFILES, batch):
+        assert results == recommender.recommend(skills, top_n=4)
+    assert batch[4] == []
+
+def test_recommend_chunking():
+    """Chunked batches give the same results as a single chunk"""
+    profiles = [skills[:n] for skills in EXTENDED_SKILL_MAPPING.values() for n in (1, 3, 8)]
+    assert recommender.recommend_many(profiles, top_n=5, chunk_size=7) == \
+        recommender.recommend_many(profiles, top_n=5)
+
+def test_what_if_matches_rescoring():
+    """Rank-1 updates give the scores of re-running the recommender with the skills added"""
+    for skills in PROFILES[:4]:
+        unique_skills = recommender.prepare_user_skills(skills)
+        result = recommender.what_if(unique_skills, top_n=3, pairs=True)
+        current = recommender.recommend_many([unique_skills], top_n=3, prepared=True)[0]
+        assert [item['role'] for item in result['current']] == [item['role'] for item in current]
+        
+        additions = result['additions'] + result['pairs']
+        assert additions and len(result['pairs']) <= 28
+        best = [item['top']['similarity_score'] for item in result['additions']]
+        assert best == sorted(best, reverse=True)
+        for item in additions:
+            assert not set(item['skills']) & set(unique_skills)
+            rescored = recommender.recommend_many([unique_skills + item['skills']], top_n=1, prepared=True)[0][0]
+            assert rescored['role'] == item['top']['role']
+            assert np.isclose(rescored['similarity_score'], item['top']['similarity_score'], atol=1e-6)
+            role_scores = recommender.similarities([unique_skills + item['skills']], [
+                recommender.role_positions[entry['role']] for entry in result['current']
+            ])[0]
+            before = [entry['similarity_score'] for entry in result['current']]
+            assert np.allclose(role_scores - before, item['gains'], atol=1e-6)
+
+def test_index_round_trip(tmp_path):
+    """A saved index loads without refitting and scores identically"""
+    path = str(tmp_path / 'tfidf_index.json')
+    built = TfidfRecommender(index_path=path)
+    assert load_index(path, built.checksum) is not None
+    
+    loaded = TfidfRecommender(index_path=path)
+    assert loaded.roles == recommender.roles
+    assert loaded.role_skills_list == recommender.role_skills_list
+    assert loaded.recommend_many(PROFILES, top_n=4) == recommender.recommend_many(PROFILES, top_n=4)
+    
+    # Weights are mapped read-only; incremental updates build new arrays
+    assert not loaded.tfidf_matrix.data.flags.writeable
+    assert not loaded.postings.data.flags.writeable
+    loaded.add_role('Quantum Engineer', ['Qiskit', 'Quantum Computing'])
+    assert loaded.recommend(['qiskit'], top_n=1)[0]['role'] == 'Quantum Engineer'
+
+def test_stale_index_is_ignored(tmp_path):
+    """An index built from a different catalog is rejected"""
+    path = str(tmp_path / 'tfidf_index.json')
+    TfidfRecommender(index_path=path)
+    assert load_index(path, 'not-the-catalog-checksum') is None
+
+def test_inverted_index_matches_exhaustive_on_large_catalog():
+    """Pruned inverted-index search returns exactly the brute-force top-k"""
+    rng = np.random.default_rng(7)
+    vocabulary = [f'skill {i}' for i in range(800)]
+    popularity = 1.0 / np.arange(1, len(vocabulary) + 1) ** 0.8
+    popularity /= popularity.sum()
+    catalog = [
+        list(dict.fromkeys(rng.choice(vocabulary, rng.integers(3, 25), p=popularity)))
+        for _ in range(3000)
+    ]
+    
+    large = TfidfRecommender(skill_mapping={f'Role {i}': skills for i, skills in enumerate(catalog)})
+    
+    users = [list(rng.choice(vocabulary, rng.integers(1, 30), p=popularity)) for _ in range(60)]
+    users.append(['skill 0', 'not in catalog'])
+    for top_n in (1, 5, 40):
+        assert [large.recommend(skills, top_n=top_n) for skills in users] == \
+            large.recommend_many(users, top_n=top_n)
+
+def test_incremental_updates_match_full_refit():
+    """Spliced rows score like a fresh fit once the drift refit has run"""
+    mapping = {role: list(skills) for role, skills in EXTENDED_SKILL_MAPPING.items()}
+    live = TfidfRecommender(skill_mapping=mapping, drift_threshold=1.0)
+    
+    live.add_role('Quantum Engineer', ['Qiskit', 'Quantum Computing', 'Python', 'Linear Algebra'])
+    live.update_role('Data Analyst', ['SQL', 'Excel', 'Looker'])
+    live.remove_role('Consultant')
+    top = live.recommend(['qiskit', 'quantum computing'], top_n=2)
+    assert top[0]['role'] == 'Quantum Engineer'
+    assert top[0]['matched_skills_count'] == 2
+    assert 'Consultant' not in live.roles
+    assert live.roles.index('Data Analyst') == list(mapping).index('Data Analyst')
+    assert live.get_role_skills('Data Analyst') == ['sql', 'excel', 'looker']
+    
+    mapping['Quantum Engineer'] = ['Qiskit', 'Quantum Computing', 'Python', 'Linear Algebra']
+    mapping['Data Analyst'] = ['SQL', 'Excel', 'Looker']
+    del mapping['Consultant']
+    fresh = TfidfRecommender(skill_mapping=mapping)
+    assert live.roles == fresh.roles
+    
+    # Only idf values of touched skills were refreshed, so scores are close
+    # but not identical until the full refit
+    live_scores = (live.tfidf_matrix @ live.tfidf_matrix.T).toarray()
+    fresh_scores = (fresh.tfidf_matrix @ fresh.tfidf_matrix.T).toarray()
+    assert np.allclose(live_scores, fresh_scores, atol=0.05)
+
+    # Skills only the removed and replaced roles had leave the vocabulary,
+    # so user queries naming them score like the fresh fit
+    orphaned = set(live.vocabulary) ^ set(fresh.vocabulary)
+    assert not orphaned
+    rng = np.random.default_rng(7)
+    terms = sorted({skill for skills in EXTENDED_SKILL_MAPPING.values() for skill in skills})
+    queries = [list(rng.choice(terms, 4, replace=False)) for _ in range(200)]
+    queries += [['Consulting', 'Client Management', 'SQL'], ['Data Mining', 'Seaborn', 'Python']]
+    for query in queries:
+        expected = fresh.recommend(query, top_n=3)
+        actual = live.recommend(query, top_n=3)
+        assert [r['matchScore'] for r in actual] == [r['matchScore'] for r in expected]
+        assert np.allclose([r['similarity_score'] for r in actual],
+                           [r['similarity_score'] for r in expected], atol=1e-5)
+
+    live.rebuild()
+    assert live.recommend_many(PROFILES, top_n=4) == fresh.recommend_many(PROFILES, top_n=4)
+    assert [live.recommend(skills, top_n=4) for skills in PROFILES] == \
+        live.recommend_many(PROFILES, top_n=4)
+
+def test_neighbouring_updates_in_reverse_order():
+    """Rows updated out of catalog order keep their own skills"""
+    mapping = {f'R{i}': [f'skill {i}', f'skill {i + 1}'] for i in range(30)}
+    live = TfidfRecommender(skill_mapping=mapping, drift_threshold=1.0)
+    updates = [
+        ('R8', ['x8a', 'x8b']),
+        ('R7', ['y7']),
+        ('R6', ['x6a', 'x6b', 'x6c', 'x6d']),
+        ('R5', ['y5'])
+    ]
+    for role, skills in updates:
+        live.add_role(role, skills)
+        mapping[role] = skills
+    fresh = TfidfRecommender(skill_mapping=mapping)
+    
+    matrix = live.role_vectors()
+    names = live.feature_names
+    rows = [sorted(names[matrix.indices[matrix.indptr[i]:matrix.indptr[i + 1]]]) for i in range(len(live.roles))]
+    assert rows == [sorted(skills) for skills in fresh.role_skills_list]
+    assert live.recommend(['y5'], top_n=1)[0]['role'] == 'R5'
+    assert live.recommend(['x6a', 'x6d'], top_n=1)[0]['role'] == 'R6'
+    
+    live.rebuild()
+    assert np.allclose(live.tfidf_matrix.toarray(), fresh.tfidf_matrix.toarray())
+
+def test_snapshots_are_never_modified():
+    """Updates publish a new state; one a reader already holds stays as it was"""
+    mapping = {f'R{i}': [f'skill {i}', f'skill {i + 1}'] for i in range(30)}
+    live = TfidfRecommender(skill_mapping=mapping, drift_threshold=1.0)
+    before = live.snapshot()
+    vocabulary = dict(before.vocabulary)
+    idf = before.idf.copy()
+    
+    live.add_role('Quantum Engineer', ['Qiskit', 'skill 3'])
+    live.update_role('R3', ['skill 40'])
+    assert live.vocabulary == vocabulary
+    assert live.snapshot() is live.snapshot() is not before
+    assert before.vocabulary == vocabulary
+    assert np.array_equal(before.idf, idf)
+    assert before.roles == list(mapping)
+    assert before.build_result(3, 0.5, ['skill 3'])['matched_skills_count'] == 1
+    assert live.snapshot().build_result(3, 0.5, ['skill 3'])['matched_skills_count'] == 0
+
+def test_drift_threshold_triggers_refit():
+    """Enough incremental changes make the next query refit everything"""
+    mapping = {f'Role {i}': [f'skill {i}', f'skill {i + 1}'] for i in range(10)}
+    live = TfidfRecommender(skill_mapping=mapping, drift_threshold=0.2)
+    live.add_role('Role 10', ['skill 10', 'skill 11'])
+    live.recommend(['skill 10'])
+    assert live._changes_since_fit == 1
+    
+    live.add_role('Role 11', ['skill 11', 'skill 12'])
+    live.add_role('Role 12', ['skill 12', 'skill 13'])
+    live.recommend(['skill 10'])
+    assert live._changes_since_fit == 0
+    assert live.roles == [f'Role {i}' for i in range(13)]
+
+def test_fuzzy_skill_resolution():
+    """Misspelled skills resolve to canonical ones; unrelated or short ones don't"""
+    assert recommender.resolve_skill('kubernets') == 'kubernetes'
+    assert recommender.resolve_skill('Tensor-flow') == 'tensorflow'
+    assert recommender.resolve_skill('postgres sql') == 'postgresql'
+    assert recommender.resolve_skill('machne learning') == 'machine learning'
+    assert recommender.resolve_skill('Underwater Basket Weaving') == 'underwater basket weaving'
+    assert recommender.resolve_skill('jav') == 'jav'
+    # Exact synonyms never go through the fuzzy path
+    assert recommender.resolve_skill('JS') == 'javascript'
+    
+    typo = recommender.recommend(['dockr', 'kubernets', 'terraform'], top_n=1)[0]
+    exact = recommender.recommend(['docker', 'kubernetes', 'terraform'], top_n=1)[0]
+    assert typo == exact
@@ -0,0 +1,104 @@
+import threading
+import time
+from prediction_cache import PredictionCache
+from predictor import CareerPredictor
+from shared_cache import SQLiteBackend, SharedPredictionCache, WriteBehind, create_cache, storage_key
+
+PROFILES = [
+    ('Computer Science', ['Python', 'Docker', 'Kubernetes'], 4),
+    ('Data Science', ['SQL', 'Tableau'], 0),
+    ('Business', ['Agile', 'Scrum'], 9)
+]
+
+def worker_cache(path, **kwargs):
+    """A cache as one worker process would open it: its own backend over the shared file"""
+    backend = SQLiteBackend(str(path), **kwargs)
+    backend.writer = WriteBehind(backend)
+    cache = SharedPredictionCache(backend, max_size=16, ttl=60)
+    cache.set_version('v1')
+    return cache
+
+def test_entries_are_shared_between_workers(tmp_path):
+    """A prediction stored by one worker is a hit for another with the same artifacts"""
+    first = CareerPredictor(cache=worker_cache(tmp_path / 'cache.db'))
+    second = CareerPredictor(cache=worker_cache(tmp_path / 'cache.db'))
+    uncached = CareerPredictor(cache=PredictionCache(max_size=0))
+    expected = [first.predict(*profile) for profile in PROFILES]
+    first.cache.backend.writer.flush()
+
+    for profile, result in zip(PROFILES, expected):
+        degree, skills, experience = profile
+        shared = second.predict(degree, list(reversed(skills)), experience)
+        assert shared == result == uncached.predict(*profile)
+    assert second.cache.stats()['shared']['hits'] == len(PROFILES)
+
+    # Another catalog or model version never sees these entries
+    second.cache.set_version('v2')
+    assert second.cache.get(second.cache_key('Business', ['agile', 'scrum'], 9)) is None
+
+def test_size_eviction_drops_least_recently_used(tmp_path):
+    """Trimming keeps entries that were read recently, in any worker"""
+    cache = worker_cache(tmp_path / 'cache.db', max_bytes=4000)
+    keys = [('degree', frozenset([f'skill {i}']), i, 'tfidf') for i in range(20)]
+    for key in keys:
+        cache.put(key, {'padding': 'x' * 400})
+    cache.backend.writer.flush()
+    time.sleep(0.01)
+
+    cache.local.clear()
+    assert cache.get(keys[0]) is not None
+    cache.backend.writer.flush()
+    assert cache.backend.trim() > 0
+    assert cache.backend.stats()['bytes'] <= 4000 * 0.9
+
+    cache.local.clear()
+    assert cache.get(keys[0]) is not None
+    assert cache.get(keys[1]) is None
+
+def test_concurrent_misses_compute_once(tmp_path):
+    """Identical misses in several threads of several workers run the computation once"""
+    caches = [worker_cache(tmp_path / 'cache.db') for _ in range(3)]
+    key = ('Computer Science', frozenset(['python']), 2, 'tfidf')
+    calls = []
+    results = []
+
+    def compute():
+        calls.append(1)
+        time.sleep(0.2)
+        return {'role': 'Data Scientist'}
+
+    def request(cache):
+        results.append(cache.get(key) or cache.compute(key, compute))
+
+    threads = [threading.Thread(target=request, args=(cache,)) for cache in caches for _ in range(3)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(calls) == 1
+    assert results == [{'role': 'Data Scientist'}] * 9
+    assert sum(cache.stats()['shared']['leaseWaits'] for cache in caches) == 2
+
+def test_corrupt_entries_are_recomputed(tmp_path):
+    """An entry that does not decode is a counted miss, deleted, and recomputed by the next prediction"""
+    predictor = CareerPredictor(cache=worker_cache(tmp_path / 'cache.db'))
+    cache = predictor.cache
+    degree, skills, experience = PROFILES[0]
+    key = predictor.cache_key(degree, predictor.recommender.prepare_user_skills(skills), experience)
+    shared_key = storage_key(cache.version, key)
+    cache.backend.write([(shared_key, b'{"prediction": {"careerRo', time.time() + 60)])
+
+    assert cache.get(key) is None
+    assert cache.backend.get(shared_key) is None
+    assert cache.stats()['shared']['errors'] == 1
+    assert cache.stats()['shared']['misses'] == 1
+
+    result = predictor.predict(degree, skills, experience)
+    cache.backend.writer.flush()
+    cache.local.clear()
+    assert cache.get(key)['prediction'] == result['prediction']
+
+def test_unusable_backend_falls_back_to_local(tmp_path):
+    assert isinstance(create_cache('memcached://localhost'), PredictionCache)
+    assert isinstance(create_cache(''), PredictionCache)
+    assert isinstance(create_cache(f'sqlite:///{tmp_path}/cache.db'), SharedPredictionCache)
@@ -0,0 +1,65 @@
+import joblib
+import numpy as np
+import pytest
+from forest import FOREST_DIRNAME, ForestArrays
+from prediction_cache import PredictionCache
+from predictor import CareerPredictor
+from train_model import (
+    PAIRS, ROLES, SKILLS, chunk_features, generate_chunk, generate_dataset,
+    load_chunk, make_estimator, save_artifacts, train_incremental
+)
+
+def test_generated_chunks_follow_the_sampling_rules():
+    """Every role is present and skill counts follow the experience rule"""
+    chunk = generate_chunk(np.random.SeedSequence(1), 2000)
+    assert set(chunk['role']) == set(range(len(ROLES)))
+    assert chunk['skills'].shape == (2000, len(SKILLS))
+    assert chunk['experience'].min() >= 0 and chunk['experience'].max() <= 10
+    
+    # Base skills picked plus at most two generic ones
+    counts = chunk['skills'].sum(axis=1)
+    base_lengths = np.array([len(skills) for _, _, skills in PAIRS])
+    assert (counts >= np.minimum(3, base_lengths.min())).all()
+    assert (counts <= base_lengths.max() + 2).all()
+    
+    again = generate_chunk(np.random.SeedSequence(1), 2000)
+    assert all(np.array_equal(chunk[name], again[name]) for name in chunk)
+
+def test_dataset_does_not_depend_on_worker_count(tmp_path):
+    serial, serial_validation = generate_dataset(str(tmp_path / 'serial'), 3000, 1000, workers=1)
+    parallel, parallel_validation = generate_dataset(str(tmp_path / 'parallel'), 3000, 1000, workers=2)
+    assert len(serial) == 3
+    for a, b in zip(serial + [serial_validation], parallel + [parallel_validation]):
+        first, second = load_chunk(a), load_chunk(b)
+        assert all(np.array_equal(first[name], second[name]) for name in first)
+
+@pytest.mark.parametrize('estimator', ['rf', 'sgd'])
+def test_incremental_training(tmp_path, estimator):
+    """Both estimators learn chunk by chunk and separate the roles"""
+    paths, validation_path = generate_dataset(str(tmp_path), 3000, 1000, workers=1)
+    model, skill_counts = train_incremental(make_estimator(estimator, 5), paths, 5)
+    if estimator == 'rf':
+        assert len(model.estimators_) == 15
+    assert skill_counts.sum() > 0
+    
+    validation = load_chunk(validation_path)
+    assert model.score(chunk_features(validation), validation['role']) > 0.8
+
+def test_forest_export_never_outlives_its_model(tmp_path):
+    """A model saved after a forest is served, not the forest's stale export"""
+    paths, _ = generate_dataset(str(tmp_path / 'data'), 3000, 1000, workers=1)
+    forest, skill_counts = train_incremental(make_estimator('rf', 5), paths, 5)
+    linear, _ = train_incremental(make_estimator('sgd', 5), paths, 5)
+    model_dir = tmp_path / 'models'
+    model_dir.mkdir()
+    save_artifacts(str(model_dir), forest, skill_counts)
+    assert isinstance(CareerPredictor(model_path=str(model_dir), cache=PredictionCache(max_size=0)).model, ForestArrays)
+    
+    # A pickle replaced without re-exporting no longer matches the export
+    joblib.dump(linear, model_dir / 'career_model.pkl')
+    assert ForestArrays.load(str(model_dir)) is None
+    
+    save_artifacts(str(model_dir), linear, skill_counts)
+    assert not (model_dir / FOREST_DIRNAME).exists()
+    predictor = CareerPredictor(model_path=str(model_dir), cache=PredictionCache(max_size=0))
+    assert type(predictor.model).__name__ == 'SGDClassifier'
@@ -1,93 +1,745 @@
+import threading
 import numpy as np
-from sklearn.feature_extraction.text import TfidfVectorizer
-from sklearn.metrics.pairwise import cosine_similarity
+from scipy import sparse
 from data_constants import EXTENDED_SKILL_MAPPING, SKILL_SYNONYMS
+from skill_index import SKILL_INDEX, FuzzySkillMatcher
+from recommender_index import MATRIX_DTYPE, catalog_checksum, load_index, save_index
 
-def dummy_tokenizer(doc):
-    """Dummy tokenizer that just returns the input list of tokens"""
-    return doc
+# Users scored per sparse product in recommend_many; bounds the dense
+# similarity block at chunk_size x number of roles
+BATCH_CHUNK_SIZE = 512
 
-class TfidfRecommender:
-    def __init__(self):
-        # We pass a list of tokens directly, so we use dummy functions
-        self.vectorizer = TfidfVectorizer(
-            analyzer='word',
-            tokenizer=dummy_tokenizer,
-            preprocessor=dummy_tokenizer,
-            token_pattern=None
-        )
+# Slack when comparing pruning bounds against partial scores, so float32
+# rounding can only make pruning more conservative, never drop a role
+PRUNING_TOLERANCE = 1e-6
+
+# Best single-skill additions that what_if also combines into pairs
+WHAT_IF_PAIR_CANDIDATES = 8
+
+# Fraction of the fitted catalog that may change through incremental
+# updates before the next query triggers a full refit
+DRIFT_THRESHOLD = 0.1
+
+def smooth_idf(df, n_documents):
+    """Smoothed idf, as TfidfVectorizer computes it: ln((1 + n) / (1 + df)) + 1"""
+    return np.log((1 + n_documents) / (1 + np.asarray(df, dtype=np.float64))) + 1
+
+def _weighted_rows(indices, indptr, idf, n_terms):
+    """CSR matrix of idf-weighted, L2-normalized binary rows, stored as MATRIX_DTYPE"""
+    data = idf[indices]
+    lengths = np.diff(indptr)
+    norms = np.sqrt(np.add.reduceat(data ** 2, indptr[:-1][lengths > 0])) if len(data) else np.empty(0)
+    row_norms = np.ones(len(lengths))
+    row_norms[lengths > 0] = norms
+    data /= np.repeat(row_norms, lengths)
+    matrix = sparse.csr_matrix((data.astype(MATRIX_DTYPE), indices, indptr), shape=(len(lengths), n_terms))
+    matrix.sort_indices()
+    return matrix
+
+def top_k_indices(scores, k):
+    """
+    Row-wise top-k column indices of a dense score matrix, ordered by
+    descending score with ties broken by the lower column index.
+    Uses a partial partition per row instead of a full sort.
+    """
+    n_rows, n_cols = scores.shape
+    k = min(k, n_cols)
+    if k == 0:
+        return np.empty((n_rows, 0), dtype=np.intp)
+    
+    # k-th largest value of each row
+    kth = -np.partition(-scores, k - 1, axis=1)[:, k - 1:k]
+    above = scores > kth
+    tied = scores == kth
+    
+    # Fill the remaining slots with the lowest-index ties
+    needed = k - above.sum(axis=1, keepdims=True)
+    selected = above | (tied & (np.cumsum(tied, axis=1) <= needed))
+    candidates = np.nonzero(selected)[1].reshape(n_rows, k)
+    
+    # Order the k candidates; stable sort keeps lower indices first on ties
+    candidate_scores = np.take_along_axis(scores, candidates, axis=1)
+    order = np.argsort(-candidate_scores, axis=1, kind='stable')
+    return np.take_along_axis(candidates, order, axis=1)
+
+class RecommenderState:
+    """
+    One fitted catalog: roles, vocabulary, idf, the role matrix and the
+    lookup structures derived from them. A state is never modified once
+    built; catalog changes build a new one and publish it with a single
+    reference swap, so a reader that takes one state per call never mixes
+    old and new catalog data.
+    """
+
+    def __init__(self, roles, role_skills_list, vocabulary, idf, tfidf_matrix, postings=None, df=None, revision=0):
+        self.roles = roles
+        self.role_skills_list = role_skills_list
+        self.vocabulary = vocabulary
+        self.idf = idf
+        self.tfidf_matrix = tfidf_matrix
+        self.revision = revision
+        if df is None:
+            df = np.bincount(tfidf_matrix.indices, minlength=len(vocabulary))
+        self.df = df
+        self.role_positions = {role: i for i, role in enumerate(roles)}
+        self.role_skill_sets = [set(skills) for skills in role_skills_list]
+        self._build_postings(postings)
+        self._build_fuzzy_matcher()
+        self.feature_names = self._feature_names()
+
+    def _build_postings(self, postings=None):
+        """Build (or adopt a loaded) skill -> roles inverted index and per-skill weight upper bounds"""
+        # Column j of the CSC matrix is the postings list of skill j
+        if postings is None:
+            postings = self.tfidf_matrix.tocsc()
+            postings.sort_indices()
+        self.postings = postings
+        if self.postings.nnz:
+            self.max_term_weight = self.postings.max(axis=0).toarray().ravel()
+        else:
+            self.max_term_weight = np.zeros(self.postings.shape[1])
+
+    def _build_fuzzy_matcher(self):
+        """Trigram index over every synonym and catalog skill"""
+        targets = dict(SKILL_INDEX.canonical)
+        for term in self.vocabulary:
+            targets.setdefault(term, term)
+        self.fuzzy = FuzzySkillMatcher(targets)
+
+    def _feature_names(self):
+        """Skill terms ordered by column"""
+        names = [None] * len(self.vocabulary)
+        for term, column in self.vocabulary.items():
+            names[column] = term
+        return np.array(names, dtype=object)
+
+    def transform(self, skill_lists):
+        """
+        TF-IDF vectors for lists of normalized skills: binary term counts
+        weighted by idf and L2-normalized, as TfidfVectorizer would produce.
+        Skills outside the vocabulary are ignored.
+        """
+        indices = []
+        lengths = []
+        for skills in skill_lists:
+            columns = [self.vocabulary[skill] for skill in skills if skill in self.vocabulary]
+            indices.extend(columns)
+            lengths.append(len(columns))
+        indptr = np.concatenate(([0], np.cumsum(lengths, dtype=np.int64))).astype(np.int32)
+        return _weighted_rows(np.array(indices, dtype=np.int32), indptr, self.idf, len(self.vocabulary))
+
+    def build_result(self, idx, score, unique_user_skills):
+        """Format a single recommendation entry"""
+        match_percentage = min(max(int(score * 100), 10), 99) # ensure reasonable bounds
         
-        self.roles = list(EXTENDED_SKILL_MAPPING.keys())
-        self.role_skills_list = []
+        # Boost exact match if score is perfectly 1.0
+        if score > 0.99:
+            match_percentage = 100
+            
+        role_skills = self.role_skill_sets[idx]
+        return {
+            'role': self.roles[idx],
+            'matchScore': match_percentage,
+            'similarity_score': float(score),
+            'matched_skills_count': sum(1 for s in unique_user_skills if s in role_skills),
+            'total_required_skills': len(self.role_skills_list[idx])
+        }
+
+def _state_field(name):
+    """Read-only attribute forwarding to the published state"""
+    return property(lambda self: getattr(self._state, name), doc=f"{name} of the published state")
+
+class TfidfRecommender:
+    # Catalog data of the published state. These do not apply pending
+    # changes, and a reader needing several of them should take one
+    # snapshot() instead, so all come from the same state.
+    roles = _state_field('roles')
+    role_skills_list = _state_field('role_skills_list')
+    role_positions = _state_field('role_positions')
+    role_skill_sets = _state_field('role_skill_sets')
+    vocabulary = _state_field('vocabulary')
+    feature_names = _state_field('feature_names')
+    idf = _state_field('idf')
+    df = _state_field('df')
+    tfidf_matrix = _state_field('tfidf_matrix')
+    postings = _state_field('postings')
+    max_term_weight = _state_field('max_term_weight')
+    fuzzy = _state_field('fuzzy')
+
+    def __init__(self, skill_mapping=None, index_path=None, drift_threshold=DRIFT_THRESHOLD):
+        if skill_mapping is None:
+            skill_mapping = EXTENDED_SKILL_MAPPING
+        self.checksum = catalog_checksum(skill_mapping, SKILL_SYNONYMS)
+        self.drift_threshold = drift_threshold
+        self.revision = 0
+        # Taken by writers only; readers work on one published state
+        self._lock = threading.RLock()
         
-        # Preprocess dataset
-        for role in self.roles:
-            skills = EXTENDED_SKILL_MAPPING[role]
-            # Normalize skills to canonical form
-            normalized_skills = [self.normalize_skill(s) for s in skills]
-            # Remove duplicates while preserving order (optional, but good for tfidf)
-            unique_skills = list(dict.fromkeys(normalized_skills))
-            self.role_skills_list.append(unique_skills)
+        # Prefer the prebuilt index; fall back to fitting if it is missing or stale
+        index = load_index(index_path, self.checksum)
+        if index is not None:
+            self._publish(self._load(index))
+        else:
+            self._publish(self._fit(list(skill_mapping.keys()), list(skill_mapping.values())))
+            if index_path:
+                try:
+                    self.save_index(index_path)
+                    print(f"SUCCESS: Rebuilt recommender index at {index_path}")
+                except OSError as e:
+                    print(f"WARNING: Could not write recommender index - {e}")
+
+    def _fit(self, roles, skill_lists):
+        """
+        Fit TF-IDF weights on a role catalog with numpy alone, giving what
+        TfidfVectorizer fits on the skill lists: sorted vocabulary, smoothed
+        idf and L2-normalized rows. Keeping scikit-learn out of this module
+        keeps it out of the service's imports.
+        """
+        # Preprocess dataset: normalize skills to canonical form and remove
+        # duplicates while preserving order
+        role_skills_list = [self._prepare_role_skills(skills) for skills in skill_lists]
             
-        # Fit vectorizer on the dataset
-        self.tfidf_matrix = self.vectorizer.fit_transform(self.role_skills_list)
-        self.feature_names = self.vectorizer.get_feature_names_out()
+        terms = sorted({skill for skills in role_skills_list for skill in skills})
+        vocabulary = {term: i for i, term in enumerate(terms)}
+        indices = np.array(
+            [vocabulary[skill] for skills in role_skills_list for skill in skills], dtype=np.int32
+        )
+        lengths = [len(skills) for skills in role_skills_list]
+        indptr = np.concatenate(([0], np.cumsum(lengths, dtype=np.int64))).astype(np.int32)
+        idf = smooth_idf(np.bincount(indices, minlength=len(terms)), len(roles))
+        tfidf_matrix = _weighted_rows(indices, indptr, idf, len(terms))
+        return RecommenderState(list(roles), role_skills_list, vocabulary, idf, tfidf_matrix, revision=self.revision)
+
+    def _load(self, index):
+        """
+        Restore a fitted state from a prebuilt index without refitting. The
+        role matrix stays memory-mapped; incremental updates build new
+        arrays instead of writing to it.
+        """
+        return RecommenderState(
+            index['roles'],
+            index['role_skills_list'],
+            {term: i for i, term in enumerate(index['vocabulary'])},
+            np.array(index['idf'], dtype=np.float64),
+            index['tfidf_matrix'],
+            postings=index['postings'],
+            revision=self.revision
+        )
+
+    def _publish(self, state):
+        """Make a full fit the current state and reset incremental-update bookkeeping"""
+        self._state = state
+        # Writer-side document frequencies, including columns of skills
+        # that pending changes add after the published vocabulary
+        self._df = state.df.copy()
+        self._new_terms = {}
+        self._fitted_roles = len(state.roles)
+        self._changes_since_fit = 0
+        self._pending = {}
+        self._dirty_terms = set()
+
+    def snapshot(self):
+        """
+        The current state with pending changes applied. Readers take one
+        per call and read everything from it.
+        """
+        return self._refresh()
+
+    def transform(self, skill_lists):
+        """TF-IDF vectors for lists of normalized skills (see RecommenderState.transform)"""
+        return self._state.transform(skill_lists)
+
+    def save_index(self, path):
+        """Serialize the fitted state so workers can load it instead of refitting"""
+        state = self._refresh()
+        checksum = self.checksum
+        if state.revision:
+            # Incrementally updated state no longer matches the catalog it was
+            # built from; tie it to the roles it actually holds
+            checksum = catalog_checksum(dict(zip(state.roles, state.role_skills_list)), SKILL_SYNONYMS)
+        save_index(
+            path,
+            checksum,
+            state.roles,
+            state.role_skills_list,
+            state.feature_names.tolist(),
+            state.idf,
+            state.tfidf_matrix,
+            state.postings
+        )
+
+    def add_role(self, role, skills):
+        """Add a role, or replace the skills of an existing one"""
+        skills = self._prepare_role_skills(skills)
+        with self._lock:
+            old_columns = self._role_columns(role)
+            new_columns = self._term_columns(skills)
+            self._adjust_document_frequency(old_columns, new_columns)
+            self._pending[role] = (skills, new_columns)
+            self._changes_since_fit += 1
+            self.revision += 1
+
+    update_role = add_role
+
+    def remove_role(self, role):
+        """Remove a role; returns False if it is not in the catalog"""
+        with self._lock:
+            old_columns = self._role_columns(role)
+            if old_columns is None:
+                return False
+            self._adjust_document_frequency(old_columns, None)
+            self._pending[role] = None
+            self._changes_since_fit += 1
+            self.revision += 1
+            return True
+
+    def rebuild(self):
+        """Refit from scratch on the current catalog, applying pending changes"""
+        with self._lock:
+            roles, skill_lists = self._merged_catalog()
+            self._publish(self._fit(roles, skill_lists))
+
+    def _role_columns(self, role):
+        """Current term columns of a role, including pending changes, or None"""
+        if role in self._pending:
+            pending = self._pending[role]
+            return None if pending is None else pending[1]
+        state = self._state
+        idx = state.role_positions.get(role)
+        if idx is None:
+            return None
+        indptr = state.tfidf_matrix.indptr
+        return state.tfidf_matrix.indices[indptr[idx]:indptr[idx + 1]]
+
+    def _term_columns(self, skills):
+        """
+        Column ids for normalized skills. Skills the published vocabulary
+        lacks get the next free columns, and join the vocabulary when the
+        pending changes are applied.
+        """
+        state = self._state
+        columns = []
+        for skill in skills:
+            column = state.vocabulary.get(skill)
+            if column is None:
+                column = self._new_terms.setdefault(skill, len(state.vocabulary) + len(self._new_terms))
+            columns.append(column)
+        missing = len(state.vocabulary) + len(self._new_terms) - len(self._df)
+        if missing > 0:
+            self._df = np.concatenate((self._df, np.zeros(missing, dtype=self._df.dtype)))
+        return np.array(columns, dtype=state.tfidf_matrix.indices.dtype)
+
+    def _adjust_document_frequency(self, old_columns, new_columns):
+        """Update document frequencies and remember which idf values went stale"""
+        if old_columns is not None:
+            self._df[old_columns] -= 1
+            self._dirty_terms.update(old_columns.tolist())
+        if new_columns is not None:
+            self._df[new_columns] += 1
+            self._dirty_terms.update(new_columns.tolist())
+
+    def _merged_catalog(self):
+        """Roles and skill lists with pending changes applied, in catalog order"""
+        state = self._state
+        roles = []
+        skill_lists = []
+        for role, skills in zip(state.roles, state.role_skills_list):
+            if role in self._pending:
+                if self._pending[role] is None:
+                    continue
+                skills = self._pending[role][0]
+            roles.append(role)
+            skill_lists.append(skills)
+        for role, pending in self._pending.items():
+            if pending is not None and role not in state.role_positions:
+                roles.append(role)
+                skill_lists.append(pending[0])
+        return roles, skill_lists
+
+    def _refresh(self):
+        """
+        Apply pending catalog changes before serving queries and return the
+        state to read from. Role rows are spliced into a copy of the
+        current matrix, only idf values whose document frequency changed
+        are recomputed, and rows are re-weighted in one vectorized pass; the
+        result is published as a new state. Once changes since the last
+        full fit exceed the drift threshold (as a fraction of the roles
+        fitted then), the whole index is refit so every idf reflects the
+        current catalog size.
+        """
+        if not self._pending:
+            return self._state
+        with self._lock:
+            if not self._pending:
+                return self._state
+            if self._changes_since_fit > self.drift_threshold * max(self._fitted_roles, 1):
+                self.rebuild()
+                return self._state
+            
+            state = self._state
+            matrix = state.tfidf_matrix
+            n_old = len(state.roles)
+            lengths = np.diff(matrix.indptr)
+            replaced = np.zeros(n_old, dtype=bool)
+            for role in self._pending:
+                idx = state.role_positions.get(role)
+                if idx is not None:
+                    replaced[idx] = True
+            
+            # Drop entries of removed/updated rows, then splice updated rows
+            # back at their old position and append new roles at the end
+            entry_rows = np.repeat(np.arange(n_old), lengths)
+            indices = matrix.indices[~replaced[entry_rows]]
+            kept_lengths = np.where(replaced, 0, lengths)
+            kept_offsets = np.concatenate(([0], np.cumsum(kept_lengths)))
+            
+            # Rows go back in row order, not the order they were changed in:
+            # np.insert keeps values for the same or later positions in the
+            # order given, so an unsorted splice shifts entries between
+            # neighbouring rows
+            updated = sorted(
+                (state.role_positions[role], pending[1]) for role, pending in self._pending.items()
+                if pending is not None and role in state.role_positions
+            )
+            insert_at = []
+            insert_columns = []
+            for idx, columns in updated:
+                kept_lengths[idx] = len(columns)
+                insert_at.append(np.full(len(columns), kept_offsets[idx]))
+                insert_columns.append(columns)
+            if insert_columns:
+                indices = np.insert(indices, np.concatenate(insert_at), np.concatenate(insert_columns))
+            
+            removed = np.array([
+                role in self._pending and self._pending[role] is None for role in state.roles
+            ], dtype=bool)
+            roles, skill_lists = self._merged_catalog()
+            appended = [self._pending[role][1] for role in roles[n_old - removed.sum():]]
+            row_lengths = np.concatenate((
+                kept_lengths[~removed],
+                np.array([len(columns) for columns in appended], dtype=lengths.dtype)
+            ))
+            if appended:
+                indices = np.concatenate([indices] + appended)
+            
+            # New skills join the vocabulary; recompute only the idf values
+            # whose document frequency changed
+            vocabulary = dict(state.vocabulary)
+            vocabulary.update(self._new_terms)
+            idf = np.concatenate((state.idf, np.ones(len(self._new_terms))))
+            dirty = np.fromiter(self._dirty_terms, dtype=np.intp, count=len(self._dirty_terms))
+            idf[dirty] = smooth_idf(self._df[dirty], len(roles))
+
+            # Skills no role uses any more leave the vocabulary, as a refit
+            # would drop them; kept, they would weigh user vectors with the
+            # highest idf and stay fuzzy-match targets
+            used = self._df > 0
+            if not used.all():
+                new_columns = (np.cumsum(used) - 1).astype(indices.dtype)
+                indices = new_columns[indices]
+                vocabulary = {term: int(new_columns[column]) for term, column in vocabulary.items() if used[column]}
+                idf = idf[used]
+                self._df = self._df[used]
+
+            indptr = np.concatenate(([0], np.cumsum(row_lengths))).astype(matrix.indptr.dtype)
+            self._state = RecommenderState(
+                roles,
+                skill_lists,
+                vocabulary,
+                idf,
+                _weighted_rows(indices, indptr, idf, len(vocabulary)),
+                df=self._df.copy(),
+                revision=self.revision
+            )
+            self._new_terms = {}
+            self._pending = {}
+            self._dirty_terms = set()
+            return self._state
 
     def normalize_skill(self, skill):
         """Normalize a skill using synonyms to handle variations."""
-        skill_lower = skill.lower().strip()
-        
-        if skill_lower in SKILL_SYNONYMS:
-            return skill_lower
-            
-        for canonical, synonyms in SKILL_SYNONYMS.items():
-            if skill_lower in synonyms:
-                return canonical
-                
-        return skill_lower
+        return SKILL_INDEX.normalize(skill)
         
+    def resolve_skill(self, skill, state=None):
+        """
+        Normalize a free-text user skill. Exact synonyms and known catalog
+        skills are returned as-is; anything else is corrected to the closest
+        canonical skill when a fuzzy match is confident enough.
+        """
+        if state is None:
+            state = self._state
+        normalized = SKILL_INDEX.normalize(skill)
+        if normalized in state.vocabulary or normalized in SKILL_INDEX:
+            return normalized
+        return state.fuzzy.resolve(normalized) or normalized
+
+    def resolve_user_skills(self, user_skills):
+        """resolve_skill for every user skill, aligned with them"""
+        # Pending catalog changes may add vocabulary the resolver should see
+        state = self._refresh()
+        return [self.resolve_skill(s, state) for s in user_skills]
+
+    def prepare_user_skills(self, user_skills):
+        """Resolve user skills and drop duplicates, preserving order"""
+        return list(dict.fromkeys(self.resolve_user_skills(user_skills)))
+
+    def _prepare_role_skills(self, skills):
+        """Normalize catalog skills (exact synonyms only) and drop duplicates"""
+        return list(dict.fromkeys(self.normalize_skill(s) for s in skills))
+
     def recommend(self, user_skills, top_n=3):
         """Recommend careers based on user skills using TF-IDF and Cosine Similarity."""
-        if not user_skills:
+        if not user_skills or top_n <= 0:
+            return []
+        return self.recommend_prepared(self.prepare_user_skills(user_skills), top_n)
+
+    def recommend_prepared(self, unique_user_skills, top_n=3):
+        """recommend() for skills already passed through prepare_user_skills"""
+        if not unique_user_skills or top_n <= 0:
             return []
             
-        # Preprocess user skills
-        normalized_user_skills = [self.normalize_skill(s) for s in user_skills]
-        # Remove duplicates
-        unique_user_skills = list(dict.fromkeys(normalized_user_skills))
+        state = self._refresh()
+        user_vector = state.transform([unique_user_skills])
+        top_indices, scores = self._search(state, user_vector, top_n)
         
-        # Vectorize user skills
-        user_vector = self.vectorizer.transform([unique_user_skills])
+        return [
+            state.build_result(idx, score, unique_user_skills)
+            for idx, score in zip(top_indices, scores)
+        ]
+
+    def _search(self, state, user_vector, k):
+        """
+        Top-k roles for one user vector using the inverted index. Only roles
+        sharing at least one skill with the user are scored, and skills are
+        visited in decreasing order of their maximum possible contribution:
+        once the contribution left can no longer lift an unseen role to the
+        current k-th best score, no new candidates are admitted (max-score /
+        WAND-style pruning). Candidate scores are accumulated in the same
+        order as the sparse product in recommend_many, so results match the
+        exhaustive path exactly.
+        """
+        n_roles = len(state.roles)
+        k = min(k, n_roles)
+        terms = user_vector.indices
+        weights = user_vector.data
+        indptr = state.postings.indptr
+        posting_roles = state.postings.indices
+        posting_weights = state.postings.data
+        
+        is_candidate = np.zeros(n_roles, dtype=bool)
+        candidates = np.empty(0, dtype=np.intp)
+        essential = np.zeros(len(terms), dtype=bool)
+        if len(terms):
+            bounds = weights * state.max_term_weight[terms]
+            order = np.argsort(-bounds, kind='stable')
+            # remaining[i] bounds what terms order[i:] can add to any role
+            remaining = np.cumsum(bounds[order][::-1])[::-1]
+            
+            partial = np.zeros(n_roles)
+            admitted = []
+            for i, pos in enumerate(order):
+                term = terms[pos]
+                roles = posting_roles[indptr[term]:indptr[term + 1]]
+                partial[roles] += weights[pos] * posting_weights[indptr[term]:indptr[term + 1]]
+                new_roles = roles[~is_candidate[roles]]
+                is_candidate[new_roles] = True
+                admitted.append(new_roles)
+                essential[pos] = True
+                
+                if i + 1 == len(order):
+                    break
+                candidates = np.concatenate(admitted)
+                admitted = [candidates]
+                if len(candidates) < k:
+                    continue
+                candidate_partial = partial[candidates]
+                threshold = np.partition(candidate_partial, len(candidates) - k)[len(candidates) - k]
+                if remaining[i + 1] < threshold - PRUNING_TOLERANCE:
+                    break
+            candidates = np.sort(np.concatenate(admitted))
         
-        # Compute cosine similarity
-        similarities = cosine_similarity(user_vector, self.tfidf_matrix)[0]
+        # Exact candidate scores, accumulated skill by skill in the user
+        # vector's own order and precision like the exhaustive sparse product
+        scores = np.zeros(n_roles, dtype=MATRIX_DTYPE)
+        for pos, term in enumerate(terms):
+            roles = posting_roles[indptr[term]:indptr[term + 1]]
+            contributions = weights[pos] * posting_weights[indptr[term]:indptr[term + 1]]
+            if not essential[pos]:
+                keep = is_candidate[roles]
+                roles = roles[keep]
+                contributions = contributions[keep]
+            scores[roles] += contributions
         
-        # Rank the results
-        top_indices = np.argsort(similarities)[::-1][:top_n]
+        top_indices = np.empty(0, dtype=np.intp)
+        if len(candidates):
+            top = top_k_indices(scores[candidates][np.newaxis, :], k)[0]
+            top_indices = candidates[top]
         
-        results = []
-        for idx in top_indices:
-            score = similarities[idx]
-            match_percentage = min(max(int(score * 100), 10), 99) # ensure reasonable bounds
+        # Fewer candidates than k means every skill was visited, so all other
+        # roles score exactly 0; fill with the lowest-index ones
+        if len(top_indices) < k:
+            fill = np.flatnonzero(~is_candidate)[:k - len(top_indices)]
+            top_indices = np.concatenate((top_indices, fill))
+        
+        return top_indices, scores[top_indices]
+
+    def recommend_many(self, skills_batch, top_n=3, chunk_size=BATCH_CHUNK_SIZE, prepared=False):
+        """
+        Recommend careers for many users with one sparse product per chunk of
+        users. Scores every role, so it doubles as the exhaustive reference
+        for recommend. Pass prepared=True if skills_batch already went
+        through prepare_user_skills.
+        """
+        results = [[] for _ in skills_batch]
+        
+        # Preprocess user skills, skipping users without any
+        rows = []
+        user_skill_lists = []
+        for i, user_skills in enumerate(skills_batch):
+            if not user_skills:
+                continue
+            rows.append(i)
+            user_skill_lists.append(user_skills if prepared else self.prepare_user_skills(user_skills))
+        
+        if not rows or top_n <= 0:
+            return results
+        
+        state = self._refresh()
+        
+        # Vectorize all users at once; rows of both matrices are L2-normalized,
+        # so the sparse product is the cosine similarity. The transposed
+        # postings are the role matrix in CSR form, so nothing is converted.
+        user_matrix = state.transform(user_skill_lists)
+        role_columns = state.postings.T
+        
+        for start in range(0, len(rows), chunk_size):
+            stop = start + chunk_size
+            similarities = (user_matrix[start:stop] @ role_columns).toarray()
+            top_indices = top_k_indices(similarities, top_n)
             
-            # Boost exact match if score is perfectly 1.0
-            if score > 0.99:
-                match_percentage = 100
-                
-            results.append({
-                'role': self.roles[idx],
-                'matchScore': match_percentage,
-                'similarity_score': float(score),
-                'matched_skills_count': sum(1 for s in unique_user_skills if s in self.role_skills_list[idx]),
-                'total_required_skills': len(self.role_skills_list[idx])
-            })
+            for offset, indices in enumerate(top_indices):
+                unique_user_skills = user_skill_lists[start + offset]
+                row_similarities = similarities[offset]
+                results[rows[start + offset]] = [
+                    state.build_result(idx, row_similarities[idx], unique_user_skills)
+                    for idx in indices
+                ]
             
         return results
 
+    def what_if(self, unique_user_skills, top_n=3, pairs=False):
+        """
+        Effect of adding each skill the user lacks from their top_n roles,
+        for all roles at once. With w the idf weights of the user's skills,
+        a role's score is (row . w) / |w|; adding skill c only adds
+        idf[c] * row[c] to the dot product and idf[c]^2 to |w|^2, so every
+        candidate is a rank-1 update of the same role dot products instead
+        of a new transform and search. With pairs=True the
+        WHAT_IF_PAIR_CANDIDATES best single skills are also tried two at a
+        time. Returns the current top_n as build_result entries and the
+        single-skill additions ('additions', and 'pairs' if asked), best
+        first, each with the skills added, the new best role and the score
+        change of each current top role.
+        """
+        state = self._refresh()
+        user_columns = [state.vocabulary[s] for s in unique_user_skills if s in state.vocabulary]
+        user_idf = state.idf[user_columns]
+        norm_sq = float(user_idf @ user_idf)
+        dots = state.postings[:, user_columns] @ user_idf
+        scores = dots / np.sqrt(norm_sq) if norm_sq else np.zeros(len(state.roles))
+        current = top_k_indices(scores[np.newaxis, :], top_n)[0]
+
+        owned = set(unique_user_skills)
+        candidates = list(dict.fromkeys(
+            skill for idx in current for skill in state.role_skills_list[idx]
+            if skill not in owned and skill in state.vocabulary
+        ))
+        additions = [[skill] for skill in candidates]
+        columns = np.array([state.vocabulary[skill] for skill in candidates], dtype=np.intp)
+        candidate_idf = state.idf[columns]
+        # Row i: what adding candidate i contributes to every role's dot product
+        added = state.postings[:, columns].T.toarray() * candidate_idf[:, np.newaxis]
+        new_scores = (dots + added) / np.sqrt(norm_sq + candidate_idf ** 2)[:, np.newaxis]
+
+        result = {
+            'current': [state.build_result(idx, scores[idx], unique_user_skills) for idx in current],
+            'additions': self._rank_additions(state, unique_user_skills, additions, new_scores, scores, current)
+        }
+        if pairs:
+            best = np.argsort(-new_scores.max(axis=1), kind='stable')[:WHAT_IF_PAIR_CANDIDATES]
+            first, second = np.triu_indices(len(best), 1)
+            first, second = best[first], best[second]
+            pair_scores = (dots + added[first] + added[second]) / np.sqrt(
+                norm_sq + candidate_idf[first] ** 2 + candidate_idf[second] ** 2
+            )[:, np.newaxis]
+            pair_additions = [[candidates[i], candidates[j]] for i, j in zip(first, second)]
+            result['pairs'] = self._rank_additions(state, unique_user_skills, pair_additions, pair_scores, scores, current)
+        return result
+
+    def _rank_additions(self, state, unique_user_skills, additions, new_scores, scores, current):
+        """
+        what_if entries for skill additions and their (additions x roles)
+        scores: best resulting match first, ties to the larger gain for the
+        current top role, then to candidate order
+        """
+        if not additions:
+            return []
+        new_best = new_scores.argmax(axis=1)
+        best_scores = new_scores[np.arange(len(additions)), new_best]
+        gains = new_scores[:, current] - scores[current]
+        order = np.lexsort((-gains[:, 0], -best_scores))
+        return [
+            {
+                'skills': additions[i],
+                'top': state.build_result(new_best[i], best_scores[i], list(unique_user_skills) + additions[i]),
+                'gains': gains[i]
+            }
+            for i in order
+        ]
+
+    def similarities(self, user_skill_lists, role_indices, state=None):
+        """
+        Cosine similarity of prepared user skill lists to the given roles, as
+        a (users x roles) array. Only the requested role rows are multiplied.
+        Pass the state role_indices refer to if they came from a snapshot.
+        """
+        if state is None:
+            state = self._refresh()
+        user_matrix = state.transform(user_skill_lists)
+        return (user_matrix @ state.tfidf_matrix[role_indices].T).toarray()
+
+    def skill_weights(self, skills):
+        """
+        Weight of each normalized skill in an L2-normalized idf vector of
+        the list, aligned with it. For a catalog role's skills these are its
+        row weights. A skill outside the vocabulary gets the idf of a term
+        no role lists.
+        """
+        state = self._refresh()
+        unseen_idf = smooth_idf(0, len(state.roles))
+        idf = np.array([
+            state.idf[state.vocabulary[skill]] if skill in state.vocabulary else unseen_idf
+            for skill in skills
+        ])
+        return idf / np.linalg.norm(idf) if len(idf) else idf
+
+    def role_vectors(self):
+        """The (roles x skills) TF-IDF matrix of the current catalog, rows in self.roles order"""
+        return self._refresh().tfidf_matrix
+
+    def skill_role_counts(self):
+        """Number of catalog roles listing each normalized skill"""
+        state = self._refresh()
+        return {term: int(state.df[column]) for term, column in state.vocabulary.items()}
+
+    def build_result(self, idx, score, unique_user_skills):
+        """Format a single recommendation entry for a role of the published state"""
+        return self._state.build_result(idx, score, unique_user_skills)
+
     def get_role_skills(self, role):
         """Get the normalized required skills for a role"""
-        try:
-            idx = self.roles.index(role)
-            return self.role_skills_list[idx]
-        except ValueError:
+        state = self._refresh()
+        idx = state.role_positions.get(role)
+        if idx is None:
             return []
+        return state.role_skills_list[idx]
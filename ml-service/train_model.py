@@ -1,158 +1,319 @@
+import os
+import math
+import tempfile
+import argparse
+import multiprocessing
 import pandas as pd
 import numpy as np
 from sklearn.ensemble import RandomForestClassifier
+from sklearn.linear_model import SGDClassifier
 from sklearn.preprocessing import LabelEncoder, MultiLabelBinarizer
 import joblib
 import json
+from tfidf_recommender import TfidfRecommender
+from recommender_index import INDEX_FILENAME
+from forest import export_forest, remove_export
+from skill_embeddings import EMBEDDINGS_FILENAME, build_embeddings
+
+# Training set size and how it is split; each chunk is generated by one
+# process, written to disk and trained on without loading the others
+DEFAULT_SAMPLES = 50000
+DEFAULT_CHUNK_SIZE = 10000
+# Trees in the finished forest, spread evenly over the chunks
+TOTAL_TREES = 100
+RANDOM_SEED = 42
 
 # Career outcome dataset (synthetic but realistic)
-def create_training_data():
-    """Generate synthetic training data for career prediction"""
-    
-    data = []
-    
-    # Define career mappings
-    career_mappings = {
-        'Computer Science': {
-            'roles': ['Software Engineer', 'Data Scientist', 'ML Engineer', 'DevOps Engineer', 
-                     'Full Stack Developer', 'Backend Engineer', 'Frontend Engineer'],
-            'skills': [
-                ['Python', 'JavaScript', 'Git', 'SQL', 'Docker', 'AWS'],
-                ['Python', 'Machine Learning', 'Statistics', 'SQL', 'TensorFlow', 'Data Visualization'],
-                ['Python', 'Deep Learning', 'TensorFlow', 'PyTorch', 'MLOps', 'Kubernetes'],
-                ['Docker', 'Kubernetes', 'CI/CD', 'AWS', 'Linux', 'Git', 'Terraform'],
-                ['JavaScript', 'React', 'Node.js', 'MongoDB', 'PostgreSQL', 'Git'],
-                ['Python', 'Django', 'PostgreSQL', 'Redis', 'Docker', 'REST APIs'],
-                ['React', 'TypeScript', 'CSS', 'HTML', 'Redux', 'Webpack']
-            ]
-        },
-        'Data Science': {
-            'roles': ['Data Analyst', 'Data Engineer', 'ML Engineer', 'Research Scientist', 'BI Analyst'],
-            'skills': [
-                ['SQL', 'Python', 'Excel', 'Tableau', 'Statistics', 'Data Visualization'],
-                ['Python', 'Spark', 'SQL', 'Airflow', 'AWS', 'ETL', 'Kafka'],
-                ['Python', 'Machine Learning', 'TensorFlow', 'PyTorch', 'MLOps'],
-                ['Python', 'Research', 'Deep Learning', 'Publications', 'Statistics'],
-                ['SQL', 'Tableau', 'Power BI', 'Excel', 'Data Warehousing']
-            ]
-        },
-        'Business': {
-            'roles': ['Product Manager', 'Business Analyst', 'Consultant', 'Marketing Manager', 'Project Manager'],
-            'skills': [
-                ['Product Strategy', 'Agile', 'Stakeholder Management', 'Analytics', 'UX Design'],
-                ['SQL', 'Excel', 'Data Analysis', 'Requirements Gathering', 'Presentations'],
-                ['Strategy', 'Problem Solving', 'Communication', 'Excel', 'PowerPoint'],
-                ['Marketing Strategy', 'SEO', 'Content Marketing', 'Analytics', 'Social Media'],
-                ['Project Management', 'Agile', 'Scrum', 'Risk Management', 'Stakeholder Management']
-            ]
-        }
+CAREER_MAPPINGS = {
+    'Computer Science': {
+        'roles': ['Software Engineer', 'Data Scientist', 'ML Engineer', 'DevOps Engineer', 
+                 'Full Stack Developer', 'Backend Engineer', 'Frontend Engineer'],
+        'skills': [
+            ['Python', 'JavaScript', 'Git', 'SQL', 'Docker', 'AWS'],
+            ['Python', 'Machine Learning', 'Statistics', 'SQL', 'TensorFlow', 'Data Visualization'],
+            ['Python', 'Deep Learning', 'TensorFlow', 'PyTorch', 'MLOps', 'Kubernetes'],
+            ['Docker', 'Kubernetes', 'CI/CD', 'AWS', 'Linux', 'Git', 'Terraform'],
+            ['JavaScript', 'React', 'Node.js', 'MongoDB', 'PostgreSQL', 'Git'],
+            ['Python', 'Django', 'PostgreSQL', 'Redis', 'Docker', 'REST APIs'],
+            ['React', 'TypeScript', 'CSS', 'HTML', 'Redux', 'Webpack']
+        ]
+    },
+    'Data Science': {
+        'roles': ['Data Analyst', 'Data Engineer', 'ML Engineer', 'Research Scientist', 'BI Analyst'],
+        'skills': [
+            ['SQL', 'Python', 'Excel', 'Tableau', 'Statistics', 'Data Visualization'],
+            ['Python', 'Spark', 'SQL', 'Airflow', 'AWS', 'ETL', 'Kafka'],
+            ['Python', 'Machine Learning', 'TensorFlow', 'PyTorch', 'MLOps'],
+            ['Python', 'Research', 'Deep Learning', 'Publications', 'Statistics'],
+            ['SQL', 'Tableau', 'Power BI', 'Excel', 'Data Warehousing']
+        ]
+    },
+    'Business': {
+        'roles': ['Product Manager', 'Business Analyst', 'Consultant', 'Marketing Manager', 'Project Manager'],
+        'skills': [
+            ['Product Strategy', 'Agile', 'Stakeholder Management', 'Analytics', 'UX Design'],
+            ['SQL', 'Excel', 'Data Analysis', 'Requirements Gathering', 'Presentations'],
+            ['Strategy', 'Problem Solving', 'Communication', 'Excel', 'PowerPoint'],
+            ['Marketing Strategy', 'SEO', 'Content Marketing', 'Analytics', 'Social Media'],
+            ['Project Management', 'Agile', 'Scrum', 'Risk Management', 'Stakeholder Management']
+        ]
     }
-    
-    # Generate samples
-    for degree, info in career_mappings.items():
-        for role_idx, role in enumerate(info['roles']):
-            base_skills = info['skills'][role_idx] if role_idx < len(info['skills']) else info['skills'][0]
-            
-            # Generate multiple samples per role
-            for exp in range(0, 11):  # 0-10 years experience
-                for variation in range(5):  # 5 variations per experience level
-                    # Vary skill count based on experience
-                    skill_count = min(3 + exp // 2, len(base_skills))
-                    np.random.seed(exp * 100 + variation)
-                    skills = list(np.random.choice(base_skills, skill_count, replace=False))
-                    
-                    # Add some random skills
-                    additional_skills = ['Agile', 'Communication', 'Problem Solving', 'Teamwork']
-                    skills.extend(list(np.random.choice(additional_skills, np.random.randint(0, 3), replace=False)))
-                    
-                    data.append({
-                        'degree': degree,
-                        'skills': skills,
-                        'experience': exp,
-                        'career_role': role
-                    })
-    
-    return pd.DataFrame(data)
+}
 
-def train_model():
-    """Train the career prediction model"""
-    
-    print("Generating training data...")
-    df = create_training_data()
-    
-    print(f"Training samples: {len(df)}")
-    
-    # Prepare features
-    # Encode degree
-    le_degree = LabelEncoder()
-    df['degree_encoded'] = le_degree.fit_transform(df['degree'])
-    
-    # Encode skills using MultiLabelBinarizer
-    mlb_skills = MultiLabelBinarizer()
-    skills_encoded = mlb_skills.fit_transform(df['skills'])
-    skills_df = pd.DataFrame(skills_encoded, columns=mlb_skills.classes_)
-    
-    # Combine features
-    X = pd.concat([
-        pd.DataFrame({'degree': df['degree_encoded'].values, 
-                     'experience': df['experience'].values}),
-        skills_df
-    ], axis=1)
-    
-    # Ensure all column names are strings to avoid TypeError during fit
-    X.columns = [str(c) for c in X.columns]
-    
-    # Encode target
-    le_role = LabelEncoder()
-    y = le_role.fit_transform(df['career_role'])
-    
-    # Train model
-    print("Training Random Forest model...")
-    model = RandomForestClassifier(
-        n_estimators=100,
+# Generic skills sprinkled over every profile
+ADDITIONAL_SKILLS = ['Agile', 'Communication', 'Problem Solving', 'Teamwork']
+
+# Every (degree, role) pair a sample can be drawn from, with its base skills
+PAIRS = [
+    (degree, role, info['skills'][role_idx] if role_idx < len(info['skills']) else info['skills'][0])
+    for degree, info in CAREER_MAPPINGS.items()
+    for role_idx, role in enumerate(info['roles'])
+]
+
+# Sorted vocabularies, in the order LabelEncoder/MultiLabelBinarizer assign codes
+DEGREES = sorted(CAREER_MAPPINGS)
+ROLES = sorted({role for _, role, _ in PAIRS})
+SKILLS = sorted({skill for _, _, skills in PAIRS for skill in skills} | set(ADDITIONAL_SKILLS))
+FEATURE_NAMES = ['degree', 'experience'] + SKILLS
+
+_MAX_BASE_SKILLS = max(len(skills) for _, _, skills in PAIRS)
+_PAIR_DEGREE = np.array([DEGREES.index(degree) for degree, _, _ in PAIRS], dtype=np.int8)
+_PAIR_ROLE = np.array([ROLES.index(role) for _, role, _ in PAIRS], dtype=np.int16)
+_PAIR_LENGTH = np.array([len(skills) for _, _, skills in PAIRS])
+# Base skill codes per pair, padded with -1
+_PAIR_SKILLS = np.full((len(PAIRS), _MAX_BASE_SKILLS), -1, dtype=np.int16)
+for _i, (_, _, _skills) in enumerate(PAIRS):
+    _PAIR_SKILLS[_i, :len(_skills)] = [SKILLS.index(skill) for skill in _skills]
+_ADDITIONAL_CODES = np.array([SKILLS.index(skill) for skill in ADDITIONAL_SKILLS])
+
+
+def generate_chunk(seed, n_rows):
+    """
+    Generate n_rows samples at once as columns: degree, experience and role
+    codes plus a (rows x skills) 0/1 indicator matrix. Each sample picks a
+    (degree, role) pair, 0-10 years of experience, min(3 + experience // 2)
+    of the pair's base skills and 0-2 generic ones, like the original
+    per-row loop. The first rows cycle through every pair so each chunk
+    contains every role.
+    """
+    rng = np.random.default_rng(seed)
+    pair = rng.integers(len(PAIRS), size=n_rows)
+    covered = min(n_rows, len(PAIRS))
+    pair[:covered] = np.arange(covered)
+    experience = rng.integers(0, 11, size=n_rows)
+    skills = np.zeros((n_rows, len(SKILLS)), dtype=np.uint8)
+
+    # Random order of each row's base skills, padding sorted last
+    base = _PAIR_SKILLS[pair]
+    keys = rng.random(base.shape)
+    keys[base < 0] = 2.0
+    shuffled = np.take_along_axis(base, np.argsort(keys, axis=1), axis=1)
+    skill_count = np.minimum(3 + experience // 2, _PAIR_LENGTH[pair])
+    take = np.arange(_MAX_BASE_SKILLS) < skill_count[:, np.newaxis]
+    skills[np.nonzero(take)[0], shuffled[take]] = 1
+
+    extra_count = rng.integers(0, 3, size=n_rows)
+    extra = np.argsort(rng.random((n_rows, len(ADDITIONAL_SKILLS))), axis=1)
+    take = np.arange(len(ADDITIONAL_SKILLS)) < extra_count[:, np.newaxis]
+    skills[np.nonzero(take)[0], _ADDITIONAL_CODES[extra[take]]] = 1
+
+    return {
+        'degree': _PAIR_DEGREE[pair],
+        'experience': experience.astype(np.int8),
+        'role': _PAIR_ROLE[pair],
+        'skills': skills
+    }
+
+
+def chunk_features(chunk):
+    """Feature matrix in FEATURE_NAMES order, as the forest is trained on"""
+    return np.column_stack((chunk['degree'], chunk['experience'], chunk['skills'])).astype(np.float32)
+
+
+def _write_chunk(task):
+    """Generate one chunk and store it as compressed columns (runs in a worker process)"""
+    path, seed, n_rows = task
+    np.savez_compressed(path, **generate_chunk(seed, n_rows))
+    return path
+
+
+def generate_dataset(data_dir, samples=DEFAULT_SAMPLES, chunk_size=DEFAULT_CHUNK_SIZE,
+                     workers=None, seed=RANDOM_SEED):
+    """
+    Write `samples` training rows as chunk files plus one validation chunk,
+    generated in parallel. Each chunk gets an independent stream spawned
+    from one SeedSequence, so the data depends only on the seed and chunk
+    size, never on the number of workers. Returns (train_paths, validation_path).
+    """
+    os.makedirs(data_dir, exist_ok=True)
+    sizes = [min(chunk_size, samples - start) for start in range(0, samples, chunk_size)]
+    sizes.append(min(chunk_size, max(samples // 5, len(PAIRS))))
+    seeds = np.random.SeedSequence(seed).spawn(len(sizes))
+    tasks = [
+        (os.path.join(data_dir, f'chunk-{i:05d}.npz'), chunk_seed, n_rows)
+        for i, (chunk_seed, n_rows) in enumerate(zip(seeds, sizes))
+    ]
+
+    workers = min(workers or os.cpu_count() or 1, len(tasks))
+    if workers > 1:
+        with multiprocessing.Pool(workers) as pool:
+            paths = pool.map(_write_chunk, tasks)
+    else:
+        paths = [_write_chunk(task) for task in tasks]
+    return paths[:-1], paths[-1]
+
+
+def load_chunk(path):
+    with np.load(path) as data:
+        return {name: data[name] for name in data.files}
+
+
+def create_training_data(samples=825, seed=RANDOM_SEED):
+    """Small in-memory sample as a DataFrame, for inspection and tests"""
+    chunk = generate_chunk(np.random.SeedSequence(seed), samples)
+    return pd.DataFrame({
+        'degree': [DEGREES[code] for code in chunk['degree']],
+        'skills': [[SKILLS[j] for j in np.flatnonzero(row)] for row in chunk['skills']],
+        'experience': chunk['experience'].astype(int),
+        'career_role': [ROLES[code] for code in chunk['role']]
+    })
+
+
+def make_estimator(estimator, trees_per_chunk, seed=RANDOM_SEED):
+    if estimator == 'sgd':
+        return SGDClassifier(loss='log_loss', random_state=seed)
+    return RandomForestClassifier(
+        n_estimators=trees_per_chunk,
         max_depth=15,
         min_samples_split=5,
-        random_state=42,
-        n_jobs=-1
+        random_state=seed,
+        n_jobs=-1,
+        warm_start=True
     )
-    model.fit(X, y)
-    
-    print(f"Model accuracy: {model.score(X, y):.2%}")
-    
+
+
+def train_incremental(model, paths, trees_per_chunk):
+    """
+    Train chunk by chunk, holding one chunk in memory at a time. A forest
+    grows trees_per_chunk new trees on every chunk (warm start); a linear
+    model takes a partial_fit step. Also returns per-role skill counts.
+    """
+    classes = np.arange(len(ROLES))
+    skill_counts = np.zeros((len(ROLES), len(SKILLS)), dtype=np.int64)
+    for i, path in enumerate(paths):
+        chunk = load_chunk(path)
+        X, y = chunk_features(chunk), chunk['role']
+        if isinstance(model, RandomForestClassifier):
+            # Every tree must see every class so their outputs line up
+            if not np.array_equal(np.unique(y), classes):
+                raise ValueError(f'Chunk {path} does not contain every role; use a larger chunk size')
+            if i > 0:
+                model.n_estimators += trees_per_chunk
+            model.fit(X, y)
+        else:
+            model.partial_fit(X, y, classes=classes)
+
+        for role in classes:
+            skill_counts[role] += chunk['skills'][y == role].sum(axis=0, dtype=np.int64)
+        print(f"Trained on chunk {i + 1}/{len(paths)} ({len(y)} samples)")
+    return model, skill_counts
+
+
+def skill_cooccurrence(paths):
+    """(skills x skills) counts of training samples listing both skills"""
+    counts = np.zeros((len(SKILLS), len(SKILLS)), dtype=np.int64)
+    for path in paths:
+        skills = load_chunk(path)['skills'].astype(np.int64)
+        counts += skills.T @ skills
+    return counts
+
+
+def train_model(samples=DEFAULT_SAMPLES, chunk_size=DEFAULT_CHUNK_SIZE, workers=None,
+                data_dir=None, estimator='rf', seed=RANDOM_SEED):
+    """Train the career prediction model"""
+    chunk_size = max(chunk_size, len(PAIRS))
+    n_chunks = math.ceil(samples / chunk_size)
+    trees_per_chunk = max(1, math.ceil(TOTAL_TREES / n_chunks))
+
+    with tempfile.TemporaryDirectory() as scratch:
+        data_dir = data_dir or scratch
+        print(f"Generating {samples} training samples in {n_chunks} chunks...")
+        train_paths, validation_path = generate_dataset(data_dir, samples, chunk_size, workers, seed)
+
+        print(f"Training {'SGD classifier' if estimator == 'sgd' else 'Random Forest model'}...")
+        model = make_estimator(estimator, trees_per_chunk, seed)
+        model, skill_counts = train_incremental(model, train_paths, trees_per_chunk)
+
+        validation = load_chunk(validation_path)
+        print(f"Model accuracy (held-out): {model.score(chunk_features(validation), validation['role']):.2%}")
+        cooccurrence = skill_cooccurrence(train_paths)
+
+    le_degree, le_role, mlb_skills = save_artifacts('models', model, skill_counts)
+    build_skill_embeddings(cooccurrence)
+    print("Model training complete!")
+    return model, le_degree, le_role, mlb_skills
+
+
+def save_artifacts(directory, model, skill_counts):
+    """Write a model with its encoders and skill-role mapping to a model directory"""
+    # The vocabularies are fixed up front, so the encoders are fit on them
+    # directly and assign the same codes the chunks use
+    le_degree = LabelEncoder().fit(DEGREES)
+    le_role = LabelEncoder().fit(ROLES)
+    mlb_skills = MultiLabelBinarizer().fit([SKILLS])
+
     # Save model and encoders
     print("Saving model and encoders...")
-    joblib.dump(model, 'models/career_model.pkl')
-    joblib.dump(le_degree, 'models/degree_encoder.pkl')
-    joblib.dump(le_role, 'models/role_encoder.pkl')
-    joblib.dump(mlb_skills, 'models/skills_encoder.pkl')
-    
-    # Save skill-role mappings for skill gap analysis
+    joblib.dump(model, os.path.join(directory, 'career_model.pkl'))
+    joblib.dump(le_degree, os.path.join(directory, 'degree_encoder.pkl'))
+    joblib.dump(le_role, os.path.join(directory, 'role_encoder.pkl'))
+    joblib.dump(mlb_skills, os.path.join(directory, 'skills_encoder.pkl'))
+    # Tree models also get a memory-mappable copy the service loads instead
+    if export_forest(model, directory, {'degree': le_degree, 'role': le_role, 'skills': mlb_skills}):
+        print("Forest exported for memory-mapped serving")
+    else:
+        # An export of an earlier tree model would otherwise be served
+        remove_export(directory)
+
+    # Save skill-role mappings for skill gap analysis: the 10 most frequent
+    # skills per role
     skill_role_mapping = {}
-    for role in df['career_role'].unique():
-        role_data = df[df['career_role'] == role]
-        all_skills = []
-        for skills_list in role_data['skills']:
-            all_skills.extend(skills_list)
-        skill_counts = pd.Series(all_skills).value_counts()
-        # Convert numpy types to python native types for JSON serialization
-        # Keys (skills) might be numpy strings, values (counts) are numpy ints
-        skill_role_mapping[str(role)] = {str(k): int(v) for k, v in skill_counts.head(10).items()}
-    
-    try:
-        with open('models/skill_role_mapping.json', 'w') as f:
-            json.dump(skill_role_mapping, f, indent=2)
-    except Exception as e:
-        print(f"ERROR dumping JSON: {e}")
-        import traceback
-        traceback.print_exc()
-        # diverse fallback
-        with open('models/skill_role_mapping_str.json', 'w') as f:
-             f.write(str(skill_role_mapping))
+    for role_code, role in enumerate(ROLES):
+        counts = skill_counts[role_code]
+        top = sorted(np.flatnonzero(counts), key=lambda j: (-counts[j], SKILLS[j]))[:10]
+        skill_role_mapping[role] = {SKILLS[j]: int(counts[j]) for j in top}
 
-    print("Model training complete!")
-    return model, le_degree, le_role, mlb_skills
+    with open(os.path.join(directory, 'skill_role_mapping.json'), 'w') as f:
+        json.dump(skill_role_mapping, f, indent=2)
+    return le_degree, le_role, mlb_skills
+
+
+def build_recommender_index():
+    """Fit the TF-IDF recommender once and save it for the service to load"""
+    print("Building recommender index...")
+    recommender = TfidfRecommender()
+    recommender.save_index(f'models/{INDEX_FILENAME}')
+    print(f"Recommender index saved: {len(recommender.roles)} roles, "
+          f"{len(recommender.feature_names)} skills, checksum {recommender.checksum[:12]}")
+
+def build_skill_embeddings(cooccurrence):
+    """Learn skill embeddings from the catalog and the training co-occurrence"""
+    print("Learning skill embeddings...")
+    recommender = TfidfRecommender()
+    terms, vectors = build_embeddings(recommender, f'models/{EMBEDDINGS_FILENAME}', cooccurrence, SKILLS)
+    print(f"Skill embeddings saved: {len(terms)} skills, {vectors.shape[1]} dimensions")
 
 if __name__ == '__main__':
-    import os
+    parser = argparse.ArgumentParser(description='Train the career prediction model')
+    parser.add_argument('--samples', type=int, default=DEFAULT_SAMPLES, help='synthetic training samples')
+    parser.add_argument('--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE, help='samples generated and trained per chunk')
+    parser.add_argument('--workers', type=int, help='processes generating chunks (default: CPU count)')
+    parser.add_argument('--data-dir', help='keep the generated chunks here instead of a temporary directory')
+    parser.add_argument('--estimator', choices=['rf', 'sgd'], default='rf',
+                        help='warm-started random forest or partial_fit SGD classifier')
+    parser.add_argument('--seed', type=int, default=RANDOM_SEED)
+    args = parser.parse_args()
+    
     os.makedirs('models', exist_ok=True)
-    train_model()
+    train_model(args.samples, args.chunk_size, args.workers, args.data_dir, args.estimator, args.seed)
+    build_recommender_index()